@@ -0,0 +1,77 @@
+"""
+Measures BM25 query latency as the corpus grows, and the cost of reopening a
+saved (memory-mapped) index.
+
+Chunks are synthetic ~1000-character passages; a few carry rare identifiers
+("err-<n>") so exact-term lookups are exercised alongside common-word queries.
+
+    python -m benchmarks.bm25_latency --sizes 1000 10000 100000 --queries 200
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from src.tools.bm25_index import BM25Index
+
+WORDS = "agent retriever generator evaluator context query answer chunk vector index model token".split()
+
+
+def make_chunk(rng: random.Random, i: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(150)]
+    if i % 50 == 0:
+        words.insert(rng.randrange(len(words)), f"err-{i}")
+    return " ".join(words)
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'build s':>9} {'open ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'id p50 ms':>10}")
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as directory:
+            index = BM25Index(directory)
+            start = time.perf_counter()
+            for i in range(size):
+                index.add(f"chunk-{i}", make_chunk(rng, i))
+            index.save()
+            build_s = time.perf_counter() - start
+            index.close()
+
+            start = time.perf_counter()
+            index = BM25Index(directory)
+            open_ms = 1000 * (time.perf_counter() - start)
+
+            word_latencies, id_latencies = [], []
+            for _ in range(args.queries):
+                query = " ".join(rng.sample(WORDS, 3))
+                start = time.perf_counter()
+                index.search(query, k=args.k)
+                word_latencies.append(1000 * (time.perf_counter() - start))
+
+                query = f"what does err-{rng.randrange(0, size, 50)} mean"
+                start = time.perf_counter()
+                index.search(query, k=args.k)
+                id_latencies.append(1000 * (time.perf_counter() - start))
+            index.close()
+
+        print(
+            f"{size:>8} {build_s:>9.2f} {open_ms:>9.1f} {statistics.median(word_latencies):>8.2f} "
+            f"{percentile(word_latencies, 0.95):>8.2f} {statistics.median(id_latencies):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
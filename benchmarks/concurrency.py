@@ -0,0 +1,81 @@
+"""
+Measures end-to-end throughput of `Orchestrator.arun` at several concurrency levels.
+
+The real agents and graph are used against the stub Ollama server (with a fixed
+per-call latency) and an in-memory vector store, so the numbers reflect how well
+the pipeline overlaps waiting on the LLM rather than model speed.
+
+    python -m benchmarks.concurrency --latency 0.2 --levels 1 8 32
+"""
+import argparse
+import asyncio
+import time
+
+from langchain_core.documents import Document
+
+from src.agents.evaluator import Evaluator
+from src.agents.generator import Generator
+from src.agents.orchestrator import Orchestrator
+from src.agents.rephraser import Rephraser
+from src.agents.retriever import Retriever
+from src.tools.llm_client import OllamaHTTPClient
+from src.tools.telemetry import get_telemetry
+from tests.ollama_stub import StubOllamaServer
+
+
+class InMemoryVectorStore:
+    """Returns the same few chunks for every query, with a small simulated search cost."""
+    def __init__(self, search_latency: float):
+        self.search_latency = search_latency
+        self.documents = [
+            Document(page_content=f"Fact {i}: the capital of country {i} is city {i}.", metadata={"chunk_id": f"chunk-{i}"})
+            for i in range(8)
+        ]
+
+    def similarity_search_batch(self, queries, k=4):
+        time.sleep(self.search_latency)
+        return [[(doc, float(rank)) for rank, doc in enumerate(self.documents[:k])] for _ in queries]
+
+
+def responder(payload):
+    if "rephrased queries" in payload["prompt"]:
+        return "capital city\nmain city of the country\nseat of government"
+    if "(yes/no)" in payload["prompt"]:
+        return "yes"
+    return "The capital is city 1."
+
+
+async def run_level(orchestrator: Orchestrator, concurrency: int, rounds: int) -> float:
+    queries = [f"What is the capital of country {i}?" for i in range(concurrency * rounds)]
+    start = time.perf_counter()
+    for r in range(rounds):
+        batch = queries[r * concurrency:(r + 1) * concurrency]
+        await asyncio.gather(*(orchestrator.arun(query) for query in batch))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub LLM latency per call, in seconds.")
+    parser.add_argument("--search-latency", type=float, default=0.01)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with StubOllamaServer(responder=responder, latency=args.latency) as server:
+        client = OllamaHTTPClient(base_url=server.url, pool_size=max(args.levels))
+        orchestrator = Orchestrator(
+            rephraser=Rephraser(llm_client=client),
+            retriever=Retriever(vector_store=InMemoryVectorStore(args.search_latency)),
+            generator=Generator(llm_client=client),
+            evaluator=Evaluator(llm_client=client),
+        )
+        for level in args.levels:
+            get_telemetry().reset()
+            throughput = asyncio.run(run_level(orchestrator, level, args.rounds))
+            query = get_telemetry().stage_latencies().get("query", {})
+            print(f"concurrency={level:<3} throughput={throughput:7.2f} queries/s  query p50={query.get('p50_ms', 0):8.1f} ms  p95={query.get('p95_ms', 0):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures how many prompt tokens the context packer saves over joining the
+retrieved chunks as they are.
+
+A synthetic corpus is split with the ingestion defaults (1000 characters, 200
+overlap) and each "query" retrieves a run of neighbouring chunks, which is the
+common case when several query variants hit the same passage.
+
+    python -m benchmarks.context_packing --queries 200 --top-n 4
+"""
+import argparse
+import random
+from types import SimpleNamespace
+
+from src.tools.context_packer import estimate_tokens, pack_context
+
+WORDS = "agent retriever generator evaluator context query answer chunk vector index model token".split()
+
+
+def make_corpus(files: int, chars_per_file: int, rng: random.Random) -> dict:
+    corpus = {}
+    for i in range(files):
+        words = []
+        length = 0
+        while length < chars_per_file:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        corpus[f"doc_{i}.txt"] = " ".join(words)[:chars_per_file]
+    return corpus
+
+
+def split(source: str, text: str, size: int = 1000, overlap: int = 200) -> list:
+    return [
+        SimpleNamespace(page_content=text[start:start + size], metadata={"source": source, "start_index": start})
+        for start in range(0, max(1, len(text) - overlap), size - overlap)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--chars-per-file", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=4)
+    parser.add_argument("--token-budget", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    chunks_by_source = {source: split(source, text) for source, text in make_corpus(args.files, args.chars_per_file, rng).items()}
+
+    naive_tokens = packed_tokens = 0
+    for _ in range(args.queries):
+        chunks = chunks_by_source[rng.choice(list(chunks_by_source))]
+        start = rng.randrange(0, len(chunks) - args.top_n)
+        retrieved = chunks[start:start + args.top_n]
+        rng.shuffle(retrieved)
+        naive_tokens += estimate_tokens("\n\n".join(doc.page_content for doc in retrieved))
+        packed_tokens += estimate_tokens(pack_context(retrieved, token_budget=args.token_budget))
+
+    print(f"naive join : {naive_tokens / args.queries:8.1f} tokens/query")
+    print(f"packed     : {packed_tokens / args.queries:8.1f} tokens/query")
+    print(f"reduction  : {100 * (1 - packed_tokens / naive_tokens):8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares the CPU embedding modes (fp32, int8, onnx) on bulk throughput, single-query
+latency and retrieval recall against the fp32 baseline.
+
+Passages come from the files under --data (or a synthetic corpus when it is empty).
+For recall, each mode's top-k neighbours of a set of queries are compared with the
+fp32 model's top-k, so 1.0 means the mode retrieves exactly what fp32 would.
+
+    python -m benchmarks.embedding_modes --modes fp32 int8 onnx --passages 2000
+"""
+import argparse
+import random
+import statistics
+import time
+
+import numpy as np
+
+from src.tools.embedding_engine import EMBEDDING_MODES
+from src.tools.file_loader import iter_chunks
+from src.tools.vector_store import SentenceTransformerEmbeddings
+
+WORDS = "agent retriever generator evaluator context query answer chunk vector index model token latency cache".split()
+
+
+def load_passages(data_directory: str, count: int, rng: random.Random) -> list[str]:
+    passages = [doc.page_content for doc in iter_chunks(data_directory, workers=1)][:count]
+    while len(passages) < count:
+        passages.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 200))))
+    return passages
+
+
+def top_k(query_vectors: np.ndarray, passage_vectors: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(query_vectors @ passage_vectors.T), axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=list(EMBEDDING_MODES), choices=EMBEDDING_MODES)
+    parser.add_argument("--data", default="./data")
+    parser.add_argument("--passages", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=0, help="Also measure bulk encoding with a pool of this many processes.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    passages = load_passages(args.data, args.passages, rng)
+    queries = [" ".join(passage.split()[:12]) for passage in rng.sample(passages, args.queries)]
+
+    baseline = None
+    print(f"{'mode':>6} {'bulk emb/s':>11} {'pool emb/s':>11} {'query p50 ms':>13} {'recall@k':>9}")
+    for mode in ["fp32"] + [mode for mode in args.modes if mode != "fp32"]:
+        try:
+            embeddings = SentenceTransformerEmbeddings(mode=mode)
+            embeddings.load()  # Loaded outside the timed runs.
+        except RuntimeError as e:
+            print(f"{mode:>6} unavailable: {e}")
+            continue
+
+        start = time.perf_counter()
+        passage_vectors = np.asarray(embeddings.embed_documents(passages), dtype=np.float32)
+        bulk_rate = len(passages) / (time.perf_counter() - start)
+
+        pool_rate = float("nan")
+        if args.processes > 1:
+            embeddings.processes, embeddings.pool_threshold = args.processes, 1
+            embeddings.embed_documents(passages[:64])  # Starts the pool outside the timed run.
+            start = time.perf_counter()
+            embeddings.embed_documents(passages)
+            pool_rate = len(passages) / (time.perf_counter() - start)
+            embeddings.close()
+
+        latencies = []
+        query_vectors = []
+        for query in queries:
+            start = time.perf_counter()
+            query_vectors.append(embeddings.embed_query(query))
+            latencies.append(1000 * (time.perf_counter() - start))
+        neighbours = top_k(np.asarray(query_vectors, dtype=np.float32), passage_vectors, args.k)
+
+        if baseline is None:
+            baseline = neighbours
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(neighbours, baseline)])
+        print(f"{mode:>6} {bulk_rate:>11.0f} {pool_rate:>11.0f} {statistics.median(latencies):>13.2f} {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
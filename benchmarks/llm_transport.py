@@ -0,0 +1,54 @@
+"""
+Compares per-call latency of the Ollama HTTP transport against the `ollama run`
+subprocess fallback.
+
+Run against a live Ollama server with the model already pulled:
+
+    python -m benchmarks.llm_transport --model openchat:latest --calls 10
+"""
+import argparse
+import statistics
+import time
+
+from src.tools.llm_client import OllamaHTTPClient, OllamaSubprocessClient
+
+
+def time_calls(client, model: str, prompt: str, calls: int) -> list[float]:
+    """Returns the wall-clock latency in seconds of each call."""
+    # One warm-up call so model load time is not attributed to either transport.
+    client.generate(model, prompt)
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        client.generate(model, prompt)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(name: str, latencies: list[float]) -> str:
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return (
+        f"{name:<11} mean={statistics.mean(latencies) * 1000:8.1f}ms "
+        f"p50={statistics.median(latencies) * 1000:8.1f}ms p95={p95 * 1000:8.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="openchat:latest")
+    parser.add_argument("--prompt", default="Reply with the single word: ok")
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--base-url", default=None)
+    args = parser.parse_args()
+
+    http_client = OllamaHTTPClient(base_url=args.base_url, keep_alive="10m")
+    print(summarize("http", time_calls(http_client, args.model, args.prompt, args.calls)))
+    http_client.close()
+
+    subprocess_client = OllamaSubprocessClient()
+    print(summarize("subprocess", time_calls(subprocess_client, args.model, args.prompt, args.calls)))
+
+
+if __name__ == "__main__":
+    main()
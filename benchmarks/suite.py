@@ -0,0 +1,261 @@
+"""
+End-to-end benchmark suite: ingestion throughput, retrieval latency, end-to-end
+latency, memory and concurrent throughput, saved as a machine-readable baseline.
+
+The real ingestion pipeline, retriever and LangGraph `Orchestrator` run against a
+synthetic corpus, a hashing embedder and the stub Ollama server (fixed latency to the
+first token, then `--token-rate` tokens per second), so results are reproducible and
+reflect the pipeline rather than model speed.
+
+    python -m benchmarks.suite --scale 1k --save benchmarks/baselines/1k.json
+    python -m benchmarks.suite --scale 1k --compare benchmarks/baselines/1k.json
+
+With --compare the run exits with status 1 when any metric is worse than the baseline
+by more than --tolerance. Run one scale per invocation so memory figures stay separate.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import HashingEmbeddings, make_queries, make_responder, write_corpus
+from src.tools.bm25_index import BM25Index
+from src.tools.ingest_pipeline import peak_rss_mb
+from src.tools.ingestion import sync_documents
+from src.tools.telemetry import get_telemetry, percentile
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+PHASES = ("ingest", "retrieval", "e2e", "concurrency")
+# Metrics where a larger value is an improvement; for all others smaller is better.
+HIGHER_IS_BETTER = ("_per_s", "hit_rate")
+
+
+def open_store(backend: str, directory: str, embeddings):
+    if backend.startswith("flat"):
+        from src.tools.flat_vector_store import FlatVectorStore
+
+        return FlatVectorStore(embeddings, directory, dtype="int8" if backend == "flat-int8" else "float32")
+
+    import chromadb
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(collection_name="benchmark", embedding_function=embeddings, client=chromadb.PersistentClient(path=directory), persist_directory=directory)
+
+
+def latency_metrics(prefix: str, seconds: list[float]) -> dict:
+    return {
+        f"{prefix}.p50_ms": round(1000 * percentile(seconds, 0.5), 3),
+        f"{prefix}.p95_ms": round(1000 * percentile(seconds, 0.95), 3),
+    }
+
+
+def bench_ingest(store, lexical_index, data_directory: str, persist_directory: str, workers: int) -> dict:
+    stats = sync_documents(store, data_directory, persist_directory, lexical_index=lexical_index, workers=workers)
+    return {
+        "ingest.chunks": stats["chunks_added"],
+        "ingest.chunks_per_s": stats.get("chunks_per_s", 0.0),
+        "ingest.peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def bench_retrieval(retriever, queries: list[tuple[str, str]]) -> dict:
+    retriever.retrieve([queries[0][0]])  # Warm-up: first-use costs are not steady-state latency.
+    latencies, hits = [], 0
+    for query, expected in queries:
+        start = time.perf_counter()
+        documents = retriever.retrieve([query])
+        latencies.append(time.perf_counter() - start)
+        hits += any(expected in text for text in documents)
+    return {**latency_metrics("retrieval", latencies), "retrieval.hit_rate": round(hits / len(queries), 4)}
+
+
+def build_orchestrator(retriever, embeddings, base_url: str, pool_size: int):
+    from src.agents.evaluator import Evaluator
+    from src.agents.generator import Generator
+    from src.agents.orchestrator import Orchestrator
+    from src.agents.rephraser import Rephraser
+    from src.tools.llm_client import OllamaHTTPClient
+
+    client = OllamaHTTPClient(base_url=base_url, pool_size=pool_size)
+    return Orchestrator(
+        rephraser=Rephraser(llm_client=client),
+        retriever=retriever,
+        generator=Generator(llm_client=client),
+        evaluator=Evaluator(llm_client=client, embeddings=embeddings),
+    )
+
+
+def bench_e2e(orchestrator, queries: list[tuple[str, str]]) -> dict:
+    totals, first_tokens = [], []
+    for query, _ in queries:
+        for event in orchestrator.stream_answer(query):
+            if event["type"] == "final":
+                totals.append(event["metrics"]["total_s"])
+                if event["metrics"]["time_to_first_token_s"] is not None:
+                    first_tokens.append(event["metrics"]["time_to_first_token_s"])
+    return {**latency_metrics("e2e", totals), **latency_metrics("e2e.first_token", first_tokens)}
+
+
+def bench_concurrency(orchestrator, queries: list[tuple[str, str]], levels: list[int]) -> dict:
+    async def run_level(concurrency: int) -> float:
+        batch = [query for query, _ in queries[:concurrency]]
+        while len(batch) < concurrency:
+            batch += batch[:concurrency - len(batch)]
+        start = time.perf_counter()
+        await asyncio.gather(*(orchestrator.arun(query) for query in batch))
+        return len(batch) / (time.perf_counter() - start)
+
+    return {f"concurrency.{level}.queries_per_s": round(asyncio.run(run_level(level)), 3) for level in levels}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> dict:
+    chunks = SCALES[args.scale]
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag-bench-")
+    data_directory = os.path.join(workdir, f"corpus-{args.scale}-{args.seed}")
+    persist_directory = os.path.join(workdir, f"store-{args.scale}-{args.backend}")
+    shutil.rmtree(persist_directory, ignore_errors=True)
+
+    start = time.perf_counter()
+    write_corpus(data_directory, chunks, seed=args.seed)
+    print(f"Corpus of {chunks} chunks ready in {time.perf_counter() - start:.1f}s ({data_directory}).")
+
+    embeddings = HashingEmbeddings(dim=args.dim)
+    store = open_store(args.backend, persist_directory, embeddings)
+    lexical_index = BM25Index(os.path.join(persist_directory, "bm25"))
+    queries = make_queries(chunks, args.queries, seed=args.seed)
+    metrics = {}
+    get_telemetry().reset()
+
+    # Ingestion always runs: every other phase needs the populated store.
+    metrics.update(bench_ingest(store, lexical_index, data_directory, persist_directory, args.workers))
+
+    from src.agents.retriever import Retriever
+
+    retriever = Retriever(vector_store=store, lexical_index=lexical_index)
+    if "retrieval" in args.phases:
+        metrics.update(bench_retrieval(retriever, queries))
+
+    if "e2e" in args.phases or "concurrency" in args.phases:
+        from tests.ollama_stub import StubOllamaServer
+
+        with StubOllamaServer(responder=make_responder(args.answer_words), latency=args.latency, token_rate=args.token_rate) as server:
+            orchestrator = build_orchestrator(retriever, embeddings, server.url, pool_size=max(args.levels))
+            if "e2e" in args.phases:
+                metrics.update(bench_e2e(orchestrator, queries[:args.e2e_queries]))
+            if "concurrency" in args.phases:
+                metrics.update(bench_concurrency(orchestrator, queries, args.levels))
+    metrics["memory.peak_rss_mb"] = round(peak_rss_mb(), 1)
+
+    if hasattr(store, "close"):
+        store.close()
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "config": {
+            "scale": args.scale,
+            "chunks": chunks,
+            "backend": args.backend,
+            "dim": args.dim,
+            "seed": args.seed,
+            "queries": args.queries,
+            "e2e_queries": args.e2e_queries,
+            "latency_s": args.latency,
+            "token_rate": args.token_rate,
+            "answer_words": args.answer_words,
+            "levels": args.levels,
+            "phases": list(args.phases),
+        },
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "metrics": metrics,
+        "stages": get_telemetry().stage_latencies(),
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """
+    Compares the metrics of two runs.
+
+    Returns:
+        One row per metric present in both runs, with the relative change (positive
+        means better) and whether it is a regression beyond `tolerance`.
+    """
+    rows = []
+    for name, value in current["metrics"].items():
+        previous = baseline["metrics"].get(name)
+        if previous is None or name == "ingest.chunks":
+            continue
+        change = (value - previous) / previous if previous else 0.0
+        if not name.endswith(HIGHER_IS_BETTER):
+            change = -change
+        rows.append({"metric": name, "baseline": previous, "current": value, "change": change, "regression": change < -tolerance})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="1k")
+    parser.add_argument("--backend", choices=["flat", "flat-int8", "chroma"], default="flat")
+    parser.add_argument("--phases", nargs="+", choices=PHASES, default=list(PHASES), help="Ingestion always runs.")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200, help="Queries for the retrieval and concurrency phases.")
+    parser.add_argument("--e2e-queries", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM latency to the first token, in seconds.")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Stub LLM decode speed, in tokens per second.")
+    parser.add_argument("--answer-words", type=int, default=64)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--workers", type=int, default=None, help="The chunking pool size.")
+    parser.add_argument("--workdir", default=None, help="Keep the corpus here between runs instead of a temporary directory.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", default=None, help="Write the results to this JSON file.")
+    parser.add_argument("--compare", default=None, help="A saved JSON baseline to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before a metric counts as a regression.")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"\n{'metric':<36} {'value':>12}")
+    for name, value in results["metrics"].items():
+        print(f"{name:<36} {value:>12}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"\nSaved results to {args.save}.")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["config"] != results["config"]:
+            print("\nWarning: the baseline was recorded with a different configuration.")
+        rows = compare(results, baseline, args.tolerance)
+        print(f"\n{'metric':<36} {'baseline':>12} {'current':>12} {'change':>8}")
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['metric']:<36} {row['baseline']:>12} {row['current']:>12} {row['change']:>+8.1%}{flag}")
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    main()
@@ -0,0 +1,148 @@
+"""
+Deterministic stand-ins for the benchmark suite: a synthetic corpus, a hashing
+embedder and a responder for the stub Ollama server.
+
+Every corpus paragraph states one fact ("The <attribute> of unit-<i> is <value>.")
+padded with filler words to about 800 characters, so the default splitter turns each
+paragraph into exactly one chunk and a query about unit-<i> has a known answer.
+"""
+import os
+import random
+import re
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+WORDS = (
+    "agent retriever generator evaluator context query answer chunk vector index model token latency "
+    "cache batch stream graph node state memory thread process queue budget score rank fusion lexical "
+    "dense embedding corpus document passage sentence paragraph source version manifest checkpoint"
+).split()
+ATTRIBUTES = ("capacity", "owner", "region", "status", "colour", "weight", "priority", "vendor")
+VALUES = ("north", "south", "amber", "green", "seventy", "twelve", "acme", "globex", "high", "low", "retired", "active")
+
+PARAGRAPH_CHARS = 800
+CHUNKS_PER_FILE = 1000
+
+
+def entity(i: int) -> str:
+    return f"unit-{i:07d}"
+
+
+def fact(i: int) -> tuple[str, str]:
+    """Returns the (attribute, value) stated for record `i`."""
+    return ATTRIBUTES[i % len(ATTRIBUTES)], VALUES[zlib.crc32(str(i).encode()) % len(VALUES)]
+
+
+def paragraph(i: int, rng: random.Random) -> str:
+    attribute, value = fact(i)
+    head = f"Record {i}. The {attribute} of {entity(i)} is {value}."
+    filler = rng.choices(WORDS, k=PARAGRAPH_CHARS // 7)
+    text = head
+    for word in filler:
+        if len(text) + len(word) + 1 > PARAGRAPH_CHARS:
+            break
+        text += " " + word
+    return text
+
+
+def write_corpus(directory: str, chunks: int, seed: int = 0) -> int:
+    """
+    Writes `chunks` paragraphs into files of CHUNKS_PER_FILE paragraphs each.
+
+    An existing corpus written with the same size and seed is reused, since generating
+    the largest scales takes a while.
+
+    Returns:
+        The number of files.
+    """
+    marker = os.path.join(directory, ".corpus")
+    signature = f"{chunks} {seed}"
+    files = (chunks + CHUNKS_PER_FILE - 1) // CHUNKS_PER_FILE
+    if os.path.exists(marker):
+        with open(marker, encoding="utf-8") as f:
+            if f.read() == signature:
+                return files
+
+    os.makedirs(directory, exist_ok=True)
+    for file_index in range(files):
+        rng = random.Random(f"{seed}-{file_index}")
+        start = file_index * CHUNKS_PER_FILE
+        with open(os.path.join(directory, f"part-{file_index:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraph(i, rng) for i in range(start, min(start + CHUNKS_PER_FILE, chunks))))
+    with open(marker, "w", encoding="utf-8") as f:
+        f.write(signature)
+    return files
+
+
+def make_queries(chunks: int, count: int, seed: int = 0) -> list[tuple[str, str]]:
+    """Returns (query, expected entity) pairs about randomly chosen records."""
+    rng = random.Random(seed)
+    queries = []
+    for i in rng.sample(range(chunks), min(count, chunks)):
+        attribute, _ = fact(i)
+        queries.append((f"What is the {attribute} of {entity(i)}?", entity(i)))
+    return queries
+
+
+@lru_cache(maxsize=65536)
+def _bucket(word: str, dim: int) -> int:
+    return zlib.crc32(word.encode("utf-8")) % dim
+
+
+class HashingEmbeddings:
+    """
+    Unit-length hashed bag-of-words vectors. They cost a small fraction of a real model,
+    so the benchmarks measure the pipeline around the embedder rather than the model.
+    """
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets = [_bucket(word, self.dim) for word in text.lower().split()]
+            if buckets:
+                vectors[row] = np.bincount(buckets, minlength=self.dim)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+
+def _between(prompt: str, start: str, end: str) -> str:
+    return prompt.split(start, 1)[-1].split(end, 1)[0]
+
+
+def make_responder(answer_words: int = 64):
+    """
+    Returns a responder for `StubOllamaServer` that plays every agent's part.
+
+    The rephraser gets three fixed variants of the query and the evaluator's judge
+    always says "yes". The generator answers with the context sentence sharing the
+    most words with the query, padded with following context words to `answer_words`
+    words, so the answer is grounded and its length (and so its decode time at the
+    stub's token rate) is fixed.
+    """
+    def responder(payload: dict) -> str:
+        prompt = payload["prompt"]
+        if "Original Query: '" in prompt:
+            query = _between(prompt, "Original Query: '", "'").rstrip("?")
+            return f"{query}\n{query} details\ninformation about {query}"
+        if "(yes/no)" in prompt:
+            return "yes"
+        context = _between(prompt, "---CONTEXT---\n", "\n---END CONTEXT---")
+        query_words = set(_between(prompt, "---QUERY---\n", "\n---END QUERY---").lower().rstrip("?").split())
+        sentences = [s for s in re.split(r"(?<=[.!?])\s+", context) if s]
+        if not sentences:
+            return "I don't have enough information."
+        best = max(range(len(sentences)), key=lambda i: len(query_words & set(sentences[i].lower().rstrip(".").split())))
+        words = " ".join(sentences[best:]).split()
+        return " ".join(words[:answer_words])
+
+    return responder
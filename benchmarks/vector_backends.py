@@ -0,0 +1,153 @@
+"""
+Compares the flat (float32 and int8) and Chroma vector-store backends on recall@k,
+batched query latency, resident memory and cold-open time.
+
+Embeddings are random unit vectors looked up by text, so the model never runs and
+the numbers reflect the store alone. Each backend is built and measured in its own
+process so RSS figures do not bleed into each other. Recall is measured against an
+exact brute-force search.
+
+    python -m benchmarks.vector_backends --chunks 20000 --dim 384 --backends flat flat-int8 chroma
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class LookupEmbeddings:
+    """Returns precomputed vectors for the texts "chunk-<i>" and "query-<i>"."""
+    def __init__(self, chunk_vectors: np.ndarray, query_vectors: np.ndarray):
+        self.vectors = {"chunk": chunk_vectors, "query": query_vectors}
+
+    def _lookup(self, text: str) -> list[float]:
+        kind, index = text.split("-")
+        return self.vectors[kind][int(index)].tolist()
+
+    def embed_documents(self, texts):
+        return [self._lookup(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._lookup(text)
+
+    def embed_queries(self, texts):
+        return self.embed_documents(texts)
+
+
+def make_vectors(chunks: int, queries: int, dim: int, seed: int):
+    rng = np.random.default_rng(seed)
+    chunk_vectors = rng.standard_normal((chunks, dim), dtype=np.float32)
+    chunk_vectors /= np.linalg.norm(chunk_vectors, axis=1, keepdims=True)
+    # Queries are noisy copies of random chunks, like paraphrases of a passage.
+    query_vectors = chunk_vectors[rng.integers(0, chunks, queries)] + 0.1 * rng.standard_normal((queries, dim), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return chunk_vectors, query_vectors
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Not Linux: fall back to the peak RSS (kilobytes on Linux, bytes on macOS).
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def open_store(backend: str, directory: str, embeddings):
+    if backend.startswith("flat"):
+        from src.tools.flat_vector_store import FlatVectorStore
+
+        return FlatVectorStore(embeddings, directory, dtype="int8" if backend == "flat-int8" else "float32")
+
+    import chromadb
+    from langchain_community.vectorstores import Chroma
+
+    return Chroma(collection_name="benchmark", embedding_function=embeddings, client=chromadb.PersistentClient(path=directory), persist_directory=directory)
+
+
+def search(store, queries: list[str], k: int):
+    if hasattr(store, "similarity_search_batch"):
+        return store.similarity_search_batch(queries, k=k)
+    from src.tools.vector_store import similarity_search_batch
+
+    return similarity_search_batch(store, queries, k=k)
+
+
+def measure(backend: str, args, results):
+    chunk_vectors, query_vectors = make_vectors(args.chunks, args.queries, args.dim, args.seed)
+    embeddings = LookupEmbeddings(chunk_vectors, query_vectors)
+    exact = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :args.k]
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = open_store(backend, directory, embeddings)
+        start = time.perf_counter()
+        for batch_start in range(0, args.chunks, 5000):
+            ids = [f"chunk-{i}" for i in range(batch_start, min(batch_start + 5000, args.chunks))]
+            store.add_documents([Document(page_content=chunk_id) for chunk_id in ids], ids=ids)
+        build_s = time.perf_counter() - start
+        del store
+
+        baseline_mb = rss_mb()
+        start = time.perf_counter()
+        store = open_store(backend, directory, embeddings)
+        search(store, ["query-0"], args.k)
+        cold_open_ms = 1000 * (time.perf_counter() - start)
+
+        queries = [f"query-{i}" for i in range(args.queries)]
+        latencies, hits = [], 0
+        for batch_start in range(0, args.queries, args.batch):
+            batch = queries[batch_start:batch_start + args.batch]
+            start = time.perf_counter()
+            found = search(store, batch, args.k)
+            latencies.append(1000 * (time.perf_counter() - start) / len(batch))
+            for query, query_hits in zip(batch, found):
+                expected = {f"chunk-{i}" for i in exact[int(query.split("-")[1])]}
+                hits += len(expected & {doc.page_content for doc, _ in query_hits})
+
+        results[backend] = {
+            "build_s": build_s,
+            "cold_open_ms": cold_open_ms,
+            "query_ms": float(np.median(latencies)),
+            "recall": hits / (args.queries * args.k),
+            "rss_mb": rss_mb() - baseline_mb,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch", type=int, default=4, help="Queries per batched search, like one round of query variants.")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--backends", nargs="+", default=["flat", "flat-int8", "chroma"], choices=["flat", "flat-int8", "chroma"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.dict()
+        for backend in args.backends:
+            process = context.Process(target=measure, args=(backend, args, results))
+            process.start()
+            process.join()
+            if process.exitcode:
+                print(f"{backend}: failed with exit code {process.exitcode}")
+        results = dict(results)
+
+    print(f"{'backend':>10} {'recall@k':>9} {'query ms':>9} {'open ms':>9} {'rss MB':>8} {'build s':>8}")
+    for backend, row in results.items():
+        print(f"{backend:>10} {row['recall']:>9.3f} {row['query_ms']:>9.2f} {row['cold_open_ms']:>9.1f} {row['rss_mb']:>8.1f} {row['build_s']:>8.2f}")
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    main()
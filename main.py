@@ -1,10 +1,5 @@
-from src.agents.orchestrator import Orchestrator
-from src.agents.retriever import Retriever
-from src.agents.generator import Generator
-from src.agents.rephraser import Rephraser
-from src.agents.evaluator import Evaluator
-from src.tools.file_loader import load_documents
-from src.tools.vector_store import get_vector_store, add_documents_to_store
+from src.pipeline import RAGPipeline
+from src.tools.telemetry import configure_logging
 import os
 
 def setup_and_run(query: str):
@@ -14,35 +9,19 @@ def setup_and_run(query: str):
     print("--- 1. CONFIGURATION AND SETUP ---")
     print("Using local Ollama and sentence-transformers setup.")
 
-    print("\n--- 2. DOCUMENT INGESTION ---")
-    documents = load_documents("./data")
-    if not documents:
+    print("\n--- 2. DOCUMENT INGESTION AND AGENT INITIALIZATION ---")
+    pipeline = RAGPipeline("./data", "./chroma_db")
+    if not pipeline.document_count:
         print("No documents found in the './data' directory. Please add some .txt files and try again.")
         return
+    orchestrator = pipeline.orchestrator
 
-    vector_store = get_vector_store()
-    if documents:
-        add_documents_to_store(vector_store, documents)
-
-    print("\n--- 3. AGENT AND ORCHESTRATOR INITIALIZATION ---")
-    rephraser_agent = Rephraser()
-    retriever_agent = Retriever(vector_store=vector_store)
-    generator_agent = Generator()
-    evaluator_agent = Evaluator()
-
-    orchestrator = Orchestrator(
-        rephraser=rephraser_agent,
-        retriever=retriever_agent,
-        generator=generator_agent,
-        evaluator=evaluator_agent
-    )
-
-    print("\n--- 4. RUNNING THE AGENTIC RAG WORKFLOW ---")
+    print("\n--- 3. RUNNING THE AGENTIC RAG WORKFLOW ---")
     result_state = orchestrator.run(query)
 
-    print("\n--- 5. WORKFLOW FINISHED ---")
-    # The final state is nested under the last node that ran
-    final_node_state = result_state.get('evaluator', {})
+    print("\n--- 4. WORKFLOW FINISHED ---")
+    # The final state is nested under the last node that ran: the evaluator, or the cache on a hit
+    final_node_state = result_state.get('evaluator') or result_state.get('cache', {})
     final_answer = final_node_state.get('final_answer')
 
     if final_answer:
@@ -54,6 +33,8 @@ def setup_and_run(query: str):
 
 
 if __name__ == "__main__":
+    configure_logging()
+
     # Ensure the data directory and a sample file exist
     if not os.path.exists("./data"):
         os.makedirs("./data")
@@ -0,0 +1,182 @@
+"""
+Long-running query service for the agentic RAG system.
+
+The vector store, embedding model and LangGraph workflow are built once at startup;
+each request only pays for retrieval and the LLM calls.
+
+    uvicorn server:app --host 0.0.0.0 --port 8000
+"""
+import asyncio
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.pipeline import RAGPipeline
+from src.tools.llm_scheduler import llm_deadline
+from src.tools.telemetry import configure_logging, get_telemetry
+
+# The number of queries that may run their LLM calls at the same time.
+LLM_WORKERS = int(os.getenv("RAG_LLM_WORKERS", "4"))
+# LLM calls that cannot start within this many seconds of the request are shed.
+QUERY_DEADLINE_S = float(os.getenv("RAG_QUERY_DEADLINE_S", "60"))
+
+
+class QueryRequest(BaseModel):
+    query: str
+
+
+class ResumeRequest(BaseModel):
+    thread_id: str
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    app.state.pipeline = RAGPipeline(os.getenv("RAG_DATA_DIR", "./data"), os.getenv("RAG_PERSIST_DIR", "./chroma_db"))
+    # The service takes the model load at startup rather than on the first request.
+    app.state.pipeline.warm_up()
+    app.state.executor = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="rag-query")
+    yield
+    app.state.executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="Agentic RAG", lifespan=lifespan)
+
+
+def _run_to_final(pipeline: RAGPipeline, query: str) -> dict:
+    """Runs the workflow to completion and returns its final event."""
+    final = {}
+    thread_id = uuid.uuid4().hex
+    try:
+        with llm_deadline(QUERY_DEADLINE_S):
+            for event in pipeline.orchestrator.stream_answer(query, thread_id=thread_id):
+                if event["type"] == "final":
+                    final = event
+    except Exception:
+        # The thread ID is not returned to the caller, so the run can never be resumed.
+        pipeline.orchestrator.discard(thread_id)
+        raise
+    final.pop("type", None)
+    return final
+
+
+def _validate(body: QueryRequest) -> str:
+    query = body.query.strip()
+    if not query:
+        raise HTTPException(status_code=422, detail="The query must not be empty.")
+    return query
+
+
+@app.get("/health")
+async def health(request: Request):
+    pipeline = request.app.state.pipeline
+    return {
+        "status": "ok",
+        "documents": pipeline.document_count,
+        "corpus_version": pipeline.ingestion_stats["corpus_version"],
+        "llm_workers": LLM_WORKERS,
+        "routes": dict(pipeline.orchestrator.route_counts),
+        "stage_latencies": get_telemetry().stage_latencies(),
+        "llm_scheduler": pipeline.llm_scheduler.stats(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Exposes counters and latency summaries in the Prometheus text format."""
+    return PlainTextResponse(get_telemetry().to_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/query")
+async def query(body: QueryRequest, request: Request):
+    query_text = _validate(body)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app.state.executor, _run_to_final, request.app.state.pipeline, query_text)
+
+
+@app.post("/query/stream")
+async def query_stream(body: QueryRequest, request: Request):
+    """Streams NDJSON events: one `token` event per generated piece, then the `final` event."""
+    query_text = _validate(body)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    done = object()
+
+    # A run that fails part-way can be continued through /query/resume with this ID.
+    thread_id = uuid.uuid4().hex
+    orchestrator = request.app.state.pipeline.orchestrator
+    disconnected = threading.Event()
+
+    def produce():
+        stream = orchestrator.stream_answer(query_text, thread_id=thread_id)
+        try:
+            with llm_deadline(QUERY_DEADLINE_S):
+                for event in stream:
+                    if disconnected.is_set():
+                        # Nobody is listening: stop the run (and its LLM calls) and drop its checkpoints.
+                        stream.close()
+                        orchestrator.discard(thread_id)
+                        return
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, {"type": "error", "detail": str(e), "thread_id": thread_id})
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, done)
+
+    loop.run_in_executor(request.app.state.executor, produce)
+
+    async def body_lines():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    continue
+                if event is done:
+                    return
+                yield json.dumps(event) + "\n"
+        finally:
+            # Also reached when the response is cancelled because the client went away.
+            disconnected.set()
+
+    return StreamingResponse(body_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/query/resume")
+async def resume(body: ResumeRequest, request: Request):
+    """Continues a failed streamed query from its last completed step."""
+    def run():
+        try:
+            with llm_deadline(QUERY_DEADLINE_S):
+                final_state = request.app.state.pipeline.orchestrator.resume(body.thread_id)
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        final = {}
+        for update in (final_state or {}).values():
+            final.update(update or {})
+        return {"final_answer": final.get("final_answer"), "is_answer_faithful": final.get("is_answer_faithful")}
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app.state.executor, run)
+
+
+@app.post("/ingest")
+async def ingest(request: Request):
+    loop = asyncio.get_running_loop()
+    # Ingestion runs outside the query pool so it never waits behind LLM calls.
+    return await loop.run_in_executor(None, request.app.state.pipeline.ingest)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=os.getenv("RAG_HOST", "127.0.0.1"), port=int(os.getenv("RAG_PORT", "8000")))
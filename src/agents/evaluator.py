@@ -1,65 +1,162 @@
-import subprocess
-import shlex
+import asyncio
+import logging
+import random
+import threading
+from collections import Counter
+
+from src.tools.context_packer import DEFAULT_TOKEN_BUDGET, pack_context
+from src.tools.faithfulness import FaithfulnessPrefilter
+from src.tools.llm_client import LLMError, agenerate, get_llm_client
+from src.tools.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
 
 class Evaluator:
     """
     This agent evaluates the generated answer for faithfulness to the retrieved documents.
-    It uses a local Ollama model via subprocess.
+    It uses a local Ollama model.
+
+    When given the embedding model, a local pre-filter runs first: clearly supported and
+    clearly unsupported answers are decided without the LLM, and only ambiguous cases go
+    to the LLM judge, with just the supporting context sentences in the prompt.
     """
-    def __init__(self, model_name: str = "openchat:latest"):
+    prompt_template = (
+        "You are a strict evaluator. Your task is to determine if the provided 'Answer' is fully supported by the 'Context'. "
+        "The answer must not contain any information that is not present in the context. "
+        "Respond with only the word 'yes' or 'no'.\n\n"
+        "Context:\n"
+        "---CONTEXT---\n"
+        "{context}\n"
+        "---END CONTEXT---\n\n"
+        "Answer:\n"
+        "---ANSWER---\n"
+        "{answer}\n"
+        "---END ANSWER---\n\n"
+        "Is the answer fully supported by the context? (yes/no):"
+    )
+
+    def __init__(
+        self,
+        model_name: str = "openchat:latest",
+        llm_client=None,
+        context_token_budget: int = DEFAULT_TOKEN_BUDGET,
+        embeddings=None,
+        accept_threshold: float = 0.8,
+        reject_threshold: float = 0.3,
+        shadow_rate: float = 0.0,
+    ):
+        """
+        Args:
+            embeddings: The embedding model used by the pre-filter; None disables it.
+            accept_threshold: Pre-filter score at or above which an answer is accepted outright.
+            reject_threshold: Pre-filter score below which an answer is rejected outright.
+            shadow_rate: Fraction of pre-filter decisions also sent to the LLM judge to
+                measure agreement. The pre-filter's verdict is still the one returned.
+        """
         self.model_name = model_name
+        self.llm_client = llm_client or get_llm_client()
+        self.context_token_budget = context_token_budget
+        self.prefilter = FaithfulnessPrefilter(embeddings, accept_threshold, reject_threshold) if embeddings is not None else None
+        self.shadow_rate = shadow_rate
+        self._metrics = Counter()
+        self._metrics_lock = threading.Lock()
+
+    def _prefilter(self, documents: list, generated_answer: str):
+        """
+        Runs the local tier.
+
+        Returns:
+            (verdict or None, context for the LLM judge, whether the LLM judge should run).
+        """
+        context = pack_context(documents, token_budget=self.context_token_budget)
+        if self.prefilter is None:
+            return None, context, True
+
+        check = self.prefilter.check(context, generated_answer)
+        logger.info("Faithfulness pre-filter score %.3f: verdict %s", check.score, check.verdict)
+        get_telemetry().observe("faithfulness_prefilter_score", check.score)
+        if check.verdict is not None:
+            self._count("prefilter_accept" if check.verdict else "prefilter_reject")
+            return check.verdict, context, random.random() < self.shadow_rate
+
+        self._count("llm_judge")
+        return None, "\n".join(check.supporting_sentences) or context, True
 
-    def evaluate(self, query: str, documents: list[str], generated_answer: str) -> bool:
+    def _count(self, key: str, value: int = 1):
+        with self._metrics_lock:
+            self._metrics[key] += value
+        get_telemetry().increment("evaluator_decisions_total", value, outcome=key)
+
+    def _decide(self, prefilter_verdict, llm_verdict):
+        if prefilter_verdict is None:
+            return llm_verdict
+        # A shadowed decision: the LLM only measures agreement.
+        if llm_verdict is not None:
+            self._count("agreement_checks")
+            self._count("agreements", int(llm_verdict == prefilter_verdict))
+        return prefilter_verdict
+
+    def _parse_response(self, response_text: str) -> bool:
+        response_text = response_text.strip().lower()
+        logger.debug("Evaluator response: %s", response_text)
+        return "yes" in response_text
+
+    def metrics(self) -> dict:
+        """Returns how many answers each tier decided and the pre-filter's agreement with the LLM judge."""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        decided = sum(metrics.get(key, 0) for key in ("prefilter_accept", "prefilter_reject", "llm_judge"))
+        checks = metrics.get("agreement_checks", 0)
+        metrics["prefilter_hit_rate"] = (decided - metrics.get("llm_judge", 0)) / decided if decided else 0.0
+        metrics["agreement_rate"] = metrics.get("agreements", 0) / checks if checks else None
+        return metrics
+
+    def evaluate(self, query: str, documents: list, generated_answer: str) -> bool:
         """
         Evaluates the generated answer for faithfulness.
 
         Args:
             query: The user's original query.
-            documents: The list of retrieved documents.
+            documents: The retrieved documents, most relevant first, or their packed context.
             generated_answer: The answer generated by the Generator agent.
 
         Returns:
             True if the answer is faithful to the documents, False otherwise.
         """
-        print("Evaluating the generated answer for faithfulness...")
+        logger.info("Evaluating the generated answer for faithfulness")
+
+        prefilter_verdict, context, run_judge = self._prefilter(documents, generated_answer)
+        if not run_judge:
+            return prefilter_verdict
+
+        prompt = self.prompt_template.format(context=context, answer=generated_answer)
+
+        try:
+            llm_verdict = self._parse_response(self.llm_client.generate(self.model_name, prompt))
 
-        context = "\n\n".join(documents)
+        except LLMError as e:
+            logger.warning("Error evaluating answer: %s. Defaulting to faithful (True).", e)
+            # Default to True to avoid stopping the pipeline due to an evaluation error.
+            # In a production system, this might require more sophisticated error handling.
+            return prefilter_verdict if prefilter_verdict is not None else True
 
-        prompt_template = (
-            "You are a strict evaluator. Your task is to determine if the provided 'Answer' is fully supported by the 'Context'. "
-            "The answer must not contain any information that is not present in the context. "
-            "Respond with only the word 'yes' or 'no'.\n\n"
-            "Context:\n"
-            "---CONTEXT---\n"
-            "{context}\n"
-            "---END CONTEXT---\n\n"
-            "Answer:\n"
-            "---ANSWER---\n"
-            "{answer}\n"
-            "---END ANSWER---\n\n"
-            "Is the answer fully supported by the context? (yes/no):"
-        )
+        return self._decide(prefilter_verdict, llm_verdict)
 
-        prompt = prompt_template.format(context=context, answer=generated_answer)
+    async def aevaluate(self, query: str, documents: list, generated_answer: str) -> bool:
+        """Async version of `evaluate`."""
+        logger.info("Evaluating the generated answer for faithfulness")
 
-        command = ["ollama", "run", self.model_name, prompt]
+        prefilter_verdict, context, run_judge = await asyncio.to_thread(self._prefilter, documents, generated_answer)
+        if not run_judge:
+            return prefilter_verdict
 
-        try:
-            print("---CALLING OLLAMA FOR EVALUATION VIA SUBPROCESS---")
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+        prompt = self.prompt_template.format(context=context, answer=generated_answer)
 
-            response_text = result.stdout.strip().lower()
-            print(f"---OLLAMA RESPONSE---\n{response_text}\n---END OLLAMA RESPONSE---")
+        try:
+            llm_verdict = self._parse_response(await agenerate(self.llm_client, self.model_name, prompt))
 
-            return "yes" in response_text
+        except LLMError as e:
+            logger.warning("Error evaluating answer: %s. Defaulting to faithful (True).", e)
+            return prefilter_verdict if prefilter_verdict is not None else True
 
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            print(f"Error evaluating answer: {e}. Defaulting to faithful (True).")
-            # Default to True to avoid stopping the pipeline due to an evaluation error.
-            # In a production system, this might require more sophisticated error handling.
-            return True
+        return self._decide(prefilter_verdict, llm_verdict)
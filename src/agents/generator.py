@@ -1,71 +1,119 @@
-import subprocess
-import shlex
+import logging
+from src.tools.context_packer import DEFAULT_TOKEN_BUDGET, pack_context
+from src.tools.llm_client import LLMError, agenerate, get_llm_client
+
+logger = logging.getLogger(__name__)
+
+# Prefixes the text returned in place of an answer when the LLM call fails.
+GENERATION_ERROR_PREFIX = "Error calling Ollama:"
 
 class Generator:
     """
-    This agent generates a coherent answer using a local Ollama model via subprocess.
+    This agent generates a coherent answer using a local Ollama model.
     """
-    def __init__(self, model_name: str = "openchat:latest"):
+    prompt_template = (
+        "You are a helpful assistant. Your task is to answer the user's query based *only* on the provided context.\n"
+        "If the context does not contain the answer, state that you don't have enough information.\n\n"
+        "Here is the context:\n"
+        "---CONTEXT---\n"
+        "{context}\n"
+        "---END CONTEXT---\n\n"
+        "Here is the user's query:\n"
+        "---QUERY---\n"
+        "{query}\n"
+        "---END QUERY---\n\n"
+        "Answer:"
+    )
+    retry_template = (
+        "\n\nA previous answer to this query was rejected because it was not supported by the context:\n"
+        "---REJECTED ANSWER---\n"
+        "{previous_answer}\n"
+        "---END REJECTED ANSWER---\n"
+        "Answer again using only statements found in the context.\n\n"
+        "Answer:"
+    )
+
+    def __init__(self, model_name: str = "openchat:latest", llm_client=None, context_token_budget: int = DEFAULT_TOKEN_BUDGET):
         self.model_name = model_name
-        # Check if ollama is available
-        try:
-            subprocess.run(["ollama", "--version"], check=True, capture_output=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
-            raise RuntimeError("Ollama is not available in the system's PATH. Please install it to use this Generator.")
+        self.llm_client = llm_client or get_llm_client()
+        self.context_token_budget = context_token_budget
+
+    def _build_prompt(self, query: str, documents: list, previous_answer: str = None) -> str:
+        context = pack_context(documents, token_budget=self.context_token_budget)
+        prompt = self.prompt_template.format(context=context, query=query)
+        if previous_answer is not None:
+            # Replaces the trailing "Answer:" so the retry instruction comes right before the answer.
+            prompt = prompt[:-len("\n\nAnswer:")] + self.retry_template.format(previous_answer=previous_answer)
+        return prompt
 
-    def generate(self, query: str, documents: list[str]) -> str:
+    def generate(self, query: str, documents: list, previous_answer: str = None) -> str:
         """
-        Generates an answer using the Ollama CLI.
+        Generates an answer using the Ollama model.
 
         Args:
             query: The user's original query.
-            documents: A list of retrieved document contents.
+            documents: The retrieved documents, most relevant first, or their packed context.
+            previous_answer: An answer rejected as unfaithful, to generate a corrected one.
 
         Returns:
             The generated answer as a string.
         """
-        print(f"Generating answer for query: '{query}' using model {self.model_name}")
-
-        context = "\n\n".join(documents)
-
-        prompt_template = (
-            "You are a helpful assistant. Your task is to answer the user's query based *only* on the provided context.\n"
-            "If the context does not contain the answer, state that you don't have enough information.\n\n"
-            "Here is the context:\n"
-            "---CONTEXT---\n"
-            "{context}\n"
-            "---END CONTEXT---\n\n"
-            "Here is the user's query:\n"
-            "---QUERY---\n"
-            "{query}\n"
-            "---END QUERY---\n\n"
-            "Answer:"
-        )
-
-        prompt = prompt_template.format(context=context, query=query)
-
-        # We need to be careful with how we pass the prompt to the command
-        # to avoid shell injection issues, although with subprocess.run and a list of args, it's safer.
-        # `ollama run` expects the prompt as a final argument.
-        command = ["ollama", "run", self.model_name, prompt]
+        logger.info("Generating answer with model %s", self.model_name)
+
+        prompt = self._build_prompt(query, documents, previous_answer)
 
         try:
-            print("---CALLING OLLAMA VIA SUBPROCESS---")
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True
-            )
+            generated_answer = self.llm_client.generate(self.model_name, prompt).strip()
+            logger.debug("Generator response: %s", generated_answer)
+
+            return generated_answer
+
+        except LLMError as e:
+            error_message = f"{GENERATION_ERROR_PREFIX} {e}"
+            logger.error(error_message)
+            return error_message
+
+    async def agenerate(self, query: str, documents: list, previous_answer: str = None) -> str:
+        """Async version of `generate`."""
+        logger.info("Generating answer with model %s", self.model_name)
+
+        prompt = self._build_prompt(query, documents, previous_answer)
 
-            generated_answer = result.stdout.strip()
-            print(f"---OLLAMA RESPONSE---\n{generated_answer}\n---END OLLAMA RESPONSE---")
+        try:
+            generated_answer = (await agenerate(self.llm_client, self.model_name, prompt)).strip()
+            logger.debug("Generator response: %s", generated_answer)
 
             return generated_answer
 
-        except FileNotFoundError:
-            return "Error: The 'ollama' command was not found. Please make sure Ollama is installed and in your PATH."
-        except subprocess.CalledProcessError as e:
-            error_message = f"Error executing Ollama: {e}\nStderr: {e.stderr}"
-            print(error_message)
+        except LLMError as e:
+            error_message = f"{GENERATION_ERROR_PREFIX} {e}"
+            logger.error(error_message)
             return error_message
+
+    def stream_generate(self, query: str, documents: list, previous_answer: str = None):
+        """
+        Generates an answer and yields it piece by piece as the model produces it.
+
+        Args:
+            query: The user's original query.
+            documents: The retrieved documents, most relevant first, or their packed context.
+            previous_answer: An answer rejected as unfaithful, to generate a corrected one.
+
+        Yields:
+            Pieces of the answer text. On an LLM error the error message is yielded instead.
+        """
+        logger.info("Streaming answer with model %s", self.model_name)
+
+        prompt = self._build_prompt(query, documents, previous_answer)
+        stream = getattr(self.llm_client, "stream_generate", None)
+
+        try:
+            if stream is None:
+                yield self.llm_client.generate(self.model_name, prompt)
+            else:
+                yield from stream(self.model_name, prompt)
+
+        except LLMError as e:
+            error_message = f"{GENERATION_ERROR_PREFIX} {e}"
+            logger.error(error_message)
+            yield error_message
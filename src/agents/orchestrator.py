@@ -1,97 +1,441 @@
-from langgraph.graph import StateGraph, END
-from src.schemas.state import AgentState
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import Counter
+# Only the constants are imported up front: the graph itself (and most of LangGraph)
+# is loaded when the workflow is first used, which batch runs never do.
+from langgraph.constants import START, END
+from src.schemas.state import AgentState, ChunkRef
 from src.agents.retriever import Retriever
-from src.agents.generator import Generator
+from src.agents.generator import GENERATION_ERROR_PREFIX, Generator
 from src.agents.rephraser import Rephraser
 from src.agents.evaluator import Evaluator
+from src.tools.answer_cache import SemanticAnswerCache
+from src.tools.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+def _log_update(update: dict):
+    """Logs which node finished and the state keys it wrote, without dumping document text."""
+    if logger.isEnabledFor(logging.DEBUG):
+        for node, values in update.items():
+            logger.debug("Node '%s' updated %s", node, sorted(values or {}))
 
 class Orchestrator:
     """
     The orchestrator manages the overall workflow of the agentic RAG system.
     It defines the graph of agents and the transitions between them.
+
+    Retrieval for the original query runs in parallel with the Rephraser's LLM call;
+    the retriever node then searches only the new variants and fuses both result sets.
+    Every node has a sync and an async implementation, so the same graph serves
+    `run`/`stream_answer` and `arun`/`astream`.
+
+    With `rephrase_threshold` set, routing is adaptive instead: the first-pass retrieval
+    runs alone, and the Rephraser (plus a second retrieval) only runs when the top
+    similarity is below `rephrase_threshold` or its margin over the runner-up is below
+    `rephrase_margin`.
+
+    An answer the Evaluator rejects goes back to the Generator, with the rejected answer,
+    until `max_generation_attempts` answers have been generated; the retrieved documents
+    are reused, so a retry costs one generation.
+
+    The state carries `ChunkRef`s rather than chunk text: the chunks stay in the
+    retriever's `ChunkStore`, and their packed context is rendered once per query and
+    shared by the Generator and Evaluator prompts. With a `checkpointer` (see
+    `checkpoints.get_checkpointer`) the state is saved after every node, and a run that
+    failed part-way can be continued with `resume` from its last completed node.
     """
-    def __init__(self, rephraser: Rephraser, retriever: Retriever, generator: Generator, evaluator: Evaluator):
+    def __init__(
+        self,
+        rephraser: Rephraser,
+        retriever: Retriever,
+        generator: Generator,
+        evaluator: Evaluator,
+        answer_cache: SemanticAnswerCache = None,
+        rephrase_threshold: float = None,
+        rephrase_margin: float = 0.0,
+        max_generation_attempts: int = 2,
+        checkpointer=None,
+    ):
         self.rephraser = rephraser
         self.retriever = retriever
         self.generator = generator
         self.evaluator = evaluator
-        self.workflow = self._build_workflow()
+        self.answer_cache = answer_cache
+        self.rephrase_threshold = rephrase_threshold
+        self.rephrase_margin = rephrase_margin
+        self.max_generation_attempts = max_generation_attempts
+        self.checkpointer = checkpointer
+        # How often each route was taken: "cache", "direct" (rephrasing skipped) or "rephrased".
+        self.route_counts = Counter()
+        self._route_lock = threading.Lock()
+        self.last_stream_metrics = None
+        self._workflow = None
+        self._workflow_lock = threading.Lock()
+
+    def compile(self):
+        """
+        Builds and compiles the LangGraph workflow, once.
+
+        Returns:
+            The compiled workflow.
+        """
+        if self._workflow is None:
+            with self._workflow_lock:
+                if self._workflow is None:
+                    self._workflow = self._build_workflow()
+        return self._workflow
+
+    @property
+    def workflow(self):
+        """The compiled LangGraph workflow, built on first use."""
+        return self.compile()
+
+    def cache_node(self, state: AgentState) -> dict:
+        """Node that answers near-duplicate queries from the semantic answer cache."""
+        cached = self.answer_cache.lookup(state['original_query'])
+        get_telemetry().increment("answer_cache_lookups_total", hit=cached is not None)
+        if cached is None:
+            return {"cache_hit": False}
+        logger.info("Answer cache hit (similarity %.3f) for: '%s'", cached['similarity'], cached['query'])
+        return {"cache_hit": True, "final_answer": cached['final_answer'], "is_answer_faithful": cached['is_answer_faithful']}
+
+    async def acache_node(self, state: AgentState) -> dict:
+        return await asyncio.to_thread(self.cache_node, state)
 
     def rephraser_node(self, state: AgentState) -> dict:
         """Node that calls the Rephraser agent."""
-        print("---CALLING REPHRASER---")
         query = state['original_query']
         rephrased_queries = self.rephraser.rephrase(query)
         return {"rephrased_queries": rephrased_queries}
 
+    async def arephraser_node(self, state: AgentState) -> dict:
+        rephrased_queries = await self.rephraser.arephrase(state['original_query'])
+        return {"rephrased_queries": rephrased_queries}
+
+    def first_pass_retriever_node(self, state: AgentState) -> dict:
+        """Node that searches with the original query while the Rephraser is still running."""
+        return {"first_pass_results": self._refs(self.retriever.search([state['original_query']]))}
+
+    async def afirst_pass_retriever_node(self, state: AgentState) -> dict:
+        return {"first_pass_results": self._refs(await self.retriever.asearch([state['original_query']]))}
+
+    def _refs(self, results: list[list[tuple]]) -> list[list[ChunkRef]]:
+        """Turns search results into `ChunkRef` lists; the chunks themselves stay in the chunk store."""
+        return [self.retriever.chunk_store.refs(hits) for hits in results]
+
+    def _new_queries(self, state: AgentState) -> list[str]:
+        """The rephrased queries not already covered by the first-pass search."""
+        queries = state.get('rephrased_queries') or [state['original_query']]
+        if state.get('first_pass_results') is None:
+            return queries
+        return [q for q in queries if q != state['original_query']]
+
+    def _fuse(self, state: AgentState, results: list) -> dict:
+        chunk_store = self.retriever.chunk_store
+        first_pass = [chunk_store.hits(refs) for refs in state.get('first_pass_results') or []]
+        # Only references go into the state; the context packer resolves them, with their offsets, later.
+        return {"retrieved_documents": chunk_store.refs(self.retriever.fuse(first_pass + results))}
+
     def retriever_node(self, state: AgentState) -> dict:
         """Node that calls the Retriever agent."""
-        print("---CALLING RETRIEVER---")
-        queries = state['rephrased_queries']
-        documents = self.retriever.retrieve(queries)
-        return {"retrieved_documents": documents}
+        queries = self._new_queries(state)
+        results = self.retriever.search(queries) if queries else []
+        return self._fuse(state, results)
+
+    async def aretriever_node(self, state: AgentState) -> dict:
+        queries = self._new_queries(state)
+        results = await self.retriever.asearch(queries) if queries else []
+        return self._fuse(state, results)
+
+    @staticmethod
+    def _previous_answer(state: AgentState):
+        """The rejected answer to correct when this is a retry, else None."""
+        return state.get('generated_answer') if state.get('generation_attempts') else None
+
+    def _context(self, state: AgentState, agent) -> str:
+        """
+        The packed context of the retrieved chunks within `agent`'s token budget. It is
+        rendered once and then shared by the Generator, the Evaluator and any retry.
+        """
+        return self.retriever.chunk_store.context(state['retrieved_documents'], agent.context_token_budget)
 
     def generator_node(self, state: AgentState) -> dict:
         """Node that calls the Generator agent."""
-        print("---CALLING GENERATOR---")
         query = state['original_query']
-        documents = state['retrieved_documents']
-        generated_answer = self.generator.generate(query, documents)
-        return {"generated_answer": generated_answer}
+        context = self._context(state, self.generator)
+        attempts = state.get('generation_attempts') or 0
+        from langgraph.config import get_stream_writer
+
+        # Pieces are forwarded to `stream_answer` consumers; outside a custom stream the writer is a no-op.
+        writer = get_stream_writer()
+        if attempts:
+            writer({"retry": attempts + 1})
+        pieces = []
+        for piece in self.generator.stream_generate(query, context, self._previous_answer(state)):
+            pieces.append(piece)
+            writer({"token": piece})
+        generated_answer = "".join(pieces).strip()
+        return {"generated_answer": generated_answer, "generation_attempts": attempts + 1}
+
+    async def agenerator_node(self, state: AgentState) -> dict:
+        generated_answer = await self.generator.agenerate(state['original_query'], self._context(state, self.generator), self._previous_answer(state))
+        return {"generated_answer": generated_answer, "generation_attempts": (state.get('generation_attempts') or 0) + 1}
+
+    def _final_answer(self, query: str, generated_answer: str, is_faithful: bool) -> dict:
+        final_answer = generated_answer if is_faithful else "I cannot provide a faithful answer based on the retrieved documents."
+        # Refusals and LLM error text are not cached: they may be caused by a transient outage.
+        if self.answer_cache is not None and is_faithful and not generated_answer.startswith(GENERATION_ERROR_PREFIX):
+            self.answer_cache.store(query, final_answer, is_faithful)
+        return {"final_answer": final_answer, "is_answer_faithful": is_faithful}
+
+    def _can_retry(self, state: AgentState) -> bool:
+        return (state.get('generation_attempts') or 0) < self.max_generation_attempts
+
+    def _verdict(self, state: AgentState, is_faithful: bool) -> dict:
+        """Finalizes the answer, unless it was rejected and another attempt is allowed."""
+        if not is_faithful and self._can_retry(state):
+            logger.info("Answer judged unfaithful; regenerating (attempt %d of %d).", state['generation_attempts'] + 1, self.max_generation_attempts)
+            get_telemetry().increment("generation_retries_total")
+            return {"is_answer_faithful": False}
+        return self._final_answer(state['original_query'], state['generated_answer'], is_faithful)
 
     def evaluator_node(self, state: AgentState) -> dict:
         """Node that calls the Evaluator agent."""
-        print("---CALLING EVALUATOR---")
         query = state['original_query']
-        documents = state['retrieved_documents']
+        context = self._context(state, self.evaluator)
         generated_answer = state['generated_answer']
-        is_faithful = self.evaluator.evaluate(query, documents, generated_answer)
+        is_faithful = self.evaluator.evaluate(query, context, generated_answer)
+        return self._verdict(state, is_faithful)
 
-        final_answer = generated_answer if is_faithful else "I cannot provide a faithful answer based on the retrieved documents."
-        return {"final_answer": final_answer, "is_answer_faithful": is_faithful}
+    async def aevaluator_node(self, state: AgentState) -> dict:
+        query = state['original_query']
+        generated_answer = state['generated_answer']
+        is_faithful = await self.evaluator.aevaluate(query, self._context(state, self.evaluator), generated_answer)
+        return await asyncio.to_thread(self._verdict, state, is_faithful)
+
+    def route_after_evaluator(self, state: AgentState) -> str:
+        """Sends a rejected answer back to the Generator while attempts remain."""
+        if state.get('is_answer_faithful') is False and self._can_retry(state):
+            return "generator"
+        return END
+
+    def _count_route(self, route: str):
+        with self._route_lock:
+            self.route_counts[route] += 1
+        get_telemetry().increment("routes_total", route=route)
+
+    def route_entry(self, state: AgentState):
+        """
+        Picks the first step of a run: END on an answer cache hit, the first-pass retrieval
+        alone in adaptive mode, otherwise rephrasing and first-pass retrieval in parallel.
+        """
+        if state.get('cache_hit'):
+            self._count_route("cache")
+            return END
+        if self.rephrase_threshold is not None:
+            return "first_pass_retriever"
+        self._count_route("rephrased")
+        return ["rephraser", "first_pass_retriever"]
+
+    def route_after_first_pass(self, state: AgentState) -> str:
+        """Skips the Rephraser when the first-pass retrieval is already confident."""
+        top_similarity, margin = self.retriever.confidence(self.retriever.chunk_store.hits(state['first_pass_results'][0]))
+        confident = top_similarity >= self.rephrase_threshold and margin >= self.rephrase_margin
+        route = "direct" if confident else "rephrased"
+        logger.info("First-pass top similarity %.3f (margin %.3f): route '%s'.", top_similarity, margin, route)
+        self._count_route(route)
+        return "retriever" if confident else "rephraser"
 
     def _build_workflow(self):
         """Builds the LangGraph workflow for the agentic RAG system."""
+        from langchain_core.runnables import RunnableLambda
+        from langgraph.graph import StateGraph
+
         workflow = StateGraph(AgentState)
 
-        workflow.add_node("rephraser", self.rephraser_node)
-        workflow.add_node("retriever", self.retriever_node)
-        workflow.add_node("generator", self.generator_node)
-        workflow.add_node("evaluator", self.evaluator_node)
+        telemetry = get_telemetry()
+
+        def node(name, func, afunc):
+            # Every node is timed, so per-stage p50/p95 show where a query's latency goes.
+            def timed(state):
+                with telemetry.span("node", node=name):
+                    return func(state)
+
+            async def atimed(state):
+                with telemetry.span("node", node=name):
+                    return await afunc(state)
+
+            workflow.add_node(name, RunnableLambda(timed, afunc=atimed, name=name))
 
-        workflow.set_entry_point("rephraser")
-        workflow.add_edge("rephraser", "retriever")
+        node("rephraser", self.rephraser_node, self.arephraser_node)
+        node("first_pass_retriever", self.first_pass_retriever_node, self.afirst_pass_retriever_node)
+        node("retriever", self.retriever_node, self.aretriever_node)
+        node("generator", self.generator_node, self.agenerator_node)
+        node("evaluator", self.evaluator_node, self.aevaluator_node)
+
+        if self.answer_cache is not None:
+            node("cache", self.cache_node, self.acache_node)
+            workflow.add_edge(START, "cache")
+            workflow.add_conditional_edges("cache", self.route_entry, [END, "rephraser", "first_pass_retriever"])
+        elif self.rephrase_threshold is not None:
+            workflow.add_edge(START, "first_pass_retriever")
+        else:
+            workflow.add_conditional_edges(START, self.route_entry, ["rephraser", "first_pass_retriever"])
+
+        if self.rephrase_threshold is not None:
+            workflow.add_conditional_edges("first_pass_retriever", self.route_after_first_pass, ["retriever", "rephraser"])
+            workflow.add_edge("rephraser", "retriever")
+        else:
+            # The retriever waits for both branches before fusing.
+            workflow.add_edge(["rephraser", "first_pass_retriever"], "retriever")
         workflow.add_edge("retriever", "generator")
         workflow.add_edge("generator", "evaluator")
-        workflow.add_edge("evaluator", END)
+        workflow.add_conditional_edges("evaluator", self.route_after_evaluator, ["generator", END])
+
+        return workflow.compile(checkpointer=self.checkpointer)
 
-        return workflow.compile()
+    def _config(self, thread_id: str = None):
+        """The run config: a checkpoint thread (a fresh one unless given) when checkpointing."""
+        if self.checkpointer is None:
+            return None
+        return {"configurable": {"thread_id": thread_id or uuid.uuid4().hex}}
 
-    def run(self, query: str):
-        """Runs the agentic RAG system with the given query."""
-        initial_state = {"original_query": query}
+    def _forget(self, config: dict):
+        """Drops the checkpoints of a completed run; only interrupted runs need resuming."""
+        if config is not None:
+            self.checkpointer.delete_thread(config["configurable"]["thread_id"])
+
+    def discard(self, thread_id: str):
+        """Drops the checkpoints of a run that will not be resumed, e.g. one whose caller is gone."""
+        self._forget(self._config(thread_id))
+
+    def _stream_updates(self, initial_state, config: dict):
+        final_state = None
+        with get_telemetry().span("query"):
+            try:
+                for s in self.workflow.stream(initial_state, config):
+                    _log_update(s)
+                    final_state = s
+            except Exception:
+                if config is not None:
+                    logger.error("Run %s failed; it can be continued with resume().", config["configurable"]["thread_id"])
+                raise
+        self._forget(config)
+        return final_state
+
+    def run(self, query: str, thread_id: str = None):
+        """
+        Runs the agentic RAG system with the given query.
+
+        Args:
+            thread_id: The checkpoint thread, so the run can be resumed if it fails.
+                Defaults to a new one. Ignored without a checkpointer.
+        """
+        return self._stream_updates({"original_query": query}, self._config(thread_id))
+
+    def resume(self, thread_id: str):
+        """
+        Continues a run that failed part-way from its last completed node.
+
+        Returns:
+            The last state update, like `run`.
+        """
+        if self.checkpointer is None:
+            raise ValueError("Resuming a run needs an Orchestrator built with a checkpointer.")
+        config = self._config(thread_id)
+        if not self.workflow.get_state(config).next:
+            raise ValueError(f"There is no unfinished run with thread ID '{thread_id}'.")
+        return self._stream_updates(None, config)
+
+    async def arun(self, query: str, thread_id: str = None):
+        """Async version of `run`; many queries can share one event loop."""
         final_state = None
-        for s in self.workflow.stream(initial_state):
-            print(f"---STATE UPDATE---\n{s}\n---END STATE UPDATE---")
-            final_state = s
+        with get_telemetry().span("query"):
+            async for s in self.astream(query, thread_id):
+                _log_update(s)
+                final_state = s
         return final_state
 
+    async def astream(self, query: str, thread_id: str = None):
+        """Yields the per-node state updates of an async run."""
+        config = self._config(thread_id)
+        async for s in self.workflow.astream({"original_query": query}, config):
+            yield s
+        if config is not None:
+            await self.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+
+    def stream_answer(self, query: str, thread_id: str = None):
+        """
+        Runs the workflow and yields the generated answer as it is produced.
+
+        Yields:
+            `{"type": "token", "text": ...}` events while the Generator runs, and a
+            `{"type": "retry", "attempt": n}` event before the tokens of a regenerated
+            answer, which replaces the text streamed so far. Then one
+            `{"type": "final", ...}` event with the evaluator's verdict and timing metrics.
+            An answer still judged unfaithful after the last attempt is retracted in the
+            final event: `retracted` is True and `final_answer` holds the refusal instead
+            of the streamed text.
+        """
+        start = time.perf_counter()
+        first_token_at = last_token_at = None
+        token_count = 0
+        final = {}
+        config = self._config(thread_id)
+
+        for mode, chunk in self.workflow.stream({"original_query": query}, config, stream_mode=["updates", "custom"]):
+            if mode == "custom" and "token" in chunk:
+                last_token_at = time.perf_counter()
+                if first_token_at is None:
+                    first_token_at = last_token_at
+                token_count += 1
+                yield {"type": "token", "text": chunk["token"]}
+            elif mode == "custom" and "retry" in chunk:
+                yield {"type": "retry", "attempt": chunk["retry"]}
+            elif mode == "updates":
+                for update in chunk.values():
+                    final.update(update or {})
+        self._forget(config)
+
+        end = time.perf_counter()
+        generation_time = last_token_at - first_token_at if first_token_at is not None else 0.0
+        self.last_stream_metrics = {
+            "time_to_first_token_s": first_token_at - start if first_token_at is not None else None,
+            "tokens": token_count,
+            "tokens_per_s": token_count / generation_time if generation_time > 0 else None,
+            "total_s": end - start,
+        }
+        telemetry = get_telemetry()
+        telemetry.observe("span_duration_seconds", end - start, span="query")
+        if first_token_at is not None:
+            telemetry.observe("time_to_first_token_seconds", first_token_at - start)
+        yield {
+            "type": "final",
+            "final_answer": final.get("final_answer"),
+            "is_answer_faithful": final.get("is_answer_faithful"),
+            "retracted": final.get("is_answer_faithful") is False,
+            "cache_hit": bool(final.get("cache_hit")),
+            "generation_attempts": final.get("generation_attempts", 0),
+            "metrics": self.last_stream_metrics,
+        }
+
 if __name__ == "__main__":
-    from src.tools.vector_store import get_vector_store, add_documents_to_store
-    from src.tools.file_loader import load_documents
+    from src.tools.vector_store import get_vector_store
+    from src.tools.ingestion import sync_documents
     import os
 
-    documents = load_documents("./data")
-    if not documents:
+    if not os.path.exists("./data/sample.txt"):
         if not os.path.exists("./data"):
             os.makedirs("./data")
         with open("./data/sample.txt", "w") as f:
             f.write("The capital of France is Paris.")
-        documents = load_documents("./data")
 
     vector_store = get_vector_store()
-    if documents:
-        add_documents_to_store(vector_store, documents)
+    sync_documents(vector_store, "./data")
 
     # Initialize agents
     rephraser_agent = Rephraser()
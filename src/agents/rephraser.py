@@ -1,13 +1,34 @@
-import subprocess
-import shlex
+import logging
+from src.tools.llm_client import LLMError, agenerate, get_llm_client
+
+logger = logging.getLogger(__name__)
 
 class Rephraser:
     """
     This agent rephrases the user's query to improve retrieval results by generating multiple variations.
-    It uses a local Ollama model via subprocess.
+    It uses a local Ollama model.
     """
-    def __init__(self, model_name: str = "openchat:latest"):
+    prompt_template = (
+        "You are a helpful assistant. Your task is to generate 3 different versions of the following user query for a search engine. "
+        "The queries should be varied to cover different angles of the topic. "
+        "Return *only* the rephrased queries, each on a new line, without any numbering or introduction.\n\n"
+        "Original Query: '{query}'"
+    )
+
+    def __init__(self, model_name: str = "openchat:latest", llm_client=None):
         self.model_name = model_name
+        self.llm_client = llm_client or get_llm_client()
+
+    def _parse_response(self, query: str, response_text: str) -> list[str]:
+        rephrased_queries = response_text.strip().split('\n')
+        # Clean up any empty lines
+        rephrased_queries = [q.strip() for q in rephrased_queries if q.strip()]
+
+        logger.debug("Rephraser response: %s", rephrased_queries)
+
+        # Always include the original query as well, first; dict.fromkeys keeps order while removing duplicates
+        all_queries = [query] + rephrased_queries
+        return list(dict.fromkeys(all_queries))
 
     def rephrase(self, query: str) -> list[str]:
         """
@@ -17,40 +38,30 @@ class Rephraser:
             query: The user's original query.
 
         Returns:
-            A list of rephrased queries, including the original.
+            A list of rephrased queries, starting with the original.
         """
-        print(f"Rephrasing query: '{query}' using model {self.model_name}")
+        logger.info("Rephrasing query with model %s", self.model_name)
 
-        prompt_template = (
-            "You are a helpful assistant. Your task is to generate 3 different versions of the following user query for a search engine. "
-            "The queries should be varied to cover different angles of the topic. "
-            "Return *only* the rephrased queries, each on a new line, without any numbering or introduction.\n\n"
-            "Original Query: '{query}'"
-        )
+        prompt = self.prompt_template.format(query=query)
 
-        prompt = prompt_template.format(query=query)
+        try:
+            response_text = self.llm_client.generate(self.model_name, prompt)
+            return self._parse_response(query, response_text)
+
+        except LLMError as e:
+            logger.warning("Error rephrasing query: %s. Falling back to original query.", e)
+            return [query]
 
-        command = ["ollama", "run", self.model_name, prompt]
+    async def arephrase(self, query: str) -> list[str]:
+        """Async version of `rephrase`."""
+        logger.info("Rephrasing query with model %s", self.model_name)
+
+        prompt = self.prompt_template.format(query=query)
 
         try:
-            print("---CALLING OLLAMA FOR REPHRASING VIA SUBPROCESS---")
-            result = subprocess.run(
-                command,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-
-            rephrased_queries = result.stdout.strip().split('\n')
-            # Clean up any empty lines
-            rephrased_queries = [q.strip() for q in rephrased_queries if q.strip()]
-
-            print(f"---OLLAMA RESPONSE---\n{rephrased_queries}\n---END OLLAMA RESPONSE---")
-
-            # Always include the original query as well
-            all_queries = [query] + rephrased_queries
-            return list(set(all_queries)) # Use set to ensure uniqueness
-
-        except (subprocess.CalledProcessError, FileNotFoundError) as e:
-            print(f"Error rephrasing query: {e}. Falling back to original query.")
+            response_text = await agenerate(self.llm_client, self.model_name, prompt)
+            return self._parse_response(query, response_text)
+
+        except LLMError as e:
+            logger.warning("Error rephrasing query: %s. Falling back to original query.", e)
             return [query]
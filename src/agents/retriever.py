@@ -1,30 +1,148 @@
+import asyncio
+import logging
+from src.tools.chunk_store import ChunkStore
+from src.tools.fusion import chunk_key, distance_to_similarity, maximal_marginal_relevance, reciprocal_rank_fusion
+from src.tools.telemetry import get_telemetry
+from src.tools.vector_store import get_documents, get_embeddings, similarity_search_batch
+
+logger = logging.getLogger(__name__)
+
 class Retriever:
     """
     This agent retrieves relevant documents from the vector store based on the rephrased queries.
+
+    Results of all query variants are fused with reciprocal-rank fusion, deduplicated by
+    chunk ID and cut to a global `top_n`, so the context size does not depend on how many
+    variants the Rephraser produced. With a `lexical_index`, BM25 results for each variant
+    are fused alongside the dense ones, which recovers exact terms such as IDs and error
+    codes that embeddings tend to miss.
     """
-    def __init__(self, vector_store):
+    def __init__(self, vector_store, k: int = 4, top_n: int = 4, rrf_k: int = 60, mmr_lambda: float = None, distance_metric: str = "l2", lexical_index=None, lexical_k: int = None, chunk_store: ChunkStore = None):
+        """
+        Args:
+            vector_store: The store to search.
+            k: The number of candidates fetched for each query variant.
+            top_n: The maximum number of documents returned after fusion.
+            rrf_k: The reciprocal-rank fusion damping constant.
+            mmr_lambda: When set, re-ranks the fused candidates with maximal marginal
+                relevance (1.0 = relevance only, 0.0 = diversity only).
+            distance_metric: The store's distance function, used to turn distances into similarities.
+            lexical_index: An optional `BM25Index` over the same chunk IDs as the store.
+            lexical_k: The number of BM25 candidates fetched for each query variant. Defaults to `k`.
+            chunk_store: Where retrieved chunks are kept for the orchestrator's `ChunkRef`s.
+                Defaults to a new store backed by `vector_store`.
+        """
         self.vector_store = vector_store
+        self.k = k
+        self.top_n = top_n
+        self.rrf_k = rrf_k
+        self.mmr_lambda = mmr_lambda
+        self.distance_metric = distance_metric
+        self.lexical_index = lexical_index
+        self.lexical_k = lexical_k
+        self.chunk_store = chunk_store if chunk_store is not None else ChunkStore(vector_store)
 
-    def retrieve(self, queries: list[str], k: int = 2) -> list[str]:
+    def retrieve(self, queries: list[str], k: int = None) -> list[str]:
         """
         Retrieves documents for the given queries.
 
         Args:
             queries: A list of queries to search for.
-            k: The number of documents to retrieve for each query.
+            k: The number of candidates to fetch for each query. Defaults to `self.k`.
+
+        Returns:
+            Up to `top_n` unique document contents, most relevant first.
+        """
+        return [doc.page_content for doc, _ in self.retrieve_with_scores(queries, k=k)]
+
+    def search(self, queries: list[str], k: int = None) -> list[list[tuple]]:
+        """
+        Runs the raw similarity search for the given queries.
 
         Returns:
-            A list of unique retrieved document contents.
+            One list of (document, distance) pairs per query, nearest first. With a lexical
+            index, one BM25 list per query follows the dense lists; its distances are None.
         """
-        print(f"Retrieving documents for queries: {queries}")
+        logger.debug("Retrieving documents for queries: %s", queries)
+        telemetry = get_telemetry()
+
+        # All query variants are embedded and searched in one batched call.
+        with telemetry.span("retrieval.dense", queries=len(queries)):
+            results = similarity_search_batch(self.vector_store, queries, k=k or self.k)
+        for hits in results:
+            if hits and hits[0][1] is not None:
+                telemetry.observe("retrieval_top_similarity", distance_to_similarity(hits[0][1], self.distance_metric))
+        if self.lexical_index is not None and len(self.lexical_index):
+            with telemetry.span("retrieval.lexical", queries=len(queries)):
+                results = results + self._lexical_search(queries, results, self.lexical_k or k or self.k)
+        return results
 
-        retrieved_docs = []
-        for query in queries:
-            retrieved_docs.extend(self.vector_store.similarity_search(query, k=k))
+    def _lexical_search(self, queries: list[str], dense_results: list[list[tuple]], k: int) -> list[list[tuple]]:
+        lexical_hits = [self.lexical_index.search(query, k=k) for query in queries]
+
+        # Chunks already returned by the dense search are reused; only the rest are fetched.
+        documents = {chunk_key(doc): doc for hits in dense_results for doc, _ in hits}
+        missing = list(dict.fromkeys(chunk_id for hits in lexical_hits for chunk_id, _ in hits if chunk_id not in documents))
+        documents.update(get_documents(self.vector_store, missing))
+
+        return [[(documents[chunk_id], None) for chunk_id, _ in hits if chunk_id in documents] for hits in lexical_hits]
+
+    def fuse(self, results: list[list[tuple]]) -> list[tuple]:
+        """
+        Fuses per-query search results into one ranked, deduplicated list.
 
-        # Get unique documents by their content
-        unique_docs_by_content = {doc.page_content for doc in retrieved_docs}
+        Returns:
+            Up to `top_n` (document, fused score) pairs, most relevant first.
+        """
+        documents_by_key = {}
+        ranked_lists = []
+        for hits in results:
+            ranked = []
+            for doc, distance in hits:
+                key = chunk_key(doc)
+                documents_by_key.setdefault(key, doc)
+                ranked.append((key, distance))
+            ranked_lists.append(ranked)
+
+        fused = reciprocal_rank_fusion(ranked_lists, k=self.rrf_k)
+        if self.mmr_lambda is not None and len(fused) > self.top_n:
+            candidates = [documents_by_key[key] for key, _ in fused]
+            embeddings = dict(zip((key for key, _ in fused), get_embeddings(self.vector_store, candidates)))
+            fused = maximal_marginal_relevance(fused, embeddings, self.top_n, self.mmr_lambda)
+        else:
+            fused = fused[:self.top_n]
+
+        logger.info("Retrieved %d unique documents, keeping the top %d.", len(documents_by_key), len(fused))
+        get_telemetry().observe("retrieval_candidates", len(documents_by_key))
+
+        return [(documents_by_key[key], score) for key, score in fused]
+
+    def confidence(self, hits: list[tuple]) -> tuple[float, float]:
+        """
+        Summarizes how confident a single query's search result is.
+
+        Returns:
+            The top cosine similarity and its margin over the runner-up (0.0 if there is none).
+        """
+        similarities = sorted((distance_to_similarity(distance, self.distance_metric) for _, distance in hits if distance is not None), reverse=True)
+        if not similarities:
+            return 0.0, 0.0
+        margin = similarities[0] - similarities[1] if len(similarities) > 1 else 0.0
+        return similarities[0], margin
+
+    def retrieve_with_scores(self, queries: list[str], k: int = None) -> list[tuple]:
+        """
+        Retrieves and fuses documents for the given queries.
+
+        Returns:
+            Up to `top_n` (document, fused score) pairs, most relevant first.
+        """
+        return self.fuse(self.search(queries, k=k))
 
-        print(f"Retrieved {len(unique_docs_by_content)} unique documents.")
+    async def asearch(self, queries: list[str], k: int = None) -> list[list[tuple]]:
+        """Async version of `search`; the embedding and store query run in a worker thread."""
+        return await asyncio.to_thread(self.search, queries, k)
 
-        return list(unique_docs_by_content)
+    async def aretrieve_with_scores(self, queries: list[str], k: int = None) -> list[tuple]:
+        """Async version of `retrieve_with_scores`."""
+        return await asyncio.to_thread(self.retrieve_with_scores, queries, k)
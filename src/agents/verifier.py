@@ -1,3 +1,7 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
 class Verifier:
     """
     This agent verifies facts in the generated answer against external sources.
@@ -21,7 +25,7 @@ class Verifier:
         """
         # TODO: Implement the logic to verify the answer using an external tool.
         # This could involve extracting claims from the answer and searching for them online.
-        print("Verifying the generated answer against external sources...")
+        logger.info("Verifying the generated answer against external sources")
 
         # In a real implementation, you might:
         # 1. Use an LLM to extract claims from the answer.
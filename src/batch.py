@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+from src.agents.orchestrator import Orchestrator
+from src.tools.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+
+def _per_query(results: list, count: int) -> list[list]:
+    """
+    Splits the output of one `Retriever.search` call over `count` queries back into one
+    group per query: its dense list, then its BM25 list when there is a lexical index.
+    """
+    return [results[i::count] for i in range(count)]
+
+
+def read_queries(path: str) -> list[dict]:
+    """
+    Reads a JSONL file of `{"query": ...}` objects. A record without an "id" gets its
+    line number, so results can be joined back to the input.
+    """
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not str(record.get("query", "")).strip():
+                raise ValueError(f"{path}:{line_number}: the record has no query.")
+            record.setdefault("id", line_number)
+            records.append(record)
+    return records
+
+
+def completed_ids(path: str) -> set:
+    """
+    Returns the IDs already written to a results file. A truncated last line, left by an
+    interrupted run, is cut off so appending resumes on a clean line.
+    """
+    if not os.path.exists(path):
+        return set()
+    done = set()
+    with open(path, "rb+") as f:
+        valid_end = 0
+        for line in iter(f.readline, b""):
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                break
+            valid_end = f.tell()
+        f.truncate(valid_end)
+    return done
+
+
+class BatchRunner:
+    """
+    Answers many queries, batching work across them.
+
+    Queries are processed in windows of `window` unique queries. Within a window the
+    first-pass retrieval and the retrieval of all rephrased variants are each one
+    `Retriever.search` call, so every query embedding is computed in a single `encode`
+    and sent to the store as one batched query. The LLM calls (rephrasing, generation,
+    evaluation) run concurrently, at most `concurrency` at a time. Identical queries are
+    answered once.
+
+    Routing follows the orchestrator: with a `rephrase_threshold`, confident first-pass
+    results skip the Rephraser. The semantic answer cache is not consulted, so every
+    unique query gets its own answer.
+    """
+    def __init__(self, orchestrator: Orchestrator, concurrency: int = 8, window: int = 256):
+        """
+        Args:
+            orchestrator: Provides the agents, routing and fusion to reuse.
+            concurrency: The maximum number of LLM calls in flight.
+            window: The number of unique queries whose retrieval is batched together.
+        """
+        self.orchestrator = orchestrator
+        self.concurrency = concurrency
+        self.window = window
+
+    async def _search(self, queries: list[str]) -> list[list]:
+        if not queries:
+            return []
+        return _per_query(await self.orchestrator.retriever.asearch(queries), len(queries))
+
+    async def _llm(self, semaphore: asyncio.Semaphore, timings: dict, stage: str, call):
+        async with semaphore:
+            start = time.perf_counter()
+            with get_telemetry().span("batch." + stage):
+                result = await call
+            # Summed, so a regenerated answer's second call is included.
+            timings[stage + "_s"] = round(timings.get(stage + "_s", 0.0) + time.perf_counter() - start, 4)
+            return result
+
+    async def _answer(self, state: dict, semaphore: asyncio.Semaphore) -> dict:
+        orchestrator = self.orchestrator
+        timings = state["timings"]
+        query = state["original_query"]
+        # Like the graph's evaluator -> generator edge: a rejected answer is regenerated
+        # from the same documents until the orchestrator's attempt limit.
+        while "final_answer" not in state:
+            previous_answer = orchestrator._previous_answer(state)
+            context = orchestrator._context(state, orchestrator.generator)
+            state["generated_answer"] = await self._llm(semaphore, timings, "generate", orchestrator.generator.agenerate(query, context, previous_answer))
+            state["generation_attempts"] = (state.get("generation_attempts") or 0) + 1
+            context = orchestrator._context(state, orchestrator.evaluator)
+            is_faithful = await self._llm(semaphore, timings, "evaluate", orchestrator.evaluator.aevaluate(query, context, state["generated_answer"]))
+            state.update(orchestrator._verdict(state, is_faithful))
+        return state
+
+    async def _run_window(self, queries: list[str], semaphore: asyncio.Semaphore):
+        """Yields the final state of each query as soon as it is answered."""
+        orchestrator = self.orchestrator
+        start = time.perf_counter()
+        states = [{"original_query": query, "timings": {}} for query in queries]
+
+        with get_telemetry().span("batch.first_pass", queries=len(queries)):
+            first_pass = await self._search(queries)
+        first_pass_s = round(time.perf_counter() - start, 4)
+        for state, results in zip(states, first_pass):
+            state["first_pass_results"] = orchestrator._refs(results)
+            state["timings"]["first_pass_s"] = first_pass_s
+
+        to_rephrase = []
+        for state in states:
+            if orchestrator.rephrase_threshold is None:
+                orchestrator._count_route("rephrased")
+                to_rephrase.append(state)
+            elif orchestrator.route_after_first_pass(state) == "rephraser":
+                to_rephrase.append(state)
+        rephrased = await asyncio.gather(*(
+            self._llm(semaphore, state["timings"], "rephrase", orchestrator.rephraser.arephrase(state["original_query"]))
+            for state in to_rephrase
+        ))
+        for state, variants in zip(to_rephrase, rephrased):
+            state["rephrased_queries"] = variants
+
+        # Every new variant in the window is embedded and searched in one call.
+        variants = list(dict.fromkeys(variant for state in to_rephrase for variant in orchestrator._new_queries(state)))
+        retrieval_start = time.perf_counter()
+        with get_telemetry().span("batch.retrieval", queries=len(variants)):
+            variant_results = dict(zip(variants, await self._search(variants)))
+        retrieval_s = round(time.perf_counter() - retrieval_start, 4)
+        for state in states:
+            results = []
+            if "rephrased_queries" in state:
+                state["timings"]["retrieval_s"] = retrieval_s
+                results = [hits for variant in orchestrator._new_queries(state) for hits in variant_results[variant]]
+            state.update(orchestrator._fuse(state, results))
+
+        pending = [asyncio.ensure_future(self._answer(state, semaphore)) for state in states]
+        try:
+            for future in asyncio.as_completed(pending):
+                try:
+                    state = await future
+                except Exception as e:
+                    logger.error("A batch query failed: %s", e)
+                    continue
+                state["timings"]["total_s"] = round(time.perf_counter() - start, 4)
+                yield state
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def arun(self, records: list[dict], done: set = frozenset()):
+        """
+        Answers the records not in `done`.
+
+        Args:
+            records: `{"id", "query", ...}` dicts, e.g. from `read_queries`.
+            done: IDs answered by an earlier run, which are skipped.
+
+        Yields:
+            One result per record, in completion order: its "id" and "query", the
+            "final_answer", "is_answer_faithful", "generation_attempts",
+            "rephrased_queries", the IDs of the retrieved chunks and per-stage
+            "timings" in seconds. Batched stages (first_pass_s, retrieval_s) report
+            the wall time of the whole batch, and total_s runs from the start of
+            the query's window.
+        """
+        by_query = {}
+        for record in records:
+            if record["id"] not in done:
+                by_query.setdefault(record["query"].strip(), []).append(record)
+        unique = list(by_query)
+        logger.info("Answering %d unique queries for %d records (%d already done).", len(unique), sum(map(len, by_query.values())), len(done))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        for window_start in range(0, len(unique), self.window):
+            async for state in self._run_window(unique[window_start:window_start + self.window], semaphore):
+                for record in by_query[state["original_query"]]:
+                    yield {
+                        **record,
+                        "final_answer": state["final_answer"],
+                        "is_answer_faithful": state["is_answer_faithful"],
+                        "generation_attempts": state["generation_attempts"],
+                        "rephrased_queries": state.get("rephrased_queries"),
+                        "chunk_ids": [ref["chunk_id"] for ref in state["retrieved_documents"]],
+                        "timings": state["timings"],
+                    }
+
+    async def arun_file(self, input_path: str, output_path: str, resume: bool = True) -> dict:
+        """
+        Answers a JSONL file of queries, appending one JSON result per line to `output_path`.
+
+        Each result is flushed as soon as it is written, so the output file doubles as the
+        checkpoint: with `resume`, records already in it are skipped. A query that fails
+        is logged and left out, so a resumed run retries it.
+
+        Returns:
+            Counts of "records", "skipped" (done before), "written" and "failed".
+        """
+        records = read_queries(input_path)
+        done = completed_ids(output_path) if resume else set()
+        pending = sum(1 for record in records if record["id"] not in done)
+        written = 0
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        with open(output_path, "a" if resume else "w", encoding="utf-8") as f:
+            async for result in self.arun(records, done):
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+                f.flush()
+                written += 1
+        return {"records": len(records), "skipped": len(records) - pending, "written": written, "failed": pending - written}
+
+    def run_file(self, input_path: str, output_path: str, resume: bool = True) -> dict:
+        """Synchronous wrapper around `arun_file`."""
+        return asyncio.run(self.arun_file(input_path, output_path, resume=resume))
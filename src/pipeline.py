@@ -0,0 +1,92 @@
+import os
+import threading
+
+from src.agents.orchestrator import Orchestrator
+from src.agents.retriever import Retriever
+from src.agents.generator import Generator
+from src.agents.rephraser import Rephraser
+from src.agents.evaluator import Evaluator
+from src.tools.answer_cache import SemanticAnswerCache
+from src.tools.bm25_index import BM25Index
+from src.tools.checkpoints import get_checkpointer
+from src.tools.ingestion import sync_documents
+from src.tools.llm_cache import CachedLLMClient, LLMResponseCache
+from src.tools.llm_client import get_llm_client
+from src.tools.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMScheduler
+from src.tools.vector_store import get_vector_store
+
+
+class RAGPipeline:
+    """
+    Builds the vector store, the agents and the orchestrator once, so they can be
+    reused across queries by the CLI, the query server and batch runs.
+    """
+    def __init__(self, data_directory: str = "./data", persist_directory: str = "./chroma_db", llm_cache: bool = True, answer_cache: bool = True, rephrase_threshold: float = None):
+        self.data_directory = data_directory
+        self.persist_directory = persist_directory
+        self._ingest_lock = threading.Lock()
+
+        self.vector_store = get_vector_store(persist_directory=persist_directory)
+        # The BM25 index is kept in step with the vector store for hybrid retrieval.
+        self.lexical_index = BM25Index(os.path.join(persist_directory, "bm25"))
+        # Only new or changed files are embedded; an unchanged corpus costs no embedding work.
+        self.ingestion_stats = sync_documents(self.vector_store, data_directory, persist_directory, lexical_index=self.lexical_index)
+
+        # All LLM calls share one scheduler: identical in-flight prompts are coalesced, the
+        # model host runs at most RAG_LLM_CONCURRENCY calls, and answer generation goes first.
+        self.llm_scheduler = LLMScheduler(
+            get_llm_client(),
+            max_concurrency=int(os.getenv("RAG_LLM_CONCURRENCY", "2")),
+            max_queue=int(os.getenv("RAG_LLM_MAX_QUEUE", "64")),
+        )
+        # Identical prompts (e.g. repeated FAQ-style questions) are answered from the response cache,
+        # which sits in front of the scheduler so hits never queue.
+        self.llm_cache = LLMResponseCache(os.path.join(persist_directory, "llm_cache.sqlite3"))
+        self.rephraser = Rephraser(llm_client=CachedLLMClient(self.llm_scheduler.client_for("rephraser", PRIORITY_BACKGROUND), self.llm_cache, enabled=llm_cache))
+        self.retriever = Retriever(vector_store=self.vector_store, lexical_index=self.lexical_index)
+        self.generator = Generator(llm_client=CachedLLMClient(self.llm_scheduler.client_for("generator", PRIORITY_INTERACTIVE), self.llm_cache, enabled=llm_cache))
+        # The evaluator's pre-filter reuses the loaded embedding model to skip the LLM judge on clear cases.
+        self.evaluator = Evaluator(llm_client=CachedLLMClient(self.llm_scheduler.client_for("evaluator", PRIORITY_BACKGROUND), self.llm_cache, enabled=llm_cache), embeddings=self.vector_store.embeddings)
+
+        self.answer_cache = None
+        if answer_cache:
+            # Near-duplicate questions are answered from previous runs against the same corpus version.
+            self.answer_cache = SemanticAnswerCache(
+                self.vector_store.embeddings,
+                os.path.join(persist_directory, "answer_cache.sqlite3"),
+                corpus_version=self.ingestion_stats["corpus_version"],
+            )
+
+        self.orchestrator = Orchestrator(
+            rephraser=self.rephraser,
+            retriever=self.retriever,
+            generator=self.generator,
+            evaluator=self.evaluator,
+            answer_cache=self.answer_cache,
+            rephrase_threshold=rephrase_threshold,
+            max_generation_attempts=int(os.getenv("RAG_MAX_GENERATION_ATTEMPTS", "2")),
+            checkpointer=get_checkpointer(persist_directory=persist_directory),
+        )
+
+    def warm_up(self):
+        """
+        Loads what the first query would otherwise wait for: the embedding model and the
+        compiled workflow. Short-lived CLI and batch runs skip this and load them on first use.
+        """
+        load_model = getattr(self.vector_store.embeddings, "load", None)
+        if load_model is not None:
+            load_model()
+        self.orchestrator.compile()
+
+    @property
+    def document_count(self) -> int:
+        stats = self.ingestion_stats
+        return stats["added"] + stats["updated"] + stats["unchanged"]
+
+    def ingest(self) -> dict:
+        """Re-syncs the corpus directory and invalidates cached answers if it changed."""
+        with self._ingest_lock:
+            self.ingestion_stats = sync_documents(self.vector_store, self.data_directory, self.persist_directory, lexical_index=self.lexical_index)
+            if self.answer_cache is not None:
+                self.answer_cache.set_corpus_version(self.ingestion_stats["corpus_version"])
+            return self.ingestion_stats
@@ -1,14 +1,29 @@
 from typing import TypedDict, List, Optional
 
+class ChunkRef(TypedDict):
+    """
+    A compact reference to a retrieved chunk. The text stays in the shared
+    `ChunkStore`, so the workflow state (and every checkpoint of it) stays small.
+    """
+    chunk_id: str
+    score: Optional[float]
+    source: Optional[str]
+    start: Optional[int]
+
 class AgentState(TypedDict):
     """
     Represents the state of our agentic RAG system.
     This state is passed between the nodes of our LangGraph.
     """
     original_query: str
+    cache_hit: Optional[bool]
     rephrased_queries: Optional[List[str]]
-    retrieved_documents: Optional[List[str]]
+    # One list of references per search, with the search distance as the score.
+    first_pass_results: Optional[List[List[ChunkRef]]]
+    # The fused chunks, most relevant first, with the fused score.
+    retrieved_documents: Optional[List[ChunkRef]]
     generated_answer: Optional[str]
+    generation_attempts: Optional[int]
     is_answer_faithful: Optional[bool]
     is_answer_verified: Optional[bool]
     final_answer: Optional[str]
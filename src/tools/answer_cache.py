@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+def _normalize(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return vector / norm
+
+
+class SemanticAnswerCache:
+    """
+    A small vector index of previously answered queries.
+
+    Each entry holds the query embedding, the final answer, its faithfulness verdict and
+    the corpus version it was produced against. A lookup returns the closest entry whose
+    cosine similarity clears `threshold`; entries from another corpus version never match.
+    The normalized query embeddings are kept as one matrix, so a lookup is a single
+    matrix-vector product.
+    """
+    def __init__(self, embeddings, path: str = "./chroma_db/answer_cache.sqlite3", threshold: float = 0.92, max_entries: int = 1000, corpus_version: str = ""):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.embeddings = embeddings
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, query TEXT NOT NULL, vector BLOB NOT NULL, "
+            "final_answer TEXT NOT NULL, is_answer_faithful INTEGER NOT NULL, "
+            "corpus_version TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+        self._entries = []
+        self._vectors = None
+        self.corpus_version = None
+        self.set_corpus_version(corpus_version)
+
+    def set_corpus_version(self, corpus_version: str):
+        """Drops every entry produced against a different corpus version."""
+        with self._lock:
+            self.corpus_version = corpus_version
+            self._connection.execute("DELETE FROM answers WHERE corpus_version != ?", (corpus_version,))
+            self._connection.commit()
+            self._entries = []
+            vectors = []
+            for entry_id, query, blob, final_answer, is_faithful in self._connection.execute(
+                "SELECT id, query, vector, final_answer, is_answer_faithful FROM answers ORDER BY id"
+            ):
+                vectors.append(np.frombuffer(blob, dtype=np.float32))
+                self._entries.append((entry_id, query, final_answer, bool(is_faithful)))
+            self._vectors = np.vstack(vectors) if vectors else None
+
+    def lookup(self, query: str):
+        """
+        Returns the cached answer for the most similar previous query, or None.
+
+        Returns:
+            A dict with `query`, `final_answer`, `is_answer_faithful` and `similarity`.
+        """
+        vector = _normalize(self.embeddings.embed_query(query))
+        with self._lock:
+            best, best_similarity = None, -1.0
+            if self._vectors is not None:
+                similarities = self._vectors @ vector
+                index = int(np.argmax(similarities))
+                best, best_similarity = self._entries[index], float(similarities[index])
+
+            if best is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"query": best[1], "final_answer": best[2], "is_answer_faithful": best[3], "similarity": best_similarity}
+
+    def store(self, query: str, final_answer: str, is_answer_faithful: bool):
+        """Adds an answered query, evicting the oldest entries beyond `max_entries`."""
+        vector = _normalize(self.embeddings.embed_query(query))
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT INTO answers (query, vector, final_answer, is_answer_faithful, corpus_version, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (query, vector.tobytes(), final_answer, int(is_answer_faithful), self.corpus_version, time.time()),
+            )
+            self._entries.append((cursor.lastrowid, query, final_answer, bool(is_answer_faithful)))
+            self._vectors = vector[None, :] if self._vectors is None else np.vstack([self._vectors, vector])
+            if len(self._entries) > self.max_entries:
+                evicted, self._entries = self._entries[:-self.max_entries], self._entries[-self.max_entries:]
+                self._vectors = self._vectors[-self.max_entries:]
+                self._connection.executemany("DELETE FROM answers WHERE id = ?", [(entry[0],) for entry in evicted])
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0, "entries": len(self._entries)}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
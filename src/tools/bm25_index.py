@@ -0,0 +1,244 @@
+import array
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from operator import itemgetter
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_.:/][a-z0-9]+)*")
+_TOKEN_SEPARATOR = re.compile(r"[-_.:/]")
+# Function words match nearly every chunk, so they add posting-list work but no ranking signal.
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can do does did for from had has have he her his i if in into is it its "
+    "me my no not of on or our she so than that the their them then there these they this those to was we were "
+    "what when where which who whom why will with would you your".split()
+)
+
+META_FILENAME = "meta.json"
+POSTINGS_FILENAME = "postings.bin"
+FREQUENCIES_FILENAME = "frequencies.bin"
+LENGTHS_FILENAME = "lengths.bin"
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercases and splits text into terms, dropping stopwords. Compound tokens such as
+    IDs and error codes ("err-1042", "v2.3.1") are kept whole and also indexed by their parts.
+    """
+    tokens = []
+    for match in _TOKEN.findall(text.lower()):
+        if match in STOPWORDS:
+            continue
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in _TOKEN_SEPARATOR.split(match) if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    An in-process BM25 inverted index over chunk texts, keyed by chunk ID.
+
+    Postings are array-backed. On disk they are stored as flat uint32 arrays that are
+    memory-mapped on load, so opening a large index costs only the vocabulary and
+    per-document lengths. Additions after loading go to an in-memory delta and deletions
+    are tombstoned; `save` compacts both into a new set of files.
+
+    Stopwords are not indexed, and query terms found in more than `max_df` of the chunks
+    are skipped (unless every query term is that common): their IDF is near zero, yet
+    scoring them would walk most of the postings.
+    """
+    def __init__(self, directory: str = None, k1: float = 1.2, b: float = 0.75, max_df: float = 0.5):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        self._lock = threading.RLock()
+        self._mmaps = []
+        self._reset()
+        if directory and os.path.exists(os.path.join(directory, META_FILENAME)):
+            self._load()
+
+    def _reset(self):
+        self._doc_ids = []              # doc number -> chunk ID, None once deleted
+        self._doc_numbers = {}          # chunk ID -> doc number
+        self._doc_lengths = array.array("I")
+        self._total_length = 0
+        self._base_terms = {}           # term -> (offset, count) into the mapped arrays
+        self._base_docs = array.array("I")
+        self._base_frequencies = array.array("I")
+        self._delta = {}                # term -> (doc numbers, term frequencies)
+        self.dirty = False              # True when there are changes not yet saved
+
+    def __len__(self) -> int:
+        return len(self._doc_numbers)
+
+    def add(self, chunk_id: str, text: str):
+        """Indexes a chunk, replacing any previous version with the same ID."""
+        with self._lock:
+            if chunk_id in self._doc_numbers:
+                self.delete([chunk_id])
+            doc = len(self._doc_ids)
+            self._doc_ids.append(chunk_id)
+            self._doc_numbers[chunk_id] = doc
+            self.dirty = True
+            counts = Counter(tokenize(text))
+            length = sum(counts.values())
+            self._doc_lengths.append(length)
+            self._total_length += length
+            for term, frequency in counts.items():
+                docs, frequencies = self._delta.setdefault(term, (array.array("I"), array.array("I")))
+                docs.append(doc)
+                frequencies.append(frequency)
+
+    def add_documents(self, documents: list, ids: list[str] = None):
+        """Indexes Documents, by `ids` or else by their `chunk_id` metadata."""
+        ids = ids or [doc.metadata["chunk_id"] for doc in documents]
+        for chunk_id, doc in zip(ids, documents):
+            self.add(chunk_id, doc.page_content)
+
+    def delete(self, ids: list[str]):
+        with self._lock:
+            for chunk_id in ids:
+                doc = self._doc_numbers.pop(chunk_id, None)
+                if doc is None:
+                    continue
+                self._doc_ids[doc] = None
+                self._total_length -= self._doc_lengths[doc]
+                self.dirty = True
+
+    def _postings(self, term: str):
+        if term in self._base_terms:
+            offset, count = self._base_terms[term]
+            yield from zip(self._base_docs[offset:offset + count], self._base_frequencies[offset:offset + count])
+        if term in self._delta:
+            yield from zip(*self._delta[term])
+
+    def _document_frequency(self, term: str) -> int:
+        """The number of postings of `term`, counting chunks deleted since the last save."""
+        base = self._base_terms.get(term, (0, 0))[1]
+        return base + (len(self._delta[term][0]) if term in self._delta else 0)
+
+    def _query_terms(self, query: str, live: int) -> list[str]:
+        terms = set(tokenize(query))
+        frequencies = {term: self._document_frequency(term) for term in terms}
+        selective = [term for term in terms if frequencies[term] <= self.max_df * live]
+        if selective or not terms:
+            return selective
+        return [min(terms, key=frequencies.__getitem__)]
+
+    def search(self, query: str, k: int = 4) -> list[tuple[str, float]]:
+        """
+        Returns up to `k` (chunk ID, BM25 score) pairs, best first.
+        """
+        with self._lock:
+            live = len(self._doc_numbers)
+            if not live:
+                return []
+            average_length = self._total_length / live or 1.0
+            scores = {}
+            for term in self._query_terms(query, live):
+                postings = [(doc, frequency) for doc, frequency in self._postings(term) if self._doc_ids[doc] is not None]
+                if not postings:
+                    continue
+                idf = math.log(1 + (live - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, frequency in postings:
+                    length_norm = 1 - self.b + self.b * self._doc_lengths[doc] / average_length
+                    scores[doc] = scores.get(doc, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+            top = heapq.nlargest(k, scores.items(), key=itemgetter(1))
+            return [(self._doc_ids[doc], score) for doc, score in top]
+
+    def save(self, directory: str = None):
+        """Compacts deletions and the in-memory delta into a fresh on-disk index."""
+        directory = directory or self.directory
+        if directory is None:
+            raise ValueError("BM25Index.save needs a directory.")
+        os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            renumbered = {}
+            doc_ids = []
+            doc_lengths = array.array("I")
+            for doc, chunk_id in enumerate(self._doc_ids):
+                if chunk_id is not None:
+                    renumbered[doc] = len(doc_ids)
+                    doc_ids.append(chunk_id)
+                    doc_lengths.append(self._doc_lengths[doc])
+
+            terms, offsets, counts = [], [], []
+            docs = array.array("I")
+            frequencies = array.array("I")
+            for term in sorted(set(self._base_terms) | set(self._delta)):
+                start = len(docs)
+                for doc, frequency in self._postings(term):
+                    if doc in renumbered:
+                        docs.append(renumbered[doc])
+                        frequencies.append(frequency)
+                if len(docs) > start:
+                    terms.append(term)
+                    offsets.append(start)
+                    counts.append(len(docs) - start)
+
+            for filename, values in ((POSTINGS_FILENAME, docs), (FREQUENCIES_FILENAME, frequencies), (LENGTHS_FILENAME, doc_lengths)):
+                with open(os.path.join(directory, f"{filename}.tmp"), "wb") as f:
+                    values.tofile(f)
+            # The vocabulary is stored as parallel flat arrays, which parse much faster than a nested mapping.
+            meta = {"k1": self.k1, "b": self.b, "byteorder": sys.byteorder, "doc_ids": doc_ids, "terms": terms, "offsets": offsets, "counts": counts}
+            with open(os.path.join(directory, f"{META_FILENAME}.tmp"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, separators=(",", ":"))
+
+            self._close_maps()
+            # meta.json is replaced last, so a crash mid-save leaves the old index readable.
+            for filename in (POSTINGS_FILENAME, FREQUENCIES_FILENAME, LENGTHS_FILENAME, META_FILENAME):
+                os.replace(os.path.join(directory, f"{filename}.tmp"), os.path.join(directory, filename))
+            self.directory = directory
+            self._load()
+
+    def _map(self, path: str, byteorder: str):
+        if os.path.getsize(path) == 0:
+            return array.array("I")
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if byteorder != sys.byteorder:
+            values = array.array("I", mapped[:])
+            values.byteswap()
+            mapped.close()
+            return values
+        view = memoryview(mapped).cast("I")
+        self._mmaps.append((view, mapped))
+        return view
+
+    def _close_maps(self):
+        self._base_docs = self._base_frequencies = array.array("I")
+        for view, mapped in self._mmaps:
+            view.release()
+            mapped.close()
+        self._mmaps = []
+
+    def _load(self):
+        with open(os.path.join(self.directory, META_FILENAME), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self._reset()
+        self.k1, self.b = meta["k1"], meta["b"]
+        byteorder = meta.get("byteorder", sys.byteorder)
+
+        self._doc_ids = list(meta["doc_ids"])
+        self._doc_numbers = {chunk_id: doc for doc, chunk_id in enumerate(self._doc_ids)}
+        with open(os.path.join(self.directory, LENGTHS_FILENAME), "rb") as f:
+            self._doc_lengths.frombytes(f.read())
+        if byteorder != sys.byteorder:
+            self._doc_lengths.byteswap()
+        self._total_length = sum(self._doc_lengths)
+        self._base_terms = dict(zip(meta["terms"], zip(meta["offsets"], meta["counts"])))
+        self._base_docs = self._map(os.path.join(self.directory, POSTINGS_FILENAME), byteorder)
+        self._base_frequencies = self._map(os.path.join(self.directory, FREQUENCIES_FILENAME), byteorder)
+
+    def close(self):
+        with self._lock:
+            self._close_maps()
@@ -0,0 +1,34 @@
+import os
+import sqlite3
+
+CHECKPOINTERS = ("memory", "sqlite", "none")
+
+
+def get_checkpointer(kind: str = None, persist_directory: str = "./chroma_db"):
+    """
+    Returns a LangGraph checkpointer for the orchestrator's workflow state.
+
+    Args:
+        kind: "memory" (in-process; runs can be resumed until the process exits),
+            "sqlite" (survives restarts; needs `langgraph-checkpoint-sqlite` and serves the
+            synchronous `run`, `resume` and `stream_answer`) or "none". Defaults to the
+            RAG_CHECKPOINTER environment variable, then "memory".
+        persist_directory: Where the SQLite database is kept.
+    """
+    kind = (kind or os.getenv("RAG_CHECKPOINTER", "memory")).lower()
+    if kind not in CHECKPOINTERS:
+        raise ValueError(f"Unknown checkpointer '{kind}'. Expected one of {', '.join(CHECKPOINTERS)}.")
+    if kind == "none":
+        return None
+    if kind == "memory":
+        from langgraph.checkpoint.memory import MemorySaver
+
+        return MemorySaver()
+
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise RuntimeError("The SQLite checkpointer needs the langgraph-checkpoint-sqlite package.") from e
+    os.makedirs(persist_directory, exist_ok=True)
+    connection = sqlite3.connect(os.path.join(persist_directory, "checkpoints.sqlite3"), check_same_thread=False)
+    return SqliteSaver(connection)
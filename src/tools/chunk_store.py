@@ -0,0 +1,105 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from src.schemas.state import ChunkRef
+from src.tools.context_packer import DEFAULT_TOKEN_BUDGET, pack_context
+from src.tools.fusion import chunk_key
+from src.tools.vector_store import get_documents
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_ref(document, score: float = None) -> ChunkRef:
+    """Returns the reference to a retrieved Document: its chunk ID, score and source offset."""
+    metadata = document.metadata or {}
+    return {"chunk_id": chunk_key(document), "score": score, "source": metadata.get("source"), "start": metadata.get("start_index")}
+
+
+class ChunkStore:
+    """
+    A shared, size-bounded cache of retrieved chunks, so the workflow state can carry
+    `ChunkRef`s instead of chunk text.
+
+    Retrieval registers the Documents it returns; the Generator and Evaluator prompts
+    resolve references back to the same Document objects, so no text is copied per query.
+    A chunk evicted from the cache (or referenced by a checkpoint written by another
+    process) is fetched from the vector store by ID. Chunk IDs include the file hash,
+    so a cached chunk never goes stale.
+
+    The packed context of a set of references is also cached, so the Generator and the
+    Evaluator (and a regenerated answer) share one rendered context string.
+    """
+    def __init__(self, vector_store=None, max_chunks: int = 10_000, max_contexts: int = 256):
+        """
+        Args:
+            vector_store: The store evicted chunks are fetched from.
+            max_chunks: The number of chunks kept in memory.
+            max_contexts: The number of packed contexts kept in memory.
+        """
+        self.vector_store = vector_store
+        self.max_chunks = max_chunks
+        self.max_contexts = max_contexts
+        self._chunks = OrderedDict()
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _remember(cache: OrderedDict, key, value, limit: int):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+    def refs(self, hits: list[tuple]) -> list[ChunkRef]:
+        """Registers (document, score) pairs, e.g. one search result, and returns their references."""
+        refs = []
+        with self._lock:
+            for document, score in hits:
+                ref = chunk_ref(document, score)
+                self._remember(self._chunks, ref["chunk_id"], document, self.max_chunks)
+                refs.append(ref)
+        return refs
+
+    def hits(self, refs: list[ChunkRef]) -> list[tuple]:
+        """
+        Resolves references to (document, score) pairs, in order.
+
+        Chunks no longer in memory are fetched from the vector store in one call; chunks
+        that cannot be found there either are left out.
+        """
+        chunk_ids = list(dict.fromkeys(ref["chunk_id"] for ref in refs))
+        with self._lock:
+            found = {chunk_id: self._chunks[chunk_id] for chunk_id in chunk_ids if chunk_id in self._chunks}
+            for chunk_id in found:
+                self._chunks.move_to_end(chunk_id)
+        missing = [chunk_id for chunk_id in chunk_ids if chunk_id not in found]
+        if missing and self.vector_store is not None:
+            fetched = get_documents(self.vector_store, missing)
+            with self._lock:
+                for chunk_id, document in fetched.items():
+                    self._remember(self._chunks, chunk_id, document, self.max_chunks)
+            found.update(fetched)
+        if len(found) < len(chunk_ids):
+            logger.warning("%d referenced chunks are no longer available.", len(chunk_ids) - len(found))
+        return [(found[ref["chunk_id"]], ref["score"]) for ref in refs if ref["chunk_id"] in found]
+
+    def documents(self, refs: list[ChunkRef]) -> list:
+        """Resolves references to their Documents, in order; see `hits`."""
+        return [document for document, _ in self.hits(refs)]
+
+    def context(self, refs: list[ChunkRef], token_budget: int = DEFAULT_TOKEN_BUDGET) -> str:
+        """Returns the packed context of the referenced chunks (see `pack_context`), rendering it once."""
+        key = (tuple(ref["chunk_id"] for ref in refs), token_budget)
+        with self._lock:
+            context = self._contexts.get(key)
+            if context is not None:
+                self._contexts.move_to_end(key)
+                return context
+        context = pack_context(self.documents(refs), token_budget=token_budget)
+        with self._lock:
+            self._remember(self._contexts, key, context, self.max_contexts)
+        return context
@@ -0,0 +1,93 @@
+import math
+
+# Rough characters-per-token ratio for English text with Llama-style tokenizers.
+CHARS_PER_TOKEN = 4.0
+
+DEFAULT_TOKEN_BUDGET = 2048
+
+
+def estimate_tokens(text: str, chars_per_token: float = CHARS_PER_TOKEN) -> int:
+    """Estimates the number of prompt tokens `text` will occupy."""
+    return math.ceil(len(text) / chars_per_token)
+
+
+def _as_segment(rank: int, document) -> dict:
+    if isinstance(document, str):
+        return {"rank": rank, "source": None, "start": None, "text": document}
+    metadata = getattr(document, "metadata", None) or {}
+    return {"rank": rank, "source": metadata.get("source"), "start": metadata.get("start_index"), "text": document.page_content}
+
+
+def merge_chunks(documents: list) -> list[dict]:
+    """
+    Merges adjacent or overlapping chunks of the same source into single segments.
+
+    Chunks are located by their `source` and `start_index` metadata; plain strings and
+    chunks without offsets are kept as they are. Each segment keeps the best (lowest)
+    rank of the chunks it was built from.
+
+    Returns:
+        Segments as dicts with `rank`, `source`, `start` and `text`, best rank first.
+    """
+    segments = [_as_segment(rank, document) for rank, document in enumerate(documents)]
+    positioned = {}
+    merged = []
+    for segment in segments:
+        if segment["source"] is None or segment["start"] is None:
+            merged.append(segment)
+        else:
+            positioned.setdefault(segment["source"], []).append(segment)
+
+    for source_segments in positioned.values():
+        source_segments.sort(key=lambda s: s["start"])
+        current = dict(source_segments[0])
+        for segment in source_segments[1:]:
+            current_end = current["start"] + len(current["text"])
+            if segment["start"] <= current_end:
+                overlap = current_end - segment["start"]
+                current["text"] += segment["text"][overlap:]
+                current["rank"] = min(current["rank"], segment["rank"])
+            else:
+                merged.append(current)
+                current = dict(segment)
+        merged.append(current)
+
+    merged.sort(key=lambda s: s["rank"])
+    return merged
+
+
+def pack_context(documents: list, token_budget: int = DEFAULT_TOKEN_BUDGET, separator: str = "\n\n") -> str:
+    """
+    Assembles the context passed to the LLM prompts.
+
+    Overlapping chunks are merged, segments are ordered by relevance (the input order),
+    and segments are added until `token_budget` is reached. A segment that does not fit
+    is skipped in favour of smaller, less relevant ones; if not even the most relevant
+    segment fits, it is truncated to the budget.
+
+    Args:
+        documents: Retrieved chunks, most relevant first, as strings or Documents; or a
+            context that is already packed (e.g. by `ChunkStore.context`), returned as it is.
+        token_budget: The maximum number of tokens the context may occupy.
+        separator: The string placed between segments.
+
+    Returns:
+        The packed context string.
+    """
+    if isinstance(documents, str):
+        return documents
+
+    packed = []
+    used = 0
+    separator_tokens = estimate_tokens(separator)
+    for segment in merge_chunks(documents):
+        cost = estimate_tokens(segment["text"]) + (separator_tokens if packed else 0)
+        if used + cost <= token_budget:
+            packed.append(segment["text"])
+            used += cost
+
+    if not packed and documents:
+        first = merge_chunks(documents)[0]["text"]
+        packed.append(first[:int(token_budget * CHARS_PER_TOKEN)])
+
+    return separator.join(packed)
@@ -0,0 +1,144 @@
+import array
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes text so trivially different spellings of the same input share a cache entry."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def _encode_vector(vector, dtype: str) -> bytes:
+    if dtype == "float16":
+        return struct.pack(f"<{len(vector)}e", *vector)
+    return array.array("f", vector).tobytes()
+
+
+def _decode_vector(blob: bytes, dtype: str) -> array.array:
+    if dtype == "float16":
+        return array.array("f", struct.unpack(f"<{len(blob) // 2}e", blob))
+    values = array.array("f")
+    values.frombytes(blob)
+    return values
+
+
+class EmbeddingCache:
+    """
+    A persistent embedding cache keyed by (model name, normalized text hash).
+
+    Vectors are stored in SQLite as packed float32 (or float16) blobs, with a
+    size-bounded in-memory LRU in front. Lookups and inserts are batched so callers
+    only send cache misses to the model.
+    """
+    def __init__(self, path: str = "./chroma_db/embedding_cache.sqlite3", dtype: str = "float32", max_memory_items: int = 10_000):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported embedding cache dtype '{dtype}'. Expected 'float32' or 'float16'.")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.dtype = dtype
+        self.max_memory_items = max_memory_items
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, key TEXT NOT NULL, dtype TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, key))"
+        )
+        self._connection.commit()
+
+    def _remember(self, cache_key, vector):
+        self._memory[cache_key] = vector
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model_name: str, texts: list[str]) -> list:
+        """
+        Looks up the embeddings of several texts.
+
+        Returns:
+            One entry per text: the cached vector, or None on a miss.
+        """
+        keys = [text_key(text) for text in texts]
+        results = [None] * len(texts)
+        with self._lock:
+            missing = {}
+            for i, key in enumerate(keys):
+                vector = self._memory.get((model_name, key))
+                if vector is not None:
+                    self._memory.move_to_end((model_name, key))
+                    results[i] = vector.tolist()
+                else:
+                    missing.setdefault(key, []).append(i)
+
+            missing_keys = list(missing)
+            for start in range(0, len(missing_keys), 500):
+                batch = missing_keys[start:start + 500]
+                rows = self._connection.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    [model_name, *batch],
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    vector = _decode_vector(blob, dtype)
+                    self._remember((model_name, key), vector)
+                    for i in missing[key]:
+                        results[i] = vector.tolist()
+
+            found = sum(result is not None for result in results)
+            self.hits += found
+            self.misses += len(texts) - found
+        return results
+
+    def put_many(self, model_name: str, texts: list[str], vectors: list) -> list:
+        """
+        Stores the embeddings of several texts.
+
+        Returns:
+            The vectors as stored (rounded in float16 mode). Callers should use these
+            for the miss, so a text embeds the same whether or not it was cached.
+        """
+        rows = []
+        stored = []
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                blob = _encode_vector(vector, self.dtype)
+                # Keep what was stored, so memory and disk hits return identical vectors.
+                decoded = _decode_vector(blob, self.dtype)
+                self._remember((model_name, key), decoded)
+                stored.append(decoded.tolist())
+                rows.append((model_name, key, self.dtype, blob))
+            self._connection.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._connection.commit()
+        return stored
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters, the hit rate and the bytes used on disk and in memory."""
+        with self._lock:
+            disk_bytes = self._connection.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+            memory_bytes = sum(vector.itemsize * len(vector) for vector in self._memory.values())
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": memory_bytes,
+                "disk_bytes": disk_bytes,
+            }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,115 @@
+import logging
+import os
+import shutil
+import time
+
+from src.tools.context_packer import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODES = ("fp32", "int8", "onnx")
+
+# all-MiniLM-L6-v2 truncates inputs at 256 word pieces, so longer texts cost no more.
+MAX_TOKENS_PER_TEXT = 256
+DEFAULT_TOKEN_BUDGET = 8192
+
+
+def load_sentence_transformer(model_name: str, mode: str = "fp32", snapshot_directory: str = None):
+    """
+    Loads a sentence-transformers model for CPU inference.
+
+    Args:
+        model_name: The Hugging Face model name.
+        mode: "fp32" (unchanged), "int8" (dynamic int8 quantization of the linear layers)
+            or "onnx" (ONNX Runtime backend; needs `sentence-transformers[onnx]`).
+        snapshot_directory: Where a local copy of the model is kept. The first load saves
+            it there; later loads read it from disk without resolving the model on the
+            Hugging Face Hub and, for "onnx", without exporting it again.
+    """
+    if mode not in EMBEDDING_MODES:
+        raise ValueError(f"Unknown embedding mode '{mode}'. Expected one of {', '.join(EMBEDDING_MODES)}.")
+    from sentence_transformers import SentenceTransformer
+
+    backend = "onnx" if mode == "onnx" else "torch"
+    snapshot = os.path.join(snapshot_directory, f"{model_name.replace('/', '--')}-{backend}") if snapshot_directory else None
+    source = snapshot if snapshot and os.path.isdir(snapshot) else model_name
+    start = time.perf_counter()
+    if mode == "onnx":
+        model = SentenceTransformer(source, device="cpu", backend="onnx")
+    else:
+        model = SentenceTransformer(source, device="cpu")
+    logger.info("Loaded embedding model %s from %s in %.2fs.", model_name, "the snapshot" if source == snapshot else "the Hub cache", time.perf_counter() - start)
+    if snapshot and source != snapshot:
+        # Saved under a temporary name first, so an interrupted save is never loaded.
+        shutil.rmtree(f"{snapshot}.tmp", ignore_errors=True)
+        model.save(f"{snapshot}.tmp")
+        os.replace(f"{snapshot}.tmp", snapshot)
+    # Quantization is quick, so the snapshot keeps the fp32 weights it starts from.
+    if mode == "int8":
+        import torch
+
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def bucket_batches(texts: list[str], token_budget: int = DEFAULT_TOKEN_BUDGET, max_batch_size: int = 256) -> list[list[int]]:
+    """
+    Groups texts of similar length into batches, longest first.
+
+    Every text in a batch is padded to the longest one, so a batch costs roughly
+    (batch size × longest text) tokens. Batches are filled up to `token_budget` of that
+    padded size: short texts go in large batches and long texts in small ones.
+
+    Returns:
+        Batches of indices into `texts`.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+    batches = []
+    batch, width = [], 0
+    for i in order:
+        tokens = min(estimate_tokens(texts[i]) + 2, MAX_TOKENS_PER_TEXT)
+        if batch and ((len(batch) + 1) * width > token_budget or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        if not batch:
+            width = tokens
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class BatchSizeTuner:
+    """
+    Picks the token budget per batch that gives the best throughput on this machine.
+
+    The first call with at least `sample_size` texts encodes a sample once per candidate
+    budget and keeps the fastest; the sample's embeddings from that run are returned, so
+    the tuning pass does no wasted work beyond the slower candidates.
+    """
+    def __init__(self, candidates: tuple = (2048, 4096, 8192, 16384), sample_size: int = 256):
+        self.candidates = candidates
+        self.sample_size = sample_size
+        self.token_budget = None
+        self.throughput = {}
+
+    def tune(self, encode_batches, texts: list[str]) -> list:
+        """
+        Args:
+            encode_batches: Callable `(texts, token_budget) -> embeddings`.
+            texts: The texts to embed; the first `sample_size` are used for tuning.
+
+        Returns:
+            The embeddings of the sample.
+        """
+        sample = texts[:self.sample_size]
+        best = None
+        for budget in self.candidates:
+            start = time.perf_counter()
+            embeddings = encode_batches(sample, budget)
+            self.throughput[budget] = len(sample) / max(time.perf_counter() - start, 1e-9)
+            if best is None or self.throughput[budget] > self.throughput[best[0]]:
+                best = (budget, embeddings)
+        self.token_budget = best[0]
+        logger.info("Embedding batch budget tuned to %d tokens (%.0f texts/s).", self.token_budget, self.throughput[self.token_budget])
+        return best[1]
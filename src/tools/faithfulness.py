@@ -0,0 +1,101 @@
+import re
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.tools.fusion import cosine_similarity
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "which who what when where how yes".split()
+)
+# Kept as content words: "X is not Y" must not count as support for "X is Y".
+_NEGATIONS = frozenset("not no never none nor cannot without".split())
+# The Generator is told to say so when the context lacks the answer; that makes no claim to check.
+_ABSTENTION = re.compile(r"(?:\bnot|n't) (?:have|contain|provide) enough information|\bnot enough information|\bcannot (?:be )?answer", re.IGNORECASE)
+
+
+def split_sentences(text: str) -> list[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+def content_words(text: str) -> set[str]:
+    text = text.lower().replace("n't", " not")
+    return {word for word in _WORD.findall(text) if word not in _STOPWORDS}
+
+
+@dataclass
+class FaithfulnessCheck:
+    """
+    The outcome of the local pre-filter.
+
+    `verdict` is True (clearly supported), False (clearly unsupported) or None when the
+    case is ambiguous and should go to the LLM judge. `supporting_sentences` are the
+    context sentences closest to each answer sentence, in context order.
+    """
+    verdict: Optional[bool]
+    score: float
+    supporting_sentences: list[str] = field(default_factory=list)
+
+
+class FaithfulnessPrefilter:
+    """
+    A cheap first-tier faithfulness check using the already-loaded embedding model.
+
+    Each answer sentence gets two support signals: its best embedding similarity to a
+    context sentence, and the share of its content words (negations included) found in
+    a single context sentence. A sentence is accepted only when both signals reach
+    `accept_threshold` and it agrees in polarity with that context sentence, and rejected
+    only when both are below `reject_threshold`; anything else, such as a sentence that
+    recombines words from different context sentences, goes to the LLM judge. The answer
+    is rejected if any sentence is, and accepted only if every sentence is. Sentences
+    saying the context lacks the answer make no claim and are skipped.
+    """
+    def __init__(self, embeddings, accept_threshold: float = 0.8, reject_threshold: float = 0.3, supporting_per_sentence: int = 2):
+        self.embeddings = embeddings
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.supporting_per_sentence = supporting_per_sentence
+
+    def check(self, context: str, answer: str) -> FaithfulnessCheck:
+        answer_sentences = split_sentences(answer)
+        context_sentences = split_sentences(context)
+        if not answer_sentences or not context_sentences:
+            return FaithfulnessCheck(verdict=None, score=0.0, supporting_sentences=context_sentences)
+        claims = [sentence for sentence in answer_sentences if not _ABSTENTION.search(sentence)]
+        if not claims:
+            return FaithfulnessCheck(verdict=True, score=1.0)
+
+        vectors = self.embeddings.embed_documents(claims + context_sentences)
+        claim_vectors, context_vectors = vectors[:len(claims)], vectors[len(claims):]
+        context_words = [content_words(sentence) for sentence in context_sentences]
+
+        scores = []
+        verdicts = []
+        supporting = set()
+        for sentence, vector in zip(claims, claim_vectors):
+            similarities = [cosine_similarity(vector, other) for other in context_vectors]
+            ranked = sorted(range(len(similarities)), key=similarities.__getitem__, reverse=True)
+            supporting.update(ranked[:self.supporting_per_sentence])
+
+            words = content_words(sentence)
+            overlap, closest = max(((len(words & other) / len(words) if words else 1.0), i) for i, other in enumerate(context_words))
+            same_polarity = bool(words & _NEGATIONS) == bool(context_words[closest] & _NEGATIONS)
+            score = min(similarities[ranked[0]], overlap)
+            scores.append(score)
+
+            if score >= self.accept_threshold and same_polarity:
+                verdicts.append(True)
+            elif max(similarities[ranked[0]], overlap) < self.reject_threshold:
+                verdicts.append(False)
+            else:
+                verdicts.append(None)
+
+        if False in verdicts:
+            verdict = False
+        elif all(verdicts):
+            verdict = True
+        else:
+            verdict = None
+        return FaithfulnessCheck(verdict=verdict, score=min(scores), supporting_sentences=[context_sentences[i] for i in sorted(supporting)])
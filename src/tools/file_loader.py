@@ -1,29 +1,146 @@
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+import glob
+import logging
+import mmap
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+logger = logging.getLogger(__name__)
+
+# Files larger than this are split in several segments, cut at paragraph breaks.
+DEFAULT_SEGMENT_BYTES = 4 * 1024 * 1024
+
 def load_documents(directory_path: str = "./data"):
     """
     Loads documents from the specified directory, splits them into chunks, and returns them.
     """
-    print(f"Loading documents from {directory_path}...")
-    loader = DirectoryLoader(directory_path, glob="**/*.txt", loader_cls=TextLoader)
-    documents = loader.load()
+    logger.info("Loading documents from %s...", directory_path)
+    chunked_documents = list(iter_chunks(directory_path))
 
-    if not documents:
-        print("No documents found.")
+    if not chunked_documents:
+        logger.warning("No documents found.")
         return []
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunked_documents = text_splitter.split_documents(documents)
-
-    print(f"Loaded and split {len(documents)} documents into {len(chunked_documents)} chunks.")
+    logger.info("Loaded and split %d documents into %d chunks.", len({doc.metadata['source'] for doc in chunked_documents}), len(chunked_documents))
 
     return chunked_documents
 
+def get_text_splitter(chunk_size: int = 1000, chunk_overlap: int = 200):
+    """
+    Returns the splitter used for all ingestion. Chunks carry a `start_index`
+    metadata entry with their character offset in the source file.
+    """
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True)
+
+def load_file(file_path: str):
+    """
+    Loads a single text file and splits it into chunks.
+    """
+    return list(iter_chunks(files=[file_path], workers=1))
+
+def plan_segments(file_path: str, segment_bytes: int = DEFAULT_SEGMENT_BYTES) -> list[tuple[int, int]]:
+    """
+    Cuts a file into byte ranges of roughly `segment_bytes`, each ending at a paragraph
+    break (or a line break, or at worst a UTF-8 character boundary), so the segments can
+    be decoded and split independently. Only the bytes around each cut are read.
+    """
+    size = os.path.getsize(file_path)
+    if size <= segment_bytes:
+        return [(0, size)]
+
+    segments = []
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        start = 0
+        while size - start > segment_bytes:
+            target = start + segment_bytes
+            limit = min(size, target + segment_bytes // 4)
+            end = next((cut + len(separator) for separator in (b"\n\n", b"\n") if (cut := mapped.find(separator, target, limit)) != -1), None)
+            if end is None:
+                end = target
+                while end < size and mapped[end] & 0xC0 == 0x80:  # Never cut inside a multi-byte character.
+                    end += 1
+            segments.append((start, end))
+            start = end
+        segments.append((start, size))
+    return segments
+
+def _split_segment(file_path: str, start: int, end: int, chunk_size: int, chunk_overlap: int) -> tuple[list[tuple[str, int]], int]:
+    """
+    Decodes and splits one byte range of a file.
+
+    Returns:
+        (chunk text, segment-relative character offset) pairs, and the segment's length in characters.
+    """
+    if end <= start:
+        return [], 0
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        text = mapped[start:end].decode("utf-8")
+    documents = get_text_splitter(chunk_size, chunk_overlap).create_documents([text])
+    return [(doc.page_content, doc.metadata["start_index"]) for doc in documents], len(text)
+
+def iter_chunks(directory_path: str = "./data", pattern: str = "**/*.txt", files: list[str] = None, chunk_size: int = 1000, chunk_overlap: int = 200, workers: int = None, processes: bool = True, segment_bytes: int = DEFAULT_SEGMENT_BYTES):
+    """
+    Streams the chunks of a corpus, file by file, splitting files in parallel.
+
+    Large files are memory-mapped and cut into segments at paragraph breaks, so no
+    file is ever read whole and at most a few segments per worker are in flight.
+    Chunks come out in file and offset order, whatever order the workers finish in.
+
+    Args:
+        directory_path: The corpus directory, used when `files` is not given.
+        pattern: Glob of files to load, relative to `directory_path`.
+        files: An explicit list of files to load instead of globbing.
+        chunk_size: The splitter's maximum chunk length, in characters.
+        chunk_overlap: The splitter's overlap between neighbouring chunks.
+        workers: The pool size. Defaults to the CPU count; 1 splits in the calling thread.
+        processes: Split in spawned worker processes (all cores) rather than threads.
+        segment_bytes: The approximate size of the independently split file segments.
+
+    Yields:
+        Documents with `source` and `start_index` (character offset in the file) metadata.
+    """
+    if files is None:
+        files = [path for path in sorted(glob.glob(os.path.join(directory_path, pattern), recursive=True)) if os.path.isfile(path)]
+    tasks = ((path, start, end) for path in files for start, end in plan_segments(path, segment_bytes))
+    workers = workers or os.cpu_count() or 1
+
+    offsets = {}
+    def to_documents(path: str, split: tuple) -> list[Document]:
+        pieces, length = split
+        offset = offsets.get(path, 0)
+        offsets[path] = offset + length
+        return [Document(page_content=text, metadata={"source": path, "start_index": offset + start}) for text, start in pieces]
+
+    if workers == 1:
+        for path, start, end in tasks:
+            yield from to_documents(path, _split_segment(path, start, end, chunk_size, chunk_overlap))
+        return
+
+    if processes:
+        # Spawned, not forked: callers such as the ingest pipeline run this next to threads
+        # (embedding, serving), and a forked child can inherit their locks held and hang.
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    with executor:
+        # A bounded window of submitted segments keeps memory flat on multi-GB corpora.
+        pending = deque()
+        for path, start, end in tasks:
+            pending.append((path, executor.submit(_split_segment, path, start, end, chunk_size, chunk_overlap)))
+            if len(pending) >= 2 * workers:
+                path, future = pending.popleft()
+                yield from to_documents(path, future.result())
+        while pending:
+            path, future = pending.popleft()
+            yield from to_documents(path, future.result())
+
 if __name__ == "__main__":
     # This is for testing the file loader in isolation.
     # First, let's create a dummy file in the data directory.
-    import os
     if not os.path.exists("./data"):
         os.makedirs("./data")
     with open("./data/sample.txt", "w") as f:
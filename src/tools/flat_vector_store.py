@@ -0,0 +1,294 @@
+import json
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.documents import Document
+
+VECTORS_FILENAME = "vectors.npy"
+SCALES_FILENAME = "scales.npy"
+NORMS_FILENAME = "norms.npy"
+DOCUMENTS_FILENAME = "documents.sqlite3"
+
+
+class FlatVectorStore:
+    """
+    An exact-search vector store over a contiguous, memory-mapped embedding matrix.
+
+    Embeddings are kept as float32 (or per-row scaled int8) rows in a `.npy` file and
+    searched with one matrix multiply per block of rows plus `argpartition`, so a batch
+    of queries costs a single pass over the matrix. Chunk texts and metadata sit in a
+    SQLite side store and are only read for the rows that make the top k.
+
+    Distances are squared euclidean, like Chroma's default "l2" space. Deleted rows are
+    masked out and reclaimed by `compact`, which also runs once they outnumber live rows.
+    """
+    def __init__(self, embedding_function, persist_directory: str = "./chroma_db", collection_name: str = "rag_agentic_system", dtype: str = "float32", block_size: int = 65_536):
+        """
+        Args:
+            embedding_function: Embeds texts and queries (`embed_documents` / `embed_query`).
+            persist_directory: The parent directory; the store lives in `<collection_name>.flat` inside it.
+            collection_name: Names the store's directory.
+            dtype: "float32", or "int8" to quantize each row with its own scale (4x smaller).
+            block_size: The number of rows multiplied at once, which bounds scratch memory per search.
+        """
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"Unsupported vector dtype '{dtype}'. Expected 'float32' or 'int8'.")
+        self.embeddings = embedding_function
+        self.directory = os.path.join(persist_directory, f"{collection_name}.flat")
+        self.dtype = dtype
+        self.block_size = block_size
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(os.path.join(self.directory, DOCUMENTS_FILENAME), check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id TEXT PRIMARY KEY, row INTEGER NOT NULL UNIQUE, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._connection.commit()
+
+        meta = dict(self._connection.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("dtype", dtype) != dtype:
+            raise ValueError(f"The store at '{self.directory}' holds {meta['dtype']} vectors, not {dtype}.")
+        self._count = int(meta.get("count", 0))
+        self._vectors = self._scales = self._norms = None
+        if os.path.exists(self._path(VECTORS_FILENAME)):
+            self._open_arrays()
+
+        # Row -> chunk ID for every row below the count, None for deleted rows.
+        self._ids = [None] * self._count
+        for chunk_id, row in self._connection.execute("SELECT id, row FROM documents"):
+            self._ids[row] = chunk_id
+        self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids) if chunk_id is not None}
+        self._live = np.array([chunk_id is not None for chunk_id in self._ids], dtype=bool)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _open_arrays(self):
+        self._vectors = np.load(self._path(VECTORS_FILENAME), mmap_mode="r+")
+        self._norms = np.load(self._path(NORMS_FILENAME), mmap_mode="r+")
+        if self.dtype == "int8":
+            self._scales = np.load(self._path(SCALES_FILENAME), mmap_mode="r+")
+
+    def _allocate(self, capacity: int, dim: int):
+        """Moves the first `_count` rows into freshly allocated files of the given capacity."""
+        arrays = [(VECTORS_FILENAME, self._vectors, np.dtype(self.dtype), (capacity, dim)), (NORMS_FILENAME, self._norms, np.float32, (capacity,))]
+        if self.dtype == "int8":
+            arrays.append((SCALES_FILENAME, self._scales, np.float32, (capacity,)))
+
+        for filename, old, dtype, shape in arrays:
+            new = np.lib.format.open_memmap(self._path(f"{filename}.tmp"), mode="w+", dtype=dtype, shape=shape)
+            if old is not None and self._count:
+                new[:self._count] = old[:self._count]
+            new.flush()
+            del new
+        self._vectors = self._scales = self._norms = None
+        for filename, *_ in arrays:
+            os.replace(self._path(f"{filename}.tmp"), self._path(filename))
+        self._open_arrays()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _dequantize(self, rows) -> np.ndarray:
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vectors *= self._scales[rows][..., None]
+        return vectors
+
+    def add_documents(self, documents: list[Document], ids: list[str] = None) -> list[str]:
+        """
+        Embeds and stores documents, replacing any existing rows with the same IDs.
+
+        Returns:
+            The IDs of the stored documents.
+        """
+        if not documents:
+            return []
+        return self.add_embeddings(documents, self.embeddings.embed_documents([doc.page_content for doc in documents]), ids=ids)
+
+    def add_embeddings(self, documents: list[Document], embeddings: list[list[float]], ids: list[str] = None) -> list[str]:
+        """Stores documents with precomputed embeddings, e.g. from a pipelined ingest."""
+        if not documents:
+            return []
+        ids = list(ids or [doc.metadata.get("chunk_id") or os.urandom(16).hex() for doc in documents])
+        vectors = np.asarray(embeddings, dtype=np.float32)
+
+        with self._lock:
+            self.delete(ids=[chunk_id for chunk_id in ids if chunk_id in self._rows], compact=False)
+            start, end = self._count, self._count + len(documents)
+            if self._vectors is None or end > self._vectors.shape[0]:
+                self._allocate(max(end, 2 * (self._vectors.shape[0] if self._vectors is not None else 0), 1024), vectors.shape[1])
+
+            if self.dtype == "int8":
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                self._vectors[start:end] = np.round(vectors / scales[:, None]).astype(np.int8)
+                self._scales[start:end] = scales
+            else:
+                self._vectors[start:end] = vectors
+            stored = self._dequantize(slice(start, end))
+            self._norms[start:end] = np.einsum("ij,ij->i", stored, stored)
+            self._vectors.flush()
+            self._norms.flush()
+            if self._scales is not None:
+                self._scales.flush()
+
+            # The count is committed after the vectors are flushed, so a crash leaves unused rows, not missing ones.
+            self._connection.executemany(
+                "INSERT INTO documents (id, row, text, metadata) VALUES (?, ?, ?, ?)",
+                [(chunk_id, start + i, doc.page_content, json.dumps(doc.metadata)) for i, (chunk_id, doc) in enumerate(zip(ids, documents))],
+            )
+            self._set_meta(count=end, dtype=self.dtype)
+            self._connection.commit()
+
+            self._count = end
+            self._ids.extend(ids)
+            self._rows.update((chunk_id, start + i) for i, chunk_id in enumerate(ids))
+            self._live = np.concatenate([self._live, np.ones(len(ids), dtype=bool)])
+        return ids
+
+    def _set_meta(self, **values):
+        self._connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [(key, str(value)) for key, value in values.items()])
+
+    def delete(self, ids: list[str] = None, compact: bool = True):
+        """Deletes rows by ID; the space is reclaimed once deleted rows outnumber live ones."""
+        with self._lock:
+            rows = [self._rows.pop(chunk_id) for chunk_id in ids or [] if chunk_id in self._rows]
+            if not rows:
+                return
+            for row in rows:
+                self._ids[row] = None
+            self._live[rows] = False
+            self._connection.executemany("DELETE FROM documents WHERE row = ?", [(row,) for row in rows])
+            self._connection.commit()
+            if compact and self._count - len(self._rows) > len(self._rows):
+                self.compact()
+
+    def compact(self):
+        """Rewrites the matrix without deleted rows."""
+        with self._lock:
+            live_rows = np.flatnonzero(self._live[:self._count])
+            if len(live_rows) == self._count:
+                return
+            for array in (self._vectors, self._norms, self._scales):
+                if array is not None:
+                    array[:len(live_rows)] = array[live_rows]
+                    array.flush()
+
+            # Rows are renumbered through negative values so the UNIQUE constraint holds mid-update.
+            mapping = [(-(new_row + 1), int(old_row)) for new_row, old_row in enumerate(live_rows)]
+            self._connection.executemany("UPDATE documents SET row = ? WHERE row = ?", mapping)
+            self._connection.execute("UPDATE documents SET row = -row - 1")
+            self._set_meta(count=len(live_rows))
+            self._connection.commit()
+
+            self._ids = [self._ids[row] for row in live_rows]
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._count = len(self._ids)
+            self._live = np.ones(self._count, dtype=bool)
+
+    def _search(self, query_vectors: np.ndarray, k: int) -> list[list[tuple[int, float]]]:
+        """Returns the k nearest (row, squared l2 distance) pairs for each query vector."""
+        query_norms = np.einsum("ij,ij->i", query_vectors, query_vectors)
+        candidates = [[] for _ in range(len(query_vectors))]
+        for start in range(0, self._count, self.block_size):
+            end = min(start + self.block_size, self._count)
+            dots = np.asarray(self._vectors[start:end], dtype=np.float32) @ query_vectors.T
+            if self._scales is not None:
+                dots *= self._scales[start:end, None]
+            distances = self._norms[start:end, None] + query_norms[None, :] - 2.0 * dots
+            distances[~self._live[start:end]] = np.inf
+
+            top = min(k, end - start)
+            nearest = np.argpartition(distances, top - 1, axis=0)[:top]
+            for q in range(len(query_vectors)):
+                rows = nearest[:, q]
+                candidates[q].extend(zip((rows + start).tolist(), distances[rows, q].tolist()))
+
+        results = []
+        for hits in candidates:
+            hits = sorted((hit for hit in hits if hit[1] != np.inf), key=lambda hit: hit[1])[:k]
+            results.append([(row, max(distance, 0.0)) for row, distance in hits])
+        return results
+
+    def _documents_for_rows(self, rows: list[int]) -> dict:
+        if not rows:
+            return {}
+        placeholders = ",".join("?" * len(rows))
+        found = self._connection.execute(f"SELECT row, id, text, metadata FROM documents WHERE row IN ({placeholders})", rows).fetchall()
+        documents = {}
+        for row, chunk_id, text, metadata in found:
+            metadata = json.loads(metadata)
+            metadata.setdefault("chunk_id", chunk_id)
+            documents[row] = Document(page_content=text, metadata=metadata)
+        return documents
+
+    def similarity_search_batch(self, queries: list[str], k: int = 4) -> list[list[tuple[Document, float]]]:
+        """
+        Searches several queries in one pass over the matrix.
+
+        Returns:
+            One list of (document, distance) pairs per query, nearest first.
+        """
+        if not queries:
+            return []
+        if hasattr(self.embeddings, "embed_queries"):
+            query_vectors = self.embeddings.embed_queries(queries)
+        else:
+            query_vectors = [self.embeddings.embed_query(query) for query in queries]
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+
+        with self._lock:
+            if not self._rows:
+                return [[] for _ in queries]
+            hits = self._search(query_vectors, k)
+            documents = self._documents_for_rows(sorted({row for query_hits in hits for row, _ in query_hits}))
+        return [[(documents[row], distance) for row, distance in query_hits] for query_hits in hits]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> list[tuple[Document, float]]:
+        return self.similarity_search_batch([query], k=k)[0]
+
+    def similarity_search(self, query: str, k: int = 4) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k)]
+
+    def get_documents(self, ids: list[str]) -> dict:
+        """Returns a dict mapping each stored ID to its Document."""
+        with self._lock:
+            documents = self._documents_for_rows([self._rows[chunk_id] for chunk_id in ids if chunk_id in self._rows])
+        return {doc.metadata["chunk_id"]: doc for doc in documents.values()}
+
+    def get_embeddings(self, documents: list[Document]) -> list[list[float]]:
+        """Returns the stored embedding of each document by `chunk_id`, re-embedding unknown ones."""
+        with self._lock:
+            rows = [self._rows.get(doc.metadata.get("chunk_id")) for doc in documents]
+            stored = {row: vector.tolist() for row, vector in zip((row for row in rows if row is not None), self._dequantize([row for row in rows if row is not None]))}
+        missing = [doc.page_content for doc, row in zip(documents, rows) if row is None]
+        fresh = iter(self.embeddings.embed_documents(missing) if missing else [])
+        return [stored[row] if row is not None else next(fresh) for row in rows]
+
+    def get(self, ids: list[str] = None, include: list[str] = None) -> dict:
+        """A Chroma-compatible `get`, returning "ids" plus any of "documents", "metadatas" and "embeddings"."""
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            chunk_ids = [chunk_id for chunk_id in (ids if ids is not None else self._ids) if chunk_id in self._rows]
+            rows = [self._rows[chunk_id] for chunk_id in chunk_ids]
+            result = {"ids": chunk_ids}
+            if "documents" in include or "metadatas" in include:
+                documents = self._documents_for_rows(rows)
+                if "documents" in include:
+                    result["documents"] = [documents[row].page_content for row in rows]
+                if "metadatas" in include:
+                    result["metadatas"] = [documents[row].metadata for row in rows]
+            if "embeddings" in include:
+                result["embeddings"] = self._dequantize(rows).tolist() if rows else []
+        return result
+
+    def close(self):
+        with self._lock:
+            self._vectors = self._scales = self._norms = None
+            self._connection.close()
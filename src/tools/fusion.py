@@ -0,0 +1,87 @@
+import hashlib
+import math
+
+
+def chunk_key(document) -> str:
+    """
+    Returns the identity used to deduplicate a retrieved chunk: its `chunk_id`
+    metadata when present, otherwise a hash of its text.
+    """
+    chunk_id = document.metadata.get("chunk_id")
+    if chunk_id:
+        return chunk_id
+    return hashlib.sha1(document.page_content.encode("utf-8")).hexdigest()
+
+
+def distance_to_similarity(distance: float, metric: str = "l2") -> float:
+    """
+    Converts a vector-store distance into a cosine similarity, assuming unit-length
+    embeddings (as produced by all-MiniLM-L6-v2).
+
+    Args:
+        distance: The distance reported by the store.
+        metric: "l2" (squared euclidean, Chroma's default), "cosine" or "ip".
+    """
+    if metric == "l2":
+        return 1.0 - distance / 2.0
+    if metric in ("cosine", "ip"):
+        return 1.0 - distance
+    raise ValueError(f"Unknown distance metric '{metric}'. Expected 'l2', 'cosine' or 'ip'.")
+
+
+def reciprocal_rank_fusion(ranked_lists: list[list[tuple[str, float]]], k: int = 60) -> list[tuple[str, float]]:
+    """
+    Fuses several ranked result lists with reciprocal-rank fusion.
+
+    Args:
+        ranked_lists: One list per query of (key, distance) pairs, nearest first.
+        k: The RRF damping constant; larger values flatten the contribution of top ranks.
+
+    Returns:
+        (key, fused score) pairs, best first. Ties are broken by the smallest distance seen.
+    """
+    fused = {}
+    best_distance = {}
+    for ranked in ranked_lists:
+        for rank, (key, distance) in enumerate(ranked):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+            if distance is not None:
+                best_distance[key] = min(distance, best_distance.get(key, math.inf))
+    return sorted(fused.items(), key=lambda item: (-item[1], best_distance.get(item[0], math.inf)))
+
+
+def cosine_similarity(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def maximal_marginal_relevance(candidates: list[tuple[str, float]], embeddings: dict, top_n: int, lambda_mult: float = 0.5) -> list[tuple[str, float]]:
+    """
+    Greedily selects `top_n` candidates that balance relevance against redundancy.
+
+    Args:
+        candidates: (key, relevance) pairs, e.g. the output of `reciprocal_rank_fusion`.
+        embeddings: Maps each key to its embedding vector.
+        top_n: How many candidates to keep.
+        lambda_mult: 1.0 ranks purely by relevance, 0.0 purely by diversity.
+
+    Returns:
+        The selected (key, relevance) pairs in selection order.
+    """
+    if not candidates:
+        return []
+    max_relevance = max(score for _, score in candidates) or 1.0
+    remaining = list(candidates)
+    selected = []
+
+    while remaining and len(selected) < top_n:
+        best_index, best_score = 0, -math.inf
+        for i, (key, relevance) in enumerate(remaining):
+            redundancy = max((cosine_similarity(embeddings[key], embeddings[other]) for other, _ in selected), default=0.0)
+            score = lambda_mult * relevance / max_relevance - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best_index, best_score = i, score
+        selected.append(remaining.pop(best_index))
+
+    return selected
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from src.tools.ingestion import make_chunk_id
+from src.tools.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILENAME = "ingest_checkpoint.json"
+
+_DONE = object()
+
+
+def peak_rss_mb() -> float:
+    """Returns the process's peak resident set size in MiB, or 0.0 where it is unavailable."""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class IngestCheckpoint:
+    """
+    Records how many leading chunks of each file version are durably in the store, so
+    an interrupted ingest resumes without embedding those chunks again.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.files = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+
+    def done(self, source: str, file_hash: str) -> int:
+        entry = self.files.get(source)
+        return entry["done"] if entry and entry["sha256"] == file_hash else 0
+
+    def record(self, source: str, file_hash: str, done: int):
+        self.files[source] = {"sha256": file_hash, "done": done}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.files = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class IngestPipeline:
+    """
+    Ingests files as three concurrent stages joined by bounded queues:
+    load and chunk → embed → upsert, in micro-batches of `batch_size` chunks.
+
+    A full queue blocks the stage feeding it, so at most `queue_depth` batches wait
+    between two stages and peak memory does not grow with the corpus. Upserts happen in
+    order, and after each one the checkpoint records how far every file has got.
+    """
+    def __init__(self, vector_store, batch_size: int = 256, queue_depth: int = 4, lexical_index=None, checkpoint: IngestCheckpoint = None, load_file=None, workers: int = None, progress_every: int = 10):
+        """
+        Args:
+            vector_store: The store to upsert into.
+            batch_size: The number of chunks embedded and upserted together.
+            queue_depth: The number of batches that may wait between two stages.
+            lexical_index: An optional `BM25Index` fed the same chunks.
+            checkpoint: Where progress is recorded for resuming; None disables resuming.
+            load_file: Callable returning the chunks of one file. Defaults to streaming
+                every file through `file_loader.iter_chunks`.
+            workers: The chunking pool size for `iter_chunks`.
+            progress_every: Log progress every this many batches.
+        """
+        self.vector_store = vector_store
+        self.batch_size = batch_size
+        self.queue_depth = queue_depth
+        self.lexical_index = lexical_index
+        self.checkpoint = checkpoint
+        self.load_file = load_file
+        self.workers = workers
+        self.progress_every = progress_every
+        self._stop = threading.Event()
+
+    def _put(self, q: queue.Queue, item):
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _iter_chunks(self, jobs: list[tuple[str, str]]):
+        """Yields (file path, chunk) pairs in job order."""
+        if self.load_file is not None:
+            for source, _ in jobs:
+                for chunk in self.load_file(source):
+                    yield source, chunk
+            return
+        from src.tools.file_loader import iter_chunks
+
+        for chunk in iter_chunks(files=[source for source, _ in jobs], workers=self.workers):
+            yield chunk.metadata["source"], chunk
+
+    def _chunk_stage(self, jobs: list[tuple[str, str]], chunk_ids: dict, sources: dict, out: queue.Queue):
+        hashes = dict(jobs)
+        resumed = 0
+        batch = []
+        for source, chunk in self._iter_chunks(jobs):
+            if self._stop.is_set():
+                return
+            index = len(chunk_ids[source])
+            chunk_id = make_chunk_id(source, hashes[source], index)
+            chunk.metadata["chunk_id"] = chunk_id
+            chunk_ids[source].append(chunk_id)
+            sources[chunk_id] = source
+
+            if self.checkpoint is not None and index < self.checkpoint.done(source, hashes[source]):
+                # Already in the vector store; only the in-memory lexical index needs it again.
+                resumed += 1
+                if self.lexical_index is not None:
+                    self.lexical_index.add_documents([chunk], ids=[chunk_id])
+                continue
+
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                self._put(out, batch)
+                batch = []
+        if batch:
+            self._put(out, batch)
+        self._put(out, ("resumed", resumed))
+
+    def _embed_stage(self, source: queue.Queue, out: queue.Queue):
+        embeddings = getattr(self.vector_store, "embeddings", None)
+        precompute = embeddings is not None and (hasattr(self.vector_store, "add_embeddings") or hasattr(self.vector_store, "_collection"))
+        while not self._stop.is_set():
+            try:
+                batch = source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if batch is _DONE or isinstance(batch, tuple):
+                self._put(out, batch)
+                if batch is _DONE:
+                    return
+                continue
+            vectors = None
+            if precompute:
+                with get_telemetry().span("ingest.embed"):
+                    vectors = embeddings.embed_documents([chunk.page_content for chunk in batch])
+            self._put(out, (batch, vectors))
+
+    def _upsert(self, batch: list, vectors: list):
+        ids = [chunk.metadata["chunk_id"] for chunk in batch]
+        if vectors is None:
+            self.vector_store.add_documents(batch, ids=ids)
+        elif hasattr(self.vector_store, "add_embeddings"):
+            self.vector_store.add_embeddings(batch, vectors, ids=ids)
+        else:
+            self.vector_store._collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                documents=[chunk.page_content for chunk in batch],
+                metadatas=[chunk.metadata for chunk in batch],
+            )
+        if self.lexical_index is not None:
+            self.lexical_index.add_documents(batch, ids=ids)
+
+    def _run_stage(self, target, errors: list, out: queue.Queue, *args):
+        try:
+            target(*args)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            self._put(out, _DONE)
+
+    def run(self, jobs: list[tuple[str, str]]) -> dict:
+        """
+        Ingests the given files.
+
+        Args:
+            jobs: (file path, SHA-256) pairs, in the order their chunks should be written.
+
+        Returns:
+            A dict with the chunk IDs of each file ("chunk_ids"), the number of chunks
+            upserted ("chunks_upserted") and skipped on resume ("chunks_resumed"), and
+            "elapsed_s", "chunks_per_s" and "peak_rss_mb".
+        """
+        self._stop.clear()
+        chunk_ids = {source: [] for source, _ in jobs}
+        sources = {}
+        hashes = dict(jobs)
+        chunked, embedded = queue.Queue(self.queue_depth), queue.Queue(self.queue_depth)
+        errors = []
+        stages = [
+            threading.Thread(target=self._run_stage, args=(self._chunk_stage, errors, chunked, jobs, chunk_ids, sources, chunked), name="ingest-chunk", daemon=True),
+            threading.Thread(target=self._run_stage, args=(self._embed_stage, errors, embedded, chunked, embedded), name="ingest-embed", daemon=True),
+        ]
+
+        start = time.perf_counter()
+        upserted = resumed = batches = 0
+        done = {}
+        try:
+            for stage in stages:
+                stage.start()
+            while True:
+                item = embedded.get()
+                if item is _DONE:
+                    break
+                if item[0] == "resumed":
+                    resumed = item[1]
+                    continue
+                batch, vectors = item
+                with get_telemetry().span("ingest.upsert"):
+                    self._upsert(batch, vectors)
+                upserted += len(batch)
+                batches += 1
+
+                touched = set()
+                for chunk in batch:
+                    source = sources.pop(chunk.metadata["chunk_id"])
+                    touched.add(source)
+                    done[source] = done.get(source, self.checkpoint.done(source, hashes[source]) if self.checkpoint else 0) + 1
+                if self.checkpoint is not None:
+                    for source in touched:
+                        self.checkpoint.record(source, hashes[source], done[source])
+                    self.checkpoint.save()
+                if batches % self.progress_every == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info("Ingested %d chunks in %.1fs (%.0f chunks/s, peak RSS %.0f MiB)...", upserted, elapsed, upserted / elapsed, peak_rss_mb())
+        finally:
+            self._stop.set()
+            for stage in stages:
+                stage.join()
+        if errors:
+            raise errors[0]
+
+        elapsed = time.perf_counter() - start
+        return {
+            "chunk_ids": chunk_ids,
+            "chunks_upserted": upserted,
+            "chunks_resumed": resumed,
+            "elapsed_s": round(elapsed, 3),
+            "chunks_per_s": round(upserted / elapsed, 1) if elapsed else 0.0,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
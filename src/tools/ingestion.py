@@ -0,0 +1,203 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "ingest_manifest.json"
+
+
+def file_sha256(file_path: str) -> str:
+    """Returns the hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_chunk_id(source: str, file_hash: str, index: int) -> str:
+    """
+    Returns a deterministic ID for the index-th chunk of a file version.
+    The same file content at the same path always yields the same IDs.
+    """
+    source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()[:12]
+    return f"{source_hash}-{file_hash[:12]}-{index:05d}"
+
+
+class IngestionManifest:
+    """
+    Records which files have been ingested into the vector store: their mtime, size,
+    content hash and the IDs of the chunks they produced.
+    """
+    def __init__(self, path: str, files: dict = None):
+        self.path = path
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, persist_directory: str = "./chroma_db") -> "IngestionManifest":
+        path = os.path.join(persist_directory, MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(path, data.get("files", {}))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def save(self):
+        """Writes the manifest atomically so an interrupted run never leaves a torn file."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"corpus_version": self.corpus_version, "files": self.files}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def corpus_version(self) -> str:
+        """A hash that changes whenever any ingested file is added, changed or removed."""
+        digest = hashlib.sha256()
+        for source in sorted(self.files):
+            digest.update(f"{source}\0{self.files[source]['sha256']}\n".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+
+def sync_documents(vector_store, directory_path: str = "./data", persist_directory: str = "./chroma_db", pattern: str = "**/*.txt", load_file=None, lexical_index=None, batch_size: int = 256, queue_depth: int = 4, workers: int = None) -> dict:
+    """
+    Brings the vector store in line with the files in `directory_path`.
+
+    Only new or changed files are chunked and embedded; chunks of changed and
+    deleted files are removed. Unchanged files (same mtime and size, or same
+    content hash) cost no embedding work. New and changed files go through an
+    `IngestPipeline`, which chunks, embeds and upserts in bounded micro-batches and
+    checkpoints its progress, so an interrupted sync resumes where it stopped.
+
+    Args:
+        vector_store: A store exposing `add_documents(documents, ids=...)` and `delete(ids=...)`.
+        directory_path: The corpus directory.
+        persist_directory: Where the vector store persists; the manifest is kept there too.
+        pattern: Glob of files to ingest, relative to `directory_path`.
+        load_file: Callable returning the chunks of one file. Defaults to streaming
+            files through `file_loader.iter_chunks`.
+        lexical_index: An optional `BM25Index` kept in step with the vector store.
+        batch_size: The number of chunks embedded and upserted together.
+        queue_depth: The number of batches that may wait between pipeline stages.
+        workers: The chunking pool size. Defaults to the CPU count.
+
+    Returns:
+        A dict of counters describing what changed, the new `corpus_version`, and the
+        pipeline's `chunks_resumed`, `chunks_per_s` and `peak_rss_mb`.
+    """
+    from src.tools.ingest_pipeline import CHECKPOINT_FILENAME, IngestCheckpoint, IngestPipeline
+
+    logger.info("Syncing documents from %s...", directory_path)
+    manifest = IngestionManifest.load(persist_directory)
+    if not manifest.exists():
+        _clear_untracked(vector_store)
+        # Saved right away so a resumed first ingest does not clear its own completed batches.
+        manifest.save()
+    elif lexical_index is not None and not len(lexical_index) and manifest.files:
+        _backfill_lexical_index(vector_store, manifest, lexical_index)
+
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks_added": 0, "chunks_removed": 0}
+    seen = set()
+    jobs = []
+    touched = False
+
+    for file_path in sorted(glob.glob(os.path.join(directory_path, pattern), recursive=True)):
+        if not os.path.isfile(file_path):
+            continue
+        seen.add(file_path)
+        stat = os.stat(file_path)
+        entry = manifest.files.get(file_path)
+
+        if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+            stats["unchanged"] += 1
+            continue
+
+        file_hash = file_sha256(file_path)
+        if entry and entry["sha256"] == file_hash:
+            # Touched but not modified: refresh the stat fields only.
+            entry.update(mtime=stat.st_mtime, size=stat.st_size)
+            touched = True
+            stats["unchanged"] += 1
+            continue
+
+        if entry:
+            _delete_chunks(vector_store, entry["chunk_ids"], lexical_index)
+            stats["chunks_removed"] += len(entry["chunk_ids"])
+
+        jobs.append((file_path, file_hash))
+        manifest.files[file_path] = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": file_hash, "chunk_ids": []}
+        stats["updated" if entry else "added"] += 1
+
+    checkpoint = IngestCheckpoint(os.path.join(persist_directory, CHECKPOINT_FILENAME))
+    for file_path, progress in list(checkpoint.files.items()):
+        version = (file_path, progress["sha256"])
+        if version not in jobs and manifest.files.get(file_path, {}).get("sha256") != progress["sha256"]:
+            # A file version abandoned mid-ingest that will not be resumed: drop its partial chunks.
+            _delete_chunks(vector_store, [make_chunk_id(*version, i) for i in range(progress["done"])], lexical_index)
+            del checkpoint.files[file_path]
+    if jobs:
+        pipeline = IngestPipeline(vector_store, batch_size=batch_size, queue_depth=queue_depth, lexical_index=lexical_index, checkpoint=checkpoint, load_file=load_file, workers=workers)
+        result = pipeline.run(jobs)
+        for file_path, chunk_ids in result["chunk_ids"].items():
+            manifest.files[file_path]["chunk_ids"] = chunk_ids
+            stats["chunks_added"] += len(chunk_ids)
+        stats.update({key: result[key] for key in ("chunks_resumed", "chunks_per_s", "peak_rss_mb")})
+
+    for file_path in sorted(set(manifest.files) - seen):
+        chunk_ids = manifest.files.pop(file_path)["chunk_ids"]
+        _delete_chunks(vector_store, chunk_ids, lexical_index)
+        stats["removed"] += 1
+        stats["chunks_removed"] += len(chunk_ids)
+
+    # A large manifest takes a while to write, so an unchanged corpus leaves it as it is.
+    if jobs or touched or stats["removed"]:
+        manifest.save()
+    checkpoint.clear()
+    if lexical_index is not None and lexical_index.directory and lexical_index.dirty:
+        lexical_index.save()
+    stats["corpus_version"] = manifest.corpus_version
+    logger.info(
+        "Sync complete: %d added, %d updated, %d removed, %d unchanged (%d chunks embedded).",
+        stats["added"], stats["updated"], stats["removed"], stats["unchanged"], stats["chunks_added"],
+    )
+    if jobs:
+        logger.info("Ingest throughput: %s chunks/s, %d chunks resumed, peak RSS %s MiB.", stats["chunks_per_s"], stats["chunks_resumed"], stats["peak_rss_mb"])
+    return stats
+
+
+def _delete_chunks(vector_store, chunk_ids: list[str], lexical_index=None):
+    if chunk_ids:
+        vector_store.delete(ids=chunk_ids)
+        if lexical_index is not None:
+            lexical_index.delete(chunk_ids)
+
+
+def _backfill_lexical_index(vector_store, manifest: IngestionManifest, lexical_index, batch_size: int = 500):
+    """Builds a missing BM25 index from the chunk texts already in the vector store."""
+    from src.tools.vector_store import get_documents
+
+    chunk_ids = [chunk_id for entry in manifest.files.values() for chunk_id in entry["chunk_ids"]]
+    logger.info("Building the BM25 index from %d stored chunks...", len(chunk_ids))
+    for start in range(0, len(chunk_ids), batch_size):
+        batch = chunk_ids[start:start + batch_size]
+        documents = get_documents(vector_store, batch)
+        lexical_index.add_documents(list(documents.values()), ids=list(documents))
+
+
+def _clear_untracked(vector_store):
+    """
+    Removes rows written before the manifest existed. Earlier versions appended the
+    whole corpus on every run under random IDs, so none of those rows can be reused.
+    """
+    if not hasattr(vector_store, "get"):
+        return
+    existing_ids = vector_store.get(include=[]).get("ids", [])
+    if existing_ids:
+        logger.info("Removing %d untracked chunks from a previous ingestion format...", len(existing_ids))
+        _delete_chunks(vector_store, existing_ids)
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.tools.llm_client import LLMError
+from src.tools.telemetry import get_telemetry
+
+
+def prompt_key(model: str, model_version: str, prompt: str, options: dict = None) -> str:
+    payload = json.dumps([model, model_version, prompt, options or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    A SQLite-backed cache of LLM completions keyed by (model, model version, prompt, options).
+
+    Entries expire after `ttl_seconds`; once more than `max_entries` are stored the
+    least recently used ones are evicted.
+    """
+    def __init__(self, path: str = "./chroma_db/llm_cache.sqlite3", ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 10_000):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._connection.commit()
+
+    def get(self, model: str, prompt: str, options: dict = None, model_version: str = ""):
+        """Returns the cached completion, or None if there is no live entry."""
+        key = prompt_key(model, model_version, prompt, options)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model: str, prompt: str, response: str, options: dict = None, model_version: str = ""):
+        """Stores a completion and evicts expired and least recently used entries."""
+        key = prompt_key(model, model_version, prompt, options)
+        now = time.time()
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", (key, model, response, now, now))
+            expired = self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)).rowcount
+            overflow = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at, rowid LIMIT ?)", (overflow,)
+                )
+            self.evictions += expired + max(overflow, 0)
+            self._connection.commit()
+
+    def invalidate(self, model: str = None) -> int:
+        """Removes all entries, or only those of `model`. Returns the number removed."""
+        with self._lock:
+            if model is None:
+                removed = self._connection.execute("DELETE FROM responses").rowcount
+            else:
+                removed = self._connection.execute("DELETE FROM responses WHERE model = ?", (model,)).rowcount
+            self._connection.commit()
+            return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class CachedLLMClient:
+    """
+    Wraps an LLM client so identical (model, prompt) calls are answered from an
+    `LLMResponseCache`. Each agent gets its own wrapper, so caching can be enabled
+    per agent and hit counts are reported per agent.
+
+    The model's digest is part of the cache key when the wrapped client can report
+    it, so re-pulling a model tag bypasses the entries produced by the old weights.
+    """
+    def __init__(self, client, cache: LLMResponseCache, enabled: bool = True):
+        self.client = client
+        self.cache = cache
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._model_versions = {}
+
+    def model_version(self, model: str) -> str:
+        if model not in self._model_versions:
+            model_digest = getattr(self.client, "model_digest", None)
+            try:
+                self._model_versions[model] = model_digest(model) if model_digest else ""
+            except LLMError:
+                # Don't memoize: the server may simply not be up yet.
+                return ""
+        return self._model_versions[model]
+
+    def refresh_model_versions(self):
+        """Forgets the known model digests so the next call looks them up again."""
+        self._model_versions.clear()
+
+    def generate(self, model: str, prompt: str, **options) -> str:
+        if not self.enabled:
+            return self.client.generate(model, prompt, **options)
+
+        version = self.model_version(model)
+        response = self.cache.get(model, prompt, options, model_version=version)
+        get_telemetry().increment("llm_cache_lookups_total", model=model, hit=response is not None)
+        if response is not None:
+            self.hits += 1
+            return response
+
+        self.misses += 1
+        response = self.client.generate(model, prompt, **options)
+        self.cache.put(model, prompt, response, options, model_version=version)
+        return response
+
+    def stream_generate(self, model: str, prompt: str, **options):
+        """Streams a completion; a cached response is yielded as a single piece."""
+        stream = getattr(self.client, "stream_generate", None)
+        if not self.enabled:
+            if stream is None:
+                yield self.client.generate(model, prompt, **options)
+            else:
+                yield from stream(model, prompt, **options)
+            return
+
+        version = self.model_version(model)
+        response = self.cache.get(model, prompt, options, model_version=version)
+        get_telemetry().increment("llm_cache_lookups_total", model=model, hit=response is not None)
+        if response is not None:
+            self.hits += 1
+            yield response
+            return
+
+        self.misses += 1
+        if stream is None:
+            response = self.client.generate(model, prompt, **options)
+            yield response
+        else:
+            pieces = []
+            for piece in stream(model, prompt, **options):
+                pieces.append(piece)
+                yield piece
+            response = "".join(pieces)
+        # Only complete responses are cached; an abandoned stream never reaches this point.
+        self.cache.put(model, prompt, response, options, model_version=version)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"enabled": self.enabled, "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        self.client.close()
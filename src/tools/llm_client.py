@@ -0,0 +1,345 @@
+import asyncio
+import codecs
+import http.client
+import json
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from src.tools.telemetry import get_telemetry
+
+
+class LLMError(RuntimeError):
+    """Raised when a completion could not be obtained from the LLM backend."""
+
+
+def _record_sizes(model: str, prompt: str, completion_chars: int, result: dict = None):
+    """Records prompt and completion sizes, in characters and, when Ollama reports them, tokens."""
+    telemetry = get_telemetry()
+    telemetry.observe("llm_prompt_chars", len(prompt), model=model)
+    telemetry.observe("llm_completion_chars", completion_chars, model=model)
+    if result:
+        if "prompt_eval_count" in result:
+            telemetry.observe("llm_prompt_tokens", result["prompt_eval_count"], model=model)
+        if "eval_count" in result:
+            telemetry.observe("llm_completion_tokens", result["eval_count"], model=model)
+
+
+class OllamaHTTPClient:
+    """
+    A small client for the Ollama HTTP API (`/api/generate`).
+
+    Connections are HTTP/1.1 keep-alive and kept in a pool, so consecutive calls
+    reuse an open socket instead of paying for a process launch and CLI startup.
+    """
+    def __init__(
+        self,
+        base_url: str = None,
+        timeout: float = 120.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 4,
+        keep_alive: str = "5m",
+        model_keep_alive: dict = None,
+    ):
+        base_url = base_url or os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+        if "://" not in base_url:
+            base_url = f"http://{base_url}"
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+        self.model_keep_alive = dict(model_keep_alive or {})
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _new_connection(self):
+        connection_cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return connection_cls(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def _open(self, method: str, path: str, payload: dict = None):
+        """
+        Sends a JSON request, retrying on connection errors and 5xx responses.
+
+        Returns:
+            The (connection, response) pair; the caller must read the body and then
+            hand both to `_finish`.
+        """
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        last_error = None
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            connection = self._acquire()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                # A pooled connection may have been closed by the server; drop it and retry.
+                connection.close()
+                last_error = e
+                continue
+
+            if response.status >= 400:
+                data = response.read()
+                self._finish(connection, response)
+                if response.status >= 500:
+                    last_error = LLMError(f"Ollama returned HTTP {response.status}: {data[:200]!r}")
+                    continue
+                raise LLMError(f"Ollama returned HTTP {response.status}: {data[:200]!r}")
+            return connection, response
+
+        raise LLMError(f"Ollama request to {self.base_url}{path} failed after {self.max_retries + 1} attempts: {last_error}")
+
+    def _finish(self, connection, response):
+        """Returns a fully read connection to the pool, or closes it if the server will."""
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(connection)
+
+    def _request(self, method: str, path: str, payload: dict = None) -> dict:
+        connection, response = self._open(method, path, payload)
+        try:
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise LLMError(f"Error reading Ollama response: {e}")
+        self._finish(connection, response)
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise LLMError(f"Invalid JSON from Ollama: {e}")
+
+    def generate(self, model: str, prompt: str, **options) -> str:
+        """
+        Runs a single non-streaming completion.
+
+        Args:
+            model: The Ollama model tag, e.g. "openchat:latest".
+            prompt: The full prompt text.
+            **options: Model options forwarded as Ollama `options` (temperature, num_ctx, ...).
+
+        Returns:
+            The completion text.
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": self.model_keep_alive.get(model, self.keep_alive),
+        }
+        if options:
+            payload["options"] = options
+        with get_telemetry().span("llm.generate", model=model, transport="http"):
+            result = self._request("POST", "/api/generate", payload)
+        completion = result.get("response", "")
+        _record_sizes(model, prompt, len(completion), result)
+        return completion
+
+    def stream_generate(self, model: str, prompt: str, **options):
+        """
+        Runs a streaming completion and yields the text pieces as Ollama produces them.
+        Retries only happen before the first piece has been received.
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.model_keep_alive.get(model, self.keep_alive),
+        }
+        if options:
+            payload["options"] = options
+
+        with get_telemetry().span("llm.stream", model=model, transport="http"):
+            connection, response = self._open("POST", "/api/generate", payload)
+            completed = False
+            completion_chars = 0
+            try:
+                for line in response:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise LLMError(f"Ollama stream error: {chunk['error']}")
+                    if chunk.get("response"):
+                        completion_chars += len(chunk["response"])
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        _record_sizes(model, prompt, completion_chars, chunk)
+                        break
+                response.read()
+                completed = True
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                raise LLMError(f"Error reading Ollama stream: {e}")
+            finally:
+                # A stream abandoned half-way cannot be reused for the next request.
+                if completed:
+                    self._finish(connection, response)
+                else:
+                    connection.close()
+
+    def model_digest(self, model: str) -> str:
+        """
+        Returns the digest of a locally installed model tag, or "" if it is not installed.
+        The digest changes whenever the tag is re-pulled or re-created.
+        """
+        for entry in self._request("GET", "/api/tags").get("models", []):
+            if model in (entry.get("name"), entry.get("model")):
+                return entry.get("digest", "")
+        return ""
+
+    def close(self):
+        """Closes all pooled connections."""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class OllamaSubprocessClient:
+    """
+    Fallback client that shells out to `ollama run` for every call.
+    The prompt is passed on stdin rather than as an argv string.
+    """
+    def __init__(self, timeout: float = None):
+        if shutil.which("ollama") is None:
+            raise RuntimeError("Ollama is not available in the system's PATH. Please install it to use the subprocess transport.")
+        self.timeout = timeout
+
+    def generate(self, model: str, prompt: str, **options) -> str:
+        """Runs `ollama run <model>` with the prompt on stdin and returns its stdout."""
+        try:
+            with get_telemetry().span("llm.generate", model=model, transport="subprocess"):
+                result = subprocess.run(
+                    ["ollama", "run", model],
+                    input=prompt,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=self.timeout,
+                )
+        except subprocess.CalledProcessError as e:
+            raise LLMError(f"Error executing Ollama: {e}\nStderr: {e.stderr}")
+        except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+            raise LLMError(f"Error executing Ollama: {e}")
+        _record_sizes(model, prompt, len(result.stdout))
+        return result.stdout
+
+    def stream_generate(self, model: str, prompt: str, **options):
+        """
+        Yields the stdout of `ollama run <model>` as it is produced.
+        The timeout bounds the whole call, including the waits between pieces.
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        # A file rather than a pipe: nobody reads stderr until the end, and a full pipe would stall the model.
+        stderr = tempfile.TemporaryFile()
+        try:
+            process = subprocess.Popen(["ollama", "run", model], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr)
+        except FileNotFoundError as e:
+            stderr.close()
+            raise LLMError(f"Error executing Ollama: {e}")
+
+        # Blocking reads happen on a helper thread so the deadline can be checked while waiting.
+        blocks = queue.Queue()
+
+        def read():
+            for block in iter(lambda: process.stdout.read1(4096), b""):
+                blocks.put(block)
+            blocks.put(b"")
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            process.stdin.write(prompt.encode("utf-8"))
+            process.stdin.close()
+            threading.Thread(target=read, name="ollama-stdout", daemon=True).start()
+            while True:
+                try:
+                    block = blocks.get(timeout=remaining())
+                except queue.Empty:
+                    raise LLMError(f"Error executing Ollama: timed out after {self.timeout} seconds")
+                if not block:
+                    break
+                text = decoder.decode(block)
+                if text:
+                    yield text
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            if process.wait(timeout=remaining()) != 0:
+                stderr.seek(0)
+                raise LLMError(f"Error executing Ollama: exit status {process.returncode}\nStderr: {stderr.read().decode('utf-8', 'replace')}")
+        except subprocess.TimeoutExpired as e:
+            raise LLMError(f"Error executing Ollama: {e}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            stderr.close()
+
+    def close(self):
+        pass
+
+
+_default_clients = {}
+
+
+def get_llm_client(transport: str = None, **kwargs):
+    """
+    Returns an LLM client for the requested transport ("http" or "subprocess").
+
+    The transport defaults to the OLLAMA_TRANSPORT environment variable, then "http".
+    Without extra arguments a shared instance is returned, so all agents use one
+    connection pool.
+    """
+    transport = (transport or os.getenv("OLLAMA_TRANSPORT", "http")).lower()
+    if transport == "http":
+        client_cls = OllamaHTTPClient
+    elif transport == "subprocess":
+        client_cls = OllamaSubprocessClient
+    else:
+        raise ValueError(f"Unknown LLM transport '{transport}'. Expected 'http' or 'subprocess'.")
+
+    if kwargs:
+        return client_cls(**kwargs)
+    if transport not in _default_clients:
+        _default_clients[transport] = client_cls()
+    return _default_clients[transport]
+
+
+async def agenerate(client, model: str, prompt: str, **options) -> str:
+    """
+    Awaits a completion from any LLM client. Clients with a native `agenerate` are
+    awaited directly; blocking clients run in a worker thread so the event loop stays free.
+    """
+    native = getattr(client, "agenerate", None)
+    if native is not None:
+        return await native(model, prompt, **options)
+    return await asyncio.to_thread(client.generate, model, prompt, **options)
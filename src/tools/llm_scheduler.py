@@ -0,0 +1,302 @@
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.tools.llm_client import LLMError
+from src.tools.telemetry import get_telemetry, percentile
+
+logger = logging.getLogger(__name__)
+
+# Lower values are served first: interactive answer generation ahead of the
+# rephrasing and evaluation calls a user does not directly wait on.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+_deadline = ContextVar("llm_deadline", default=None)
+
+
+class LLMOverloadedError(LLMError):
+    """Raised when a call is shed because it could not start before its deadline."""
+
+
+@contextmanager
+def llm_deadline(seconds: float):
+    """
+    Gives every LLM call made in this context (and in threads and tasks started from
+    it) until `seconds` from now to start, e.g. the time budget of one query.
+    """
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class _Flight:
+    """One in-flight completion, shared by every identical call made while it runs."""
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.pieces = []
+        self.finished = False
+        self.abandoned = False
+        self.error = None
+
+    def append(self, piece: str):
+        with self.condition:
+            self.pieces.append(piece)
+            self.condition.notify_all()
+
+    def finish(self, error: BaseException = None, abandoned: bool = False):
+        with self.condition:
+            self.finished = True
+            self.error = error
+            self.abandoned = abandoned
+            self.condition.notify_all()
+
+
+class LLMScheduler:
+    """
+    Admission control for the LLM host, shared by all agents.
+
+    - Single-flight: a call identical (model, prompt, options) to one already queued or
+      running waits for that call's result instead of issuing its own; streamed
+      followers receive the pieces as they arrive.
+    - At most `max_concurrency` calls run at once. Waiting calls are served by priority
+      (interactive first), then in arrival order.
+    - Deadline-aware shedding: a call whose deadline passes while it waits, or whose
+      estimated wait already exceeds its deadline on arrival, or that finds `max_queue`
+      calls waiting, fails fast with `LLMOverloadedError`. The agents treat that like any
+      LLM error, so a shed rephrasing falls back to the original query.
+
+    Deadlines come from `llm_deadline` and from `max_wait`, the longest a call of each
+    priority may wait. Queue depth, calls in flight and wait times are reported through
+    telemetry and `stats`. Agents get per-agent views from `client_for`.
+    """
+    def __init__(self, client, max_concurrency: int = 2, max_queue: int = 64, max_wait: dict = None, coalesce: bool = True):
+        """
+        Args:
+            client: The LLM client calls are forwarded to.
+            max_concurrency: The number of calls the model host runs at once.
+            max_queue: The number of waiting calls beyond which new ones are shed.
+            max_wait: Optional {priority: seconds} limit on the time a call may wait.
+            coalesce: Whether identical in-flight calls share one completion.
+        """
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait or {}
+        self.coalesce = coalesce
+        self._lock = threading.Condition()
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._flights = {}
+        self._service_time = None
+        self._agents = {}
+
+    def client_for(self, agent: str, priority: int = PRIORITY_BACKGROUND) -> "ScheduledLLMClient":
+        """Returns a client that submits every call as `agent` with the given priority."""
+        return ScheduledLLMClient(self, agent, priority)
+
+    def _agent_stats(self, agent: str) -> dict:
+        if agent not in self._agents:
+            self._agents[agent] = {"calls": 0, "coalesced": 0, "shed": 0, "waits": deque(maxlen=1024)}
+        return self._agents[agent]
+
+    def _publish_depth(self):
+        telemetry = get_telemetry()
+        telemetry.set_gauge("llm_queue_depth", len(self._queue))
+        telemetry.set_gauge("llm_in_flight", self._running)
+
+    def _shed(self, agent: str, reason: str):
+        self._agent_stats(agent)["shed"] += 1
+        get_telemetry().increment("llm_shed_total", agent=agent, reason=reason)
+        logger.warning("Shed an LLM call from %s (%s).", agent, reason)
+        raise LLMOverloadedError(f"The LLM is overloaded: call from {agent} shed ({reason}).")
+
+    def _estimated_wait(self, priority: int) -> float:
+        """Estimates how long a call arriving now would wait: whole rounds of the calls ahead of it."""
+        if self._service_time is None:
+            return 0.0
+        ahead = sum(1 for entry in self._queue if entry[0] <= priority)
+        return (ahead // self.max_concurrency + 1) * self._service_time
+
+    def _acquire(self, agent: str, priority: int, deadline: float):
+        """Waits for a free slot, by priority, until `deadline` (monotonic seconds) at the latest."""
+        start = time.monotonic()
+        with self._lock:
+            if not self._queue and self._running < self.max_concurrency:
+                self._running += 1
+            else:
+                if len(self._queue) >= self.max_queue:
+                    self._shed(agent, "queue_full")
+                if deadline is not None and start + self._estimated_wait(priority) > deadline:
+                    self._shed(agent, "deadline")
+                entry = (priority, next(self._sequence))
+                heapq.heappush(self._queue, entry)
+                self._publish_depth()
+                while not (self._queue[0] == entry and self._running < self.max_concurrency):
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._queue.remove(entry)
+                        heapq.heapify(self._queue)
+                        self._publish_depth()
+                        self._lock.notify_all()
+                        self._shed(agent, "deadline")
+                    self._lock.wait(remaining)
+                heapq.heappop(self._queue)
+                self._running += 1
+                # The next waiter may be able to start too.
+                self._lock.notify_all()
+            self._publish_depth()
+            wait = time.monotonic() - start
+            self._agent_stats(agent)["waits"].append(wait)
+        get_telemetry().observe("llm_queue_wait_seconds", wait, agent=agent)
+
+    def _release(self, duration: float):
+        with self._lock:
+            self._running -= 1
+            # Exponentially weighted, so the wait estimate follows the current load.
+            self._service_time = duration if self._service_time is None else 0.8 * self._service_time + 0.2 * duration
+            self._publish_depth()
+            self._lock.notify_all()
+
+    def _deadline(self, priority: int):
+        deadline = _deadline.get()
+        max_wait = self.max_wait.get(priority)
+        if max_wait is not None:
+            limit = time.monotonic() + max_wait
+            deadline = limit if deadline is None else min(deadline, limit)
+        return deadline
+
+    def _lead(self, key, flight: _Flight, model: str, prompt: str, options: dict, agent: str, priority: int, stream: bool):
+        try:
+            self._acquire(agent, priority, self._deadline(priority))
+        except LLMError as e:
+            self._finish(key, flight, error=e)
+            raise
+        start = time.monotonic()
+        try:
+            stream_generate = getattr(self.client, "stream_generate", None)
+            if stream and stream_generate is not None:
+                for piece in stream_generate(model, prompt, **options):
+                    flight.append(piece)
+                    yield piece
+            else:
+                response = self.client.generate(model, prompt, **options)
+                flight.append(response)
+                yield response
+        except GeneratorExit:
+            self._finish(key, flight, abandoned=True)
+            raise
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        else:
+            self._finish(key, flight)
+        finally:
+            self._release(time.monotonic() - start)
+
+    def _finish(self, key, flight: _Flight, error: BaseException = None, abandoned: bool = False):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(error=error, abandoned=abandoned)
+
+    def _follow(self, flight: _Flight, stream: bool):
+        """Yields the leader's pieces; returns False if the leader gave up before any were received."""
+        received = 0
+        while True:
+            with flight.condition:
+                while not flight.finished and (not stream or received >= len(flight.pieces)):
+                    flight.condition.wait()
+                pieces = flight.pieces[received:] if stream or not flight.abandoned else []
+                finished, error, abandoned = flight.finished, flight.error, flight.abandoned
+            received += len(pieces)
+            yield from pieces
+            if finished:
+                break
+        if error is not None:
+            raise error
+        if abandoned:
+            if received:
+                raise LLMError("The shared LLM stream was abandoned by its first caller.")
+            return False
+        return True
+
+    def _call(self, model: str, prompt: str, options: dict, agent: str, priority: int, stream: bool):
+        key = (model, prompt, json.dumps(options, sort_keys=True, default=str))
+        while True:
+            with self._lock:
+                stats = self._agent_stats(agent)
+                stats["calls"] += 1
+                flight = self._flights.get(key) if self.coalesce else None
+                if flight is None:
+                    flight = _Flight()
+                    if self.coalesce:
+                        self._flights[key] = flight
+                    leader = True
+                else:
+                    stats["coalesced"] += 1
+                    leader = False
+            if leader:
+                yield from self._lead(key, flight, model, prompt, options, agent, priority, stream)
+                return
+            get_telemetry().increment("llm_coalesced_total", agent=agent)
+            if (yield from self._follow(flight, stream)):
+                return
+            # The leader's consumer stopped before anything arrived: issue the call ourselves.
+
+    def generate(self, model: str, prompt: str, agent: str = "default", priority: int = PRIORITY_BACKGROUND, **options) -> str:
+        return "".join(self._call(model, prompt, options, agent, priority, stream=False))
+
+    def stream_generate(self, model: str, prompt: str, agent: str = "default", priority: int = PRIORITY_BACKGROUND, **options):
+        yield from self._call(model, prompt, options, agent, priority, stream=True)
+
+    def stats(self) -> dict:
+        """Returns the current queue depth and calls in flight, and per-agent counts and waits."""
+        with self._lock:
+            agents = {
+                agent: {
+                    "calls": stats["calls"],
+                    "coalesced": stats["coalesced"],
+                    "shed": stats["shed"],
+                    "wait_p50_ms": round(1000 * percentile(list(stats["waits"]), 0.5), 3),
+                    "wait_p95_ms": round(1000 * percentile(list(stats["waits"]), 0.95), 3),
+                }
+                for agent, stats in self._agents.items()
+            }
+            return {"max_concurrency": self.max_concurrency, "queue_depth": len(self._queue), "in_flight": self._running, "agents": agents}
+
+    def close(self):
+        self.client.close()
+
+
+class ScheduledLLMClient:
+    """An agent's view of an `LLMScheduler`, with the client interface the agents expect."""
+    def __init__(self, scheduler: LLMScheduler, agent: str, priority: int = PRIORITY_BACKGROUND):
+        self.scheduler = scheduler
+        self.agent = agent
+        self.priority = priority
+
+    def generate(self, model: str, prompt: str, **options) -> str:
+        return self.scheduler.generate(model, prompt, agent=self.agent, priority=self.priority, **options)
+
+    def stream_generate(self, model: str, prompt: str, **options):
+        yield from self.scheduler.stream_generate(model, prompt, agent=self.agent, priority=self.priority, **options)
+
+    def model_digest(self, model: str) -> str:
+        model_digest = getattr(self.scheduler.client, "model_digest", None)
+        return model_digest(model) if model_digest else ""
+
+    def stats(self) -> dict:
+        return self.scheduler.stats()["agents"].get(self.agent, {})
+
+    def close(self):
+        self.scheduler.close()
@@ -0,0 +1,205 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_METRIC_NAME = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Returns the nearest-rank `q` quantile (0..1) of `values`, or 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class Telemetry:
+    """
+    In-process spans, counters and histograms for the RAG pipeline.
+
+    Spans time a block of work (a graph node, an LLM or embedding call) into the
+    `span_duration_seconds` histogram labelled with the span name, and are logged as
+    structured records at DEBUG level. Histograms keep the last `max_samples` values per
+    label set, which is enough for stable p50/p95 figures without unbounded memory.
+    """
+    def __init__(self, max_samples: int = 2048):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1.0, **labels):
+        """Adds `value` to a counter, e.g. `increment("llm_cache_hits_total", model=...)`."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Sets a value that can go up and down, e.g. a queue depth."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Records one value in a histogram, e.g. a prompt size or a retrieval score."""
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"count": 0, "sum": 0.0, "max": float("-inf"), "samples": deque(maxlen=self.max_samples)}
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["max"] = max(histogram["max"], value)
+            histogram["samples"].append(value)
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """
+        Times the enclosed block. The yielded dict may be filled with attributes (sizes,
+        counts) that are logged with the span but not aggregated.
+        """
+        attributes = {}
+        status = "ok"
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            self.observe("span_duration_seconds", duration, span=name, **labels)
+            if status == "error":
+                self.increment("span_errors_total", span=name, **labels)
+            if logger.isEnabledFor(logging.DEBUG):
+                event = {"span": name, "duration_ms": round(1000 * duration, 3), "status": status, **labels, **attributes}
+                logger.debug("span %s took %.1f ms", name, 1000 * duration, extra={"telemetry": event})
+
+    def snapshot(self) -> dict:
+        """Returns every counter, gauge and histogram summary (count, sum, p50, p95, max) as plain data."""
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(self._counters.items())]
+            gauges = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in sorted(self._gauges.items())]
+            histograms = []
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                samples = list(histogram["samples"])
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram["count"],
+                    "sum": histogram["sum"],
+                    "p50": percentile(samples, 0.5),
+                    "p95": percentile(samples, 0.95),
+                    "max": histogram["max"],
+                })
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def stage_latencies(self) -> dict:
+        """Returns {span name: {"count", "p50_ms", "p95_ms"}}, to see where the latency budget goes."""
+        stages = {}
+        for histogram in self.snapshot()["histograms"]:
+            if histogram["name"] == "span_duration_seconds":
+                labels = dict(histogram["labels"])
+                span = labels.pop("span")
+                name = span + "".join(f"[{key}={value}]" for key, value in sorted(labels.items()))
+                stages[name] = {"count": histogram["count"], "p50_ms": round(1000 * histogram["p50"], 3), "p95_ms": round(1000 * histogram["p95"], 3)}
+        return stages
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), sort_keys=True)
+
+    def to_prometheus(self, prefix: str = "rag_") -> str:
+        """Renders the snapshot in the Prometheus text exposition format (histograms as summaries)."""
+        def metric(name):
+            return prefix + _METRIC_NAME.sub("_", name)
+
+        def label_text(labels, **extra):
+            items = {**labels, **extra}
+            if not items:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in items.values())
+            return "{" + ",".join(f'{_METRIC_NAME.sub("_", key)}="{value}"' for key, value in zip(items, escaped)) + "}"
+
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+        for kind in ("counter", "gauge"):
+            for sample in snapshot[kind + "s"]:
+                name = metric(sample["name"])
+                if name not in declared:
+                    lines.append(f"# TYPE {name} {kind}")
+                    declared.add(name)
+                lines.append(f"{name}{label_text(sample['labels'])} {sample['value']:g}")
+        for histogram in snapshot["histograms"]:
+            name = metric(histogram["name"])
+            if name not in declared:
+                lines.append(f"# TYPE {name} summary")
+                declared.add(name)
+            for quantile in ("0.5", "0.95"):
+                value = histogram["p50"] if quantile == "0.5" else histogram["p95"]
+                lines.append(f"{name}{label_text(histogram['labels'], quantile=quantile)} {value:g}")
+            lines.append(f"{name}_sum{label_text(histogram['labels'])} {histogram['sum']:g}")
+            lines.append(f"{name}_count{label_text(histogram['labels'])} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry() -> Telemetry:
+    """Returns the process-wide telemetry collector shared by all components."""
+    return _telemetry
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as one JSON object per line, including any span attributes."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "telemetry", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = None, json_logs: bool = None):
+    """
+    Sets up the root logger for the CLI, the server and batch runs.
+
+    Args:
+        level: The log level name. Defaults to RAG_LOG_LEVEL, then "INFO"; "DEBUG"
+            also logs every span.
+        json_logs: One JSON object per line instead of plain text. Defaults to
+            RAG_LOG_FORMAT == "json".
+    """
+    level = (level or os.getenv("RAG_LOG_LEVEL", "INFO")).upper()
+    if json_logs is None:
+        json_logs = os.getenv("RAG_LOG_FORMAT", "text").lower() == "json"
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if json_logs else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -1,40 +1,179 @@
-from langchain_community.vectorstores import Chroma
-import chromadb
-from sentence_transformers import SentenceTransformer
+from langchain_core.documents import Document
+import logging
+import os
+import threading
+from src.tools.embedding_cache import EmbeddingCache
+from src.tools.embedding_engine import DEFAULT_TOKEN_BUDGET, EMBEDDING_MODES, BatchSizeTuner, bucket_batches, load_sentence_transformer
+from src.tools.flat_vector_store import FlatVectorStore
+from src.tools.telemetry import get_telemetry
+
+logger = logging.getLogger(__name__)
 
 class SentenceTransformerEmbeddings:
     """
     A custom embedding class that uses the sentence-transformers library.
+    An optional `EmbeddingCache` avoids re-encoding text that was embedded before.
+
+    Bulk calls are encoded in length-bucketed batches whose size is tuned on first use;
+    single queries take a direct one-text path. With `processes`, large bulk calls are
+    spread over a pool of encoder processes.
+
+    The model is loaded on the first call that needs it, so opening a store whose queries
+    and ingestion are answered from the cache never loads it; `load` loads it ahead of time.
     """
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
-        # The model will be downloaded from the Hugging Face Hub the first time it's used.
-        try:
-            self.model = SentenceTransformer(model_name)
-        except Exception as e:
-            raise RuntimeError(f"Failed to load SentenceTransformer model '{model_name}'. Please ensure you have an internet connection and the model name is correct. Error: {e}")
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', cache: EmbeddingCache = None, mode: str = "fp32", token_budget: int = None, processes: int = 0, pool_threshold: int = 2048, snapshot_directory: str = None):
+        """
+        Args:
+            model_name: The sentence-transformers model.
+            cache: An optional `EmbeddingCache`.
+            mode: "fp32", "int8" (dynamically quantized) or "onnx", see `load_sentence_transformer`.
+            token_budget: Padded tokens per batch. None tunes it on the first large call.
+            processes: The encoder pool size for bulk calls; 0 or 1 encodes in-process.
+            pool_threshold: The smallest call sent to the pool.
+            snapshot_directory: Where a local copy of the model is kept, see `load_sentence_transformer`.
+        """
+        if mode not in EMBEDDING_MODES:
+            raise ValueError(f"Unknown embedding mode '{mode}'. Expected one of {', '.join(EMBEDDING_MODES)}.")
+        self.model_name = model_name
+        self.mode = mode
+        # Quantized models give slightly different vectors, so they get their own cache entries.
+        self.cache_model_name = model_name if mode == "fp32" else f"{model_name}@{mode}"
+        self.cache = cache
+        self.processes = processes
+        self.pool_threshold = pool_threshold
+        self.tuner = BatchSizeTuner()
+        self.tuner.token_budget = token_budget
+        self.snapshot_directory = snapshot_directory
+        self._pool = None
+        self._model = None
+        self._model_lock = threading.Lock()
+
+    def load(self):
+        """Loads the model if it is not loaded yet, and returns it."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # The model will be downloaded from the Hugging Face Hub the first time it's used.
+                    try:
+                        self._model = load_sentence_transformer(self.model_name, self.mode, self.snapshot_directory)
+                    except Exception as e:
+                        raise RuntimeError(f"Failed to load SentenceTransformer model '{self.model_name}'. Please ensure you have an internet connection and the model name is correct. Error: {e}")
+        return self._model
+
+    @property
+    def model(self):
+        return self.load()
+
+    def _encode_batches(self, texts: list[str], token_budget: int) -> list[list[float]]:
+        embeddings = [None] * len(texts)
+        for batch in bucket_batches(texts, token_budget):
+            vectors = self.model.encode([texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False, convert_to_numpy=True)
+            for i, vector in zip(batch, vectors.tolist()):
+                embeddings[i] = vector
+        return embeddings
+
+    def _encode_model(self, texts: list[str]) -> list[list[float]]:
+        """Encodes texts with the model, choosing the single-text, pooled or bucketed path."""
+        if len(texts) == 1:
+            return self.model.encode(texts, batch_size=1, show_progress_bar=False, convert_to_numpy=True).tolist()
+
+        if self.processes > 1 and len(texts) >= self.pool_threshold:
+            if self._pool is None:
+                self._pool = self.model.start_multi_process_pool(["cpu"] * self.processes)
+            return self.model.encode_multi_process(texts, self._pool, batch_size=64).tolist()
+
+        if self.tuner.token_budget is None and len(texts) >= self.tuner.sample_size:
+            head = self.tuner.tune(self._encode_batches, texts)
+            return head + self._encode_batches(texts[len(head):], self.tuner.token_budget)
+        return self._encode_batches(texts, self.tuner.token_budget or DEFAULT_TOKEN_BUDGET)
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        """Encodes texts, sending only cache misses to the model."""
+        with get_telemetry().span("embedding.encode", mode=self.mode) as span:
+            span["texts"] = len(texts)
+            if self.cache is None:
+                return self._encode_model(texts)
+
+            embeddings = self.cache.get_many(self.cache_model_name, texts)
+            missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+            span["cache_misses"] = len(missing)
+            get_telemetry().increment("embedding_cache_hits_total", len(texts) - len(missing))
+            get_telemetry().increment("embedding_cache_misses_total", len(missing))
+            if missing:
+                missing_texts = [texts[i] for i in missing]
+                encoded = self.cache.put_many(self.cache_model_name, missing_texts, self._encode_model(missing_texts))
+                for i, embedding in zip(missing, encoded):
+                    embeddings[i] = embedding
+            return embeddings
 
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
         """Embeds a list of documents."""
-        print(f"Embedding {len(texts)} documents with sentence-transformer model...")
-        embeddings = self.model.encode(texts, convert_to_tensor=False).tolist()
-        return embeddings
+        logger.debug("Embedding %d documents with sentence-transformer model...", len(texts))
+        return self._encode(texts)
 
     def embed_query(self, text: str) -> list[float]:
         """Embeds a single query."""
-        print(f"Embedding query with sentence-transformer model...")
-        embedding = self.model.encode(text, convert_to_tensor=False).tolist()
-        return embedding
+        logger.debug("Embedding query with sentence-transformer model...")
+        return self._encode([text])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Embeds several queries in a single model pass."""
+        logger.debug("Embedding %d queries with sentence-transformer model...", len(texts))
+        return self._encode(texts)
+
+    def cache_stats(self) -> dict:
+        """Returns the embedding cache statistics, or an empty dict when caching is off."""
+        return self.cache.stats() if self.cache is not None else {}
 
-def get_vector_store(collection_name: str = "rag_agentic_system", persist_directory: str = "./chroma_db"):
+    def close(self):
+        """Stops the encoder pool, if one was started."""
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+def get_vector_store(collection_name: str = "rag_agentic_system", persist_directory: str = "./chroma_db", embedding_cache: bool = True, embedding_cache_dtype: str = "float32", backend: str = None, vector_dtype: str = "float32", embedding_mode: str = None, embedding_processes: int = None, model_snapshot: bool = None):
     """
-    Initializes and returns a Chroma vector store using sentence-transformers.
+    Initializes and returns a vector store using sentence-transformers.
+    With `embedding_cache`, embeddings are cached on disk next to the store data.
+
+    Args:
+        backend: "chroma" or "flat" (exact search over a memory-mapped matrix, see
+            `FlatVectorStore`). Defaults to the RAG_VECTOR_BACKEND environment variable,
+            then "chroma". Each backend keeps its own data while the ingestion manifest is
+            shared, so switching backends needs a fresh `persist_directory`.
+        vector_dtype: The flat backend's storage type, "float32" or "int8".
+        embedding_mode: "fp32", "int8" or "onnx". Defaults to RAG_EMBEDDING_MODE, then "fp32".
+        embedding_processes: The encoder pool size for bulk ingestion. Defaults to
+            RAG_EMBEDDING_PROCESSES, then 0 (no pool).
+        model_snapshot: Whether to keep a local copy of the embedding model in
+            `persist_directory` and load it from there. Defaults to RAG_MODEL_SNAPSHOT
+            ("1" or "0"), then off.
     """
-    print(f"Initializing vector store with sentence-transformers embeddings...")
+    backend = backend or os.getenv("RAG_VECTOR_BACKEND", "chroma")
+    if backend not in ("chroma", "flat"):
+        raise ValueError(f"Unknown vector store backend '{backend}'. Expected 'chroma' or 'flat'.")
+    logger.info("Initializing %s vector store with sentence-transformers embeddings...", backend)
+    if model_snapshot is None:
+        model_snapshot = os.getenv("RAG_MODEL_SNAPSHOT", "0") == "1"
 
-    client = chromadb.PersistentClient(path=persist_directory)
+    cache = None
+    if embedding_cache:
+        cache = EmbeddingCache(os.path.join(persist_directory, "embedding_cache.sqlite3"), dtype=embedding_cache_dtype)
+    embeddings = SentenceTransformerEmbeddings(
+        model_name='all-MiniLM-L6-v2',
+        cache=cache,
+        mode=embedding_mode or os.getenv("RAG_EMBEDDING_MODE", "fp32"),
+        processes=embedding_processes if embedding_processes is not None else int(os.getenv("RAG_EMBEDDING_PROCESSES", "0")),
+        snapshot_directory=os.path.join(persist_directory, "models") if model_snapshot else None,
+    )
+
+    if backend == "flat":
+        return FlatVectorStore(embeddings, persist_directory=persist_directory, collection_name=collection_name, dtype=vector_dtype)
 
-    embeddings = SentenceTransformerEmbeddings(model_name='all-MiniLM-L6-v2')
+    import chromadb
+    from langchain_community.vectorstores import Chroma
 
+    client = chromadb.PersistentClient(path=persist_directory)
     vector_store = Chroma(
         collection_name=collection_name,
         embedding_function=embeddings,
@@ -44,17 +183,102 @@ def get_vector_store(collection_name: str = "rag_agentic_system", persist_direct
 
     return vector_store
 
-def add_documents_to_store(vector_store, documents):
+def similarity_search_batch(vector_store, queries: list[str], k: int = 4) -> list[list[tuple[Document, float]]]:
+    """
+    Runs a similarity search for several queries at once.
+
+    For a Chroma store all queries are embedded in one `encode` call and sent to the
+    collection as a single multi-vector query. Stores that implement their own
+    `similarity_search_batch` are delegated to; any other store is queried one by one.
+
+    Returns:
+        One list of (document, distance) pairs per query, nearest first.
+    """
+    if not queries:
+        return []
+    if hasattr(vector_store, "similarity_search_batch"):
+        return vector_store.similarity_search_batch(queries, k=k)
+    if not hasattr(vector_store, "_collection"):
+        return [vector_store.similarity_search_with_score(query, k=k) for query in queries]
+
+    embeddings = vector_store.embeddings
+    if hasattr(embeddings, "embed_queries"):
+        query_embeddings = embeddings.embed_queries(queries)
+    else:
+        query_embeddings = embeddings.embed_documents(queries)
+
+    results = vector_store._collection.query(
+        query_embeddings=query_embeddings,
+        n_results=k,
+        include=["documents", "metadatas", "distances"],
+    )
+
+    batched = []
+    for ids, texts, metadatas, distances in zip(results["ids"], results["documents"], results["metadatas"], results["distances"]):
+        hits = []
+        for chunk_id, text, metadata, distance in zip(ids, texts, metadatas, distances):
+            metadata = dict(metadata or {})
+            metadata.setdefault("chunk_id", chunk_id)
+            hits.append((Document(page_content=text, metadata=metadata), distance))
+        batched.append(hits)
+    return batched
+
+def get_embeddings(vector_store, documents: list[Document]) -> list[list[float]]:
+    """
+    Returns the stored embedding of each document, looked up by its `chunk_id`.
+    Documents the store cannot resolve are re-embedded.
+    """
+    if hasattr(vector_store, "get_embeddings"):
+        return vector_store.get_embeddings(documents)
+
+    stored = {}
+    ids = [doc.metadata.get("chunk_id") for doc in documents]
+    if hasattr(vector_store, "_collection") and any(ids):
+        found = vector_store._collection.get(ids=[i for i in ids if i], include=["embeddings"])
+        stored = dict(zip(found["ids"], found["embeddings"]))
+
+    missing = [doc.page_content for doc, chunk_id in zip(documents, ids) if chunk_id not in stored]
+    fresh = iter(vector_store.embeddings.embed_documents(missing) if missing else [])
+    return [list(stored[chunk_id]) if chunk_id in stored else next(fresh) for chunk_id in ids]
+
+def get_documents(vector_store, ids: list[str]) -> dict:
+    """
+    Fetches stored chunks by ID.
+
+    Returns:
+        A dict mapping each found ID to its Document (with `chunk_id` metadata).
+    """
+    if not ids:
+        return {}
+    if hasattr(vector_store, "get_documents"):
+        return vector_store.get_documents(ids)
+
+    found = vector_store.get(ids=ids, include=["documents", "metadatas"])
+    documents = {}
+    for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"]):
+        metadata = dict(metadata or {})
+        metadata.setdefault("chunk_id", chunk_id)
+        documents[chunk_id] = Document(page_content=text, metadata=metadata)
+    return documents
+
+def add_documents_to_store(vector_store, documents, ids: list[str] = None, lexical_index=None, batch_size: int = 256):
     """
-    Adds a list of documents to the vector store.
+    Adds a list of documents to the vector store, and to the BM25 index if one is given.
+    Documents are embedded and written `batch_size` at a time to bound peak memory; use
+    `ingestion.sync_documents` to ingest a whole corpus with overlapping stages.
     """
     if not documents:
-        print("No documents to add to the vector store.")
+        logger.warning("No documents to add to the vector store.")
         return
 
-    print(f"Adding {len(documents)} document chunks to the vector store...")
-    vector_store.add_documents(documents)
-    print("Documents added and persisted successfully.")
+    logger.info("Adding %d document chunks to the vector store...", len(documents))
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        batch_ids = ids[start:start + batch_size] if ids else None
+        vector_store.add_documents(batch, ids=batch_ids)
+        if lexical_index is not None:
+            lexical_index.add_documents(batch, ids=batch_ids)
+    logger.info("Documents added and persisted successfully.")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,96 @@
+import math
+import zlib
+
+from langchain_core.documents import Document
+
+from src.agents.evaluator import Evaluator
+from src.agents.generator import Generator
+from src.agents.orchestrator import Orchestrator
+from src.agents.rephraser import Rephraser
+from src.agents.retriever import Retriever
+
+
+class HashingEmbeddings:
+    """Unit-length bag-of-words vectors, so similar texts land close together."""
+    def __init__(self, dim: int = 32):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        vectors = []
+        for text in texts:
+            vector = [0.0] * self.dim
+            for word in text.lower().split():
+                vector[zlib.crc32(word.encode()) % self.dim] += 1.0
+            norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+            vectors.append([x / norm for x in vector])
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# A small corpus whose topics `HashingEmbeddings` keeps apart.
+TEXTS = ["red apples and pears", "blue ocean waves", "green forest trees", "red sports cars", "quiet blue lake"]
+
+
+class LetterEmbeddings:
+    """Embeds text as letter counts, so rewordings with the same letters are near-identical."""
+    def embed_query(self, text):
+        return [text.lower().count(chr(ord("a") + i)) for i in range(26)]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+class ScriptedLLMClient:
+    """
+    Plays every agent's part and records the prompts it receives.
+
+    The Rephraser always gets `rephrasing`. The Generator and the Evaluator's judge get
+    their replies from `answers` and `verdicts`, in order, with the last reply repeated
+    once a list runs out. An exception in `answers` is raised instead of returned.
+    """
+    def __init__(self, answers=("Paris is the capital of France.",), verdicts=("yes",), rephrasing="capital city of France"):
+        self.answers = list(answers)
+        self.verdicts = list(verdicts)
+        self.rephrasing = rephrasing
+        self.prompts = []
+
+    def generate(self, model, prompt, **options):
+        self.prompts.append(prompt)
+        if "Original Query:" in prompt:
+            return self.rephrasing
+        if "(yes/no)" in prompt:
+            return self._next(self.verdicts)
+        answer = self._next(self.answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    @staticmethod
+    def _next(replies):
+        return replies.pop(0) if len(replies) > 1 else replies[0]
+
+
+class CountingVectorStore:
+    """Returns one chunk for every query and records each batched search."""
+    def __init__(self):
+        self.searches = 0
+        self.queries = []
+
+    def similarity_search_batch(self, queries, k=4):
+        self.searches += 1
+        self.queries.append(list(queries))
+        return [[(Document(page_content="Paris is the capital of France.", metadata={"chunk_id": "france-0"}), 0.2)] for _ in queries]
+
+
+def make_orchestrator(client, store, checkpointer=None, answer_cache=None, max_generation_attempts=2):
+    return Orchestrator(
+        rephraser=Rephraser(llm_client=client),
+        retriever=Retriever(vector_store=store),
+        generator=Generator(llm_client=client),
+        evaluator=Evaluator(llm_client=client),
+        answer_cache=answer_cache,
+        max_generation_attempts=max_generation_attempts,
+        checkpointer=checkpointer,
+    )
@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubOllamaServer:
+    """
+    A minimal in-process stand-in for the Ollama HTTP API, used by the tests.
+
+    It answers `/api/generate` by calling `responder(payload)` and records every
+    request payload and the client port it arrived on. `latency` is added before the
+    first token; with `token_rate`, every word of the response takes 1/token_rate more
+    seconds, like a model decoding at that many tokens per second.
+    """
+    def __init__(self, responder=None, fail_first: int = 0, models: list = None, latency: float = 0.0, token_rate: float = None):
+        self.responder = responder or (lambda payload: f"echo: {payload['prompt']}")
+        self.latency = latency
+        self.token_rate = token_rate
+        self.fail_first = fail_first
+        self.models = models or []
+        self.requests = []
+        self.client_ports = []
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send(200, {"models": stub.models})
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with stub._lock:
+                    stub.requests.append(payload)
+                    stub.client_ports.append(self.client_address[1])
+                    failing = stub.fail_first > 0
+                    if failing:
+                        stub.fail_first -= 1
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if failing:
+                    self._send(503, {"error": "model is loading"})
+                elif payload.get("stream"):
+                    self._send_stream(payload.get("model"), stub.responder(payload))
+                else:
+                    text = stub.responder(payload)
+                    if stub.token_rate:
+                        time.sleep(len(text.split(" ")) / stub.token_rate)
+                    self._send(200, {"model": payload.get("model"), "response": text, "done": True})
+
+            def _send_stream(self, model, text):
+                """Streams the response one word per NDJSON line using chunked encoding."""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                words = text.split(" ")
+                pieces = [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+                lines = [{"model": model, "response": piece, "done": False} for piece in pieces]
+                lines.append({"model": model, "response": "", "done": True})
+                for line in lines:
+                    if stub.token_rate and line["response"]:
+                        time.sleep(1 / stub.token_rate)
+                    data = json.dumps(line).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,30 @@
+from src.tools.answer_cache import SemanticAnswerCache
+from tests.doubles import LetterEmbeddings
+
+
+def test_near_duplicate_query_hits(tmp_path):
+    """
+    Tests that a near-duplicate question returns the stored answer and verdict.
+    """
+    cache = SemanticAnswerCache(LetterEmbeddings(), str(tmp_path / "answers.sqlite3"), threshold=0.95, corpus_version="v1")
+    cache.store("What is the capital of France?", "Paris.", True)
+
+    hit = cache.lookup("what is the capital of france")
+    miss = cache.lookup("Which currency does Japan use?")
+
+    assert hit["final_answer"] == "Paris." and hit["is_answer_faithful"] is True
+    assert miss is None
+
+
+def test_corpus_change_invalidates_entries(tmp_path):
+    """
+    Tests that entries produced against an older corpus version are dropped.
+    """
+    path = str(tmp_path / "answers.sqlite3")
+    SemanticAnswerCache(LetterEmbeddings(), path, corpus_version="v1").store("What is the capital of France?", "Paris.", True)
+
+    same_corpus = SemanticAnswerCache(LetterEmbeddings(), path, corpus_version="v1")
+    new_corpus = SemanticAnswerCache(LetterEmbeddings(), path, corpus_version="v2")
+
+    assert same_corpus.stats()["entries"] == 1
+    assert new_corpus.lookup("What is the capital of France?") is None
@@ -0,0 +1,73 @@
+import json
+
+from langchain_core.documents import Document
+
+from src.agents.evaluator import Evaluator
+from src.agents.generator import Generator
+from src.agents.orchestrator import Orchestrator
+from src.agents.rephraser import Rephraser
+from src.agents.retriever import Retriever
+from src.batch import BatchRunner
+from tests.doubles import ScriptedLLMClient
+
+
+class RecordingVectorStore:
+    """Returns the same chunks for every query and records the size of each batched search."""
+    def __init__(self):
+        self.batches = []
+        self.documents = [Document(page_content="Paris is the capital of France.", metadata={"chunk_id": "france-0"})]
+
+    def similarity_search_batch(self, queries, k=4):
+        self.batches.append(len(queries))
+        return [[(doc, 0.2) for doc in self.documents] for _ in queries]
+
+
+def make_runner():
+    client = ScriptedLLMClient(rephrasing="variant one\nvariant two")
+    store = RecordingVectorStore()
+    orchestrator = Orchestrator(
+        rephraser=Rephraser(llm_client=client),
+        retriever=Retriever(vector_store=store),
+        generator=Generator(llm_client=client),
+        evaluator=Evaluator(llm_client=client),
+    )
+    return BatchRunner(orchestrator, concurrency=2), client, store
+
+
+def test_batch_dedupes_queries_and_batches_retrieval(tmp_path):
+    """
+    Tests that identical queries are answered once, that the first-pass and variant
+    searches are each a single batched call, and that every record gets a result.
+    """
+    input_path, output_path = tmp_path / "queries.jsonl", tmp_path / "results.jsonl"
+    queries = ["capital of France?", "capital of Spain?", " capital of France? ", "capital of Italy?"]
+    input_path.write_text("".join(json.dumps({"query": query}) + "\n" for query in queries))
+    runner, client, store = make_runner()
+
+    summary = runner.run_file(str(input_path), str(output_path))
+
+    results = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert summary == {"records": 4, "skipped": 0, "written": 4, "failed": 0}
+    assert sorted(result["id"] for result in results) == [1, 2, 3, 4]
+    assert all(result["final_answer"] == "Paris is the capital of France." for result in results)
+    assert store.batches == [3, 2]
+    assert sum("Original Query:" in prompt for prompt in client.prompts) == 3
+    assert {"first_pass_s", "rephrase_s", "retrieval_s", "generate_s", "evaluate_s", "total_s"} <= set(results[0]["timings"])
+
+
+def test_batch_resumes_after_an_interrupted_run(tmp_path):
+    """
+    Tests that a rerun skips records already in the output, discarding a half-written
+    last line, and answers only the rest.
+    """
+    input_path, output_path = tmp_path / "queries.jsonl", tmp_path / "results.jsonl"
+    input_path.write_text("".join(json.dumps({"id": f"q{i}", "query": f"question {i}"}) + "\n" for i in range(3)))
+    output_path.write_text(json.dumps({"id": "q0", "final_answer": "done before"}) + "\n" + '{"id": "q1", "final_ans')
+    runner, client, _ = make_runner()
+
+    summary = runner.run_file(str(input_path), str(output_path))
+
+    results = [json.loads(line) for line in output_path.read_text().splitlines()]
+    assert summary == {"records": 3, "skipped": 1, "written": 2, "failed": 0}
+    assert [result["id"] for result in results][0] == "q0"
+    assert sorted(result["id"] for result in results[1:]) == ["q1", "q2"]
@@ -0,0 +1,53 @@
+from src.tools.bm25_index import BM25Index, tokenize
+
+
+def test_exact_term_queries_find_ids_and_codes():
+    """
+    Tests that an error code buried in a chunk ranks that chunk first.
+    """
+    index = BM25Index()
+    index.add("a", "The deployment failed with error ERR-1042 during the migration step.")
+    index.add("b", "Deployments usually succeed when the migration is run twice.")
+    index.add("c", "The capital of France is Paris.")
+
+    results = index.search("what does ERR-1042 mean", k=2)
+
+    assert results[0][0] == "a"
+    assert "err-1042" in tokenize("ERR-1042") and "1042" in tokenize("ERR-1042")
+
+
+def test_incremental_updates_and_deletes_survive_save_and_load(tmp_path):
+    """
+    Tests that a memory-mapped index accepts further adds and deletes and compacts on save.
+    """
+    index = BM25Index(str(tmp_path / "bm25"))
+    index.add("a", "alpha beta")
+    index.add("b", "beta gamma")
+    index.save()
+
+    reopened = BM25Index(str(tmp_path / "bm25"))
+    reopened.add("c", "gamma delta")
+    reopened.delete(["a"])
+
+    assert [chunk_id for chunk_id, _ in reopened.search("alpha")] == []
+    assert {chunk_id for chunk_id, _ in reopened.search("gamma")} == {"b", "c"}
+
+    reopened.save()
+    assert len(BM25Index(str(tmp_path / "bm25"))) == 2
+    reopened.close()
+
+
+def test_stopwords_and_very_common_terms_are_not_scored():
+    """
+    Tests that stopwords are not indexed and that a term found in most chunks is skipped
+    when the query has a rarer term, but still used when it is all the query has.
+    """
+    index = BM25Index()
+    for i in range(10):
+        index.add(f"c{i}", f"the report covers quarter {i}")
+    index.add("x", "the report lists the incident")
+
+    assert tokenize("The report is ready") == ["report", "ready"]
+    assert index._query_terms("report incident", live=len(index)) == ["incident"]
+    assert [chunk_id for chunk_id, _ in index.search("report incident", k=3)] == ["x"]
+    assert len(index.search("report", k=3)) == 3
@@ -0,0 +1,80 @@
+from langchain_core.documents import Document
+
+from src.agents.evaluator import Evaluator
+from src.agents.generator import Generator
+from src.agents.orchestrator import Orchestrator
+from src.agents.rephraser import Rephraser
+from src.agents.retriever import Retriever
+from src.tools import chunk_store as chunk_store_module
+from src.tools.chunk_store import ChunkStore
+
+
+def make_document(i):
+    return Document(page_content=f"Chunk number {i}.", metadata={"chunk_id": f"doc-{i}", "source": "doc.txt", "start_index": 20 * i})
+
+
+class StoredVectorStore:
+    """Serves chunks by ID, like the persistent store behind the chunk cache."""
+    def __init__(self, documents):
+        self.documents = {doc.metadata["chunk_id"]: doc for doc in documents}
+        self.fetched = []
+
+    def similarity_search_batch(self, queries, k=4):
+        return [[(doc, 0.1 * rank) for rank, doc in enumerate(list(self.documents.values())[:k])] for _ in queries]
+
+    def get_documents(self, ids):
+        self.fetched.extend(ids)
+        return {chunk_id: self.documents[chunk_id] for chunk_id in ids if chunk_id in self.documents}
+
+
+class RecordingLLMClient:
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, model, prompt, **options):
+        self.prompts.append(prompt)
+        if "Original Query:" in prompt:
+            return "chunk numbers"
+        return "yes" if "(yes/no)" in prompt else "Chunk number 0."
+
+
+def test_evicted_chunks_are_fetched_from_the_vector_store():
+    """
+    Tests that references resolve in order, and that chunks evicted from the bounded
+    cache are fetched back from the vector store by ID.
+    """
+    documents = [make_document(i) for i in range(3)]
+    store = ChunkStore(StoredVectorStore(documents), max_chunks=2)
+
+    refs = store.refs([(doc, 0.5) for doc in documents])
+
+    assert refs[0] == {"chunk_id": "doc-0", "score": 0.5, "source": "doc.txt", "start": 0}
+    assert len(store) == 2
+    assert store.documents(list(reversed(refs))) == list(reversed(documents))
+    assert store.vector_store.fetched == ["doc-0"]
+
+
+def test_state_carries_references_and_context_is_rendered_once(monkeypatch):
+    """
+    Tests that the workflow state holds chunk references instead of Documents, and that
+    the Generator and Evaluator prompts share one packed context.
+    """
+    packs = []
+    pack_context = chunk_store_module.pack_context
+    monkeypatch.setattr(chunk_store_module, "pack_context", lambda *args, **kwargs: packs.append(args) or pack_context(*args, **kwargs))
+    client = RecordingLLMClient()
+    orchestrator = Orchestrator(
+        rephraser=Rephraser(llm_client=client),
+        retriever=Retriever(vector_store=StoredVectorStore([make_document(i) for i in range(3)])),
+        generator=Generator(llm_client=client),
+        evaluator=Evaluator(llm_client=client),
+    )
+
+    state = orchestrator.workflow.invoke({"original_query": "Which chunks are there?"})
+
+    assert state["final_answer"] == "Chunk number 0."
+    assert [ref["chunk_id"] for ref in state["retrieved_documents"]] == ["doc-0", "doc-1", "doc-2"]
+    assert all(set(ref) == {"chunk_id", "score", "source", "start"} for refs in state["first_pass_results"] for ref in refs)
+    assert len(packs) == 1
+    context = "\n\n".join(f"Chunk number {i}." for i in range(3))
+    assert sum(context in prompt for prompt in client.prompts) == 2
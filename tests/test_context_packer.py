@@ -0,0 +1,36 @@
+from types import SimpleNamespace
+
+from src.tools.context_packer import estimate_tokens, pack_context
+
+
+def make_chunks(text, size, overlap, source="doc.txt"):
+    step = size - overlap
+    return [
+        SimpleNamespace(page_content=text[start:start + size], metadata={"source": source, "start_index": start})
+        for start in range(0, len(text) - overlap, step)
+    ]
+
+
+def test_overlapping_chunks_are_merged():
+    """
+    Tests that adjacent overlapping chunks of one source are stitched back together.
+    """
+    text = "".join(chr(ord("a") + i % 26) for i in range(300))
+    chunks = make_chunks(text, size=100, overlap=20)
+
+    context = pack_context(list(reversed(chunks)), token_budget=10_000)
+
+    assert context == text
+
+
+def test_context_respects_token_budget_and_order():
+    """
+    Tests that packing keeps the most relevant segments that fit in the budget.
+    """
+    documents = ["first " * 50, "second " * 400, "third " * 50]
+
+    context = pack_context(documents, token_budget=200)
+
+    assert estimate_tokens(context) <= 200
+    assert context.startswith("first")
+    assert "second" not in context and "third" in context
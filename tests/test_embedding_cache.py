@@ -0,0 +1,43 @@
+from src.tools.embedding_cache import EmbeddingCache
+
+
+def test_batch_lookup_reports_misses_and_hits(tmp_path):
+    """
+    Tests that only unseen texts miss, and that whitespace variants share an entry.
+    """
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_many("mini", ["capital of France"], [[0.5, 0.25, 1.0]])
+
+    results = cache.get_many("mini", ["capital  of France ", "capital of Japan"])
+
+    assert results == [[0.5, 0.25, 1.0], None]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    assert cache.get_many("other-model", ["capital of France"]) == [None]
+
+
+def test_entries_persist_across_instances_in_float16(tmp_path):
+    """
+    Tests that float16 entries survive a reopen and take two bytes per dimension.
+    """
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, dtype="float16")
+    cache.put_many("mini", ["hello"], [[0.5, -2.0, 0.125, 1.0]])
+    cache.close()
+
+    reopened = EmbeddingCache(path, dtype="float16", max_memory_items=1)
+
+    assert reopened.get_many("mini", ["hello"]) == [[0.5, -2.0, 0.125, 1.0]]
+    assert reopened.stats()["disk_bytes"] == 8
+
+
+def test_float16_misses_return_the_stored_vector(tmp_path):
+    """
+    Tests that storing a float16 entry returns the rounded vector, so a miss and a
+    later hit for the same text give identical embeddings.
+    """
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), dtype="float16")
+
+    stored = cache.put_many("mini", ["hello"], [[0.1, 1 / 3, -2.0]])
+
+    assert stored != [[0.1, 1 / 3, -2.0]]
+    assert stored == cache.get_many("mini", ["hello"])
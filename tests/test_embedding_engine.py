@@ -0,0 +1,36 @@
+import time
+
+from src.tools.embedding_engine import BatchSizeTuner, bucket_batches
+
+
+def test_bucket_batches_groups_by_length_within_budget():
+    """
+    Tests that every text lands in exactly one batch, batches hold texts of similar
+    length, and no batch's padded size exceeds the token budget.
+    """
+    texts = ["x" * 400] * 5 + ["short text"] * 50 + ["y" * 1200] * 3
+
+    batches = bucket_batches(texts, token_budget=1024)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(texts)))
+    for batch in batches:
+        lengths = [len(texts[i]) for i in batch]
+        assert lengths == sorted(lengths, reverse=True)
+        assert len(batch) == 1 or len(batch) * min(lengths[0] // 4 + 2, 256) <= 1024
+    assert len(batches[-1]) > len(batches[0])
+
+
+def test_tuner_keeps_the_fastest_budget_and_its_embeddings():
+    """
+    Tests that the tuner picks the candidate with the highest throughput and returns the
+    sample embeddings produced with it.
+    """
+    def encode_batches(texts, token_budget):
+        time.sleep(0.02 if token_budget != 4096 else 0.0)
+        return [[float(token_budget)] for _ in texts]
+
+    tuner = BatchSizeTuner(candidates=(2048, 4096, 8192), sample_size=3)
+    embeddings = tuner.tune(encode_batches, ["a", "b", "c", "d"])
+
+    assert tuner.token_budget == 4096
+    assert embeddings == [[4096.0]] * 3
@@ -0,0 +1,78 @@
+from src.agents.evaluator import Evaluator
+from tests.doubles import LetterEmbeddings
+
+
+class JudgeClient:
+    def __init__(self, reply):
+        self.reply = reply
+        self.prompts = []
+
+    def generate(self, model, prompt, **options):
+        self.prompts.append(prompt)
+        return self.reply
+
+
+DOCUMENTS = [
+    "The capital of France is Paris. The Eiffel Tower is a famous landmark in Paris. The currency of Japan is the Yen.",
+]
+
+
+def test_clearly_supported_answer_skips_llm_judge():
+    """
+    Tests that an answer copied from the context is accepted by the local pre-filter alone.
+    """
+    client = JudgeClient("no")
+    evaluator = Evaluator(llm_client=client, embeddings=LetterEmbeddings())
+
+    assert evaluator.evaluate("capital?", DOCUMENTS, "The capital of France is Paris.") is True
+    assert client.prompts == []
+    assert evaluator.metrics()["prefilter_accept"] == 1
+
+
+def test_ambiguous_answer_goes_to_judge_with_supporting_sentences():
+    """
+    Tests that an ambiguous answer reaches the LLM judge with only the closest context sentences.
+    """
+    client = JudgeClient("no")
+    evaluator = Evaluator(llm_client=client, embeddings=LetterEmbeddings(), accept_threshold=0.999, reject_threshold=0.0)
+
+    verdict = evaluator.evaluate("capital?", DOCUMENTS, "Paris is the capital and has about two million inhabitants.")
+
+    assert verdict is False
+    assert len(client.prompts) == 1
+    assert evaluator.metrics()["llm_judge"] == 1
+
+
+def test_shadow_mode_measures_agreement():
+    """
+    Tests that shadowed pre-filter decisions are compared with the LLM judge without changing the verdict.
+    """
+    client = JudgeClient("yes")
+    evaluator = Evaluator(llm_client=client, embeddings=LetterEmbeddings(), shadow_rate=1.0)
+
+    assert evaluator.evaluate("capital?", DOCUMENTS, "The capital of France is Paris.") is True
+    assert evaluator.metrics()["agreement_rate"] == 1.0
+
+
+def test_recombined_facts_and_negations_go_to_judge():
+    """
+    Tests that answers built from context words but contradicting the context (swapped
+    facts, an added negation) are not accepted by the pre-filter alone.
+    """
+    for answer in ["The capital of Japan is Paris.", "The currency of France is the Yen.", "The Eiffel Tower is not in Paris."]:
+        client = JudgeClient("no")
+        evaluator = Evaluator(llm_client=client, embeddings=LetterEmbeddings())
+
+        assert evaluator.evaluate("question?", DOCUMENTS, answer) is False, answer
+        assert len(client.prompts) == 1, answer
+
+
+def test_honest_abstention_is_not_rejected():
+    """
+    Tests that saying the context lacks the answer is not rejected as unsupported.
+    """
+    client = JudgeClient("no")
+    evaluator = Evaluator(llm_client=client, embeddings=LetterEmbeddings())
+
+    assert evaluator.evaluate("population?", DOCUMENTS, "I don't have enough information to answer.") is True
+    assert evaluator.metrics().get("prefilter_reject", 0) == 0
@@ -0,0 +1,45 @@
+from src.tools.file_loader import get_text_splitter, iter_chunks, load_file, plan_segments
+
+
+def write_corpus(tmp_path):
+    paragraphs = [f"Paragraph {i} über Café résumé naïve, with enough words to fill a line or two. " * 3 for i in range(60)]
+    large = tmp_path / "large.txt"
+    large.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    small = tmp_path / "small.txt"
+    small.write_text("A short note about the corpus.", encoding="utf-8")
+    return large, small
+
+
+def test_small_file_matches_whole_file_split(tmp_path):
+    """
+    Tests that a file below the segment size is chunked exactly as splitting its full text would.
+    """
+    large, _ = write_corpus(tmp_path)
+    text = large.read_text(encoding="utf-8")
+
+    chunks = load_file(str(large))
+    expected = get_text_splitter().create_documents([text])
+
+    assert [(doc.page_content, doc.metadata["start_index"]) for doc in chunks] == [(doc.page_content, doc.metadata["start_index"]) for doc in expected]
+    assert all(doc.metadata["source"] == str(large) for doc in chunks)
+
+
+def test_segmented_parallel_split_keeps_order_and_offsets(tmp_path):
+    """
+    Tests that a file cut into many segments and split by a pool yields chunks in offset
+    order whose `start_index` points at their text in the file, for threads and processes.
+    """
+    large, small = write_corpus(tmp_path)
+    text = large.read_text(encoding="utf-8")
+    assert len(plan_segments(str(large), segment_bytes=2048)) > 5
+
+    for processes in (False, True):
+        chunks = list(iter_chunks(str(tmp_path), workers=2, processes=processes, segment_bytes=2048))
+
+        assert [doc.metadata["source"] for doc in chunks][-1] == str(small)
+        large_chunks = [doc for doc in chunks if doc.metadata["source"] == str(large)]
+        offsets = [doc.metadata["start_index"] for doc in large_chunks]
+        assert offsets == sorted(offsets)
+        for doc in large_chunks:
+            start = doc.metadata["start_index"]
+            assert text[start:start + len(doc.page_content)] == doc.page_content
@@ -0,0 +1,50 @@
+from langchain_core.documents import Document
+
+from src.tools.flat_vector_store import FlatVectorStore
+from tests.doubles import TEXTS, HashingEmbeddings
+
+
+def test_search_matches_brute_force_and_survives_reopen(tmp_path):
+    """
+    Tests that batched search returns the exact nearest chunks with squared-l2 distances,
+    for float32 and int8 storage, and that a reopened store returns the same results.
+    """
+    embeddings = HashingEmbeddings()
+    for dtype in ("float32", "int8"):
+        store = FlatVectorStore(embeddings, str(tmp_path), collection_name=dtype, dtype=dtype, block_size=2)
+        store.add_documents([Document(page_content=text, metadata={"source": f"{i}.txt"}) for i, text in enumerate(TEXTS)], ids=[f"c{i}" for i in range(len(TEXTS))])
+
+        queries = ["red cars", "blue lake"]
+        results = store.similarity_search_batch(queries, k=2)
+        for query, hits in zip(queries, results):
+            q = embeddings.embed_query(query)
+            expected = sorted(TEXTS, key=lambda text: sum((a - b) ** 2 for a, b in zip(q, embeddings.embed_query(text))))[:2]
+            assert [doc.page_content for doc, _ in hits] == expected
+            assert abs(hits[0][1] - sum((a - b) ** 2 for a, b in zip(q, embeddings.embed_query(expected[0])))) < 0.05
+        assert results[0][0][0].metadata["chunk_id"] == "c3"
+        store.close()
+
+        reopened = FlatVectorStore(embeddings, str(tmp_path), collection_name=dtype, dtype=dtype)
+        assert [doc.page_content for doc, _ in reopened.similarity_search_batch(queries, k=2)[1]] == [doc.page_content for doc, _ in results[1]]
+        reopened.close()
+
+
+def test_delete_upsert_and_compaction(tmp_path):
+    """
+    Tests that deleted chunks are never returned, re-adding an ID replaces it, and
+    compaction keeps IDs, texts and search results intact.
+    """
+    store = FlatVectorStore(HashingEmbeddings(), str(tmp_path))
+    store.add_documents([Document(page_content=text) for text in TEXTS], ids=[f"c{i}" for i in range(len(TEXTS))])
+
+    store.delete(ids=["c3"])
+    assert "red sports cars" not in [doc.page_content for doc in store.similarity_search("red cars", k=5)]
+
+    store.add_documents([Document(page_content="red racing cars")], ids=["c0"])
+    assert store.get_documents(["c0"])["c0"].page_content == "red racing cars"
+    assert len(store) == 4
+
+    store.delete(ids=["c1", "c2"])  # Deleted rows now outnumber live ones, which triggers compaction.
+    assert store.get(include=[])["ids"] == ["c4", "c0"]
+    assert [doc.page_content for doc in store.similarity_search("red cars", k=1)] == ["red racing cars"]
+    assert len(store.get_embeddings([Document(page_content="red racing cars", metadata={"chunk_id": "c0"})])[0]) == 32
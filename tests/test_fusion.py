@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.tools.fusion import chunk_key, distance_to_similarity, maximal_marginal_relevance, reciprocal_rank_fusion
+
+
+def test_rrf_rewards_agreement_across_queries():
+    """
+    Tests that a chunk ranked well by several query variants beats a single top hit.
+    """
+    fused = reciprocal_rank_fusion([
+        [("a", 0.1), ("b", 0.2)],
+        [("c", 0.1), ("b", 0.3)],
+        [("b", 0.2), ("d", 0.4)],
+    ])
+
+    assert fused[0][0] == "b"
+    assert [key for key, _ in fused].count("b") == 1
+
+
+def test_chunk_key_prefers_chunk_id():
+    """
+    Tests that chunks are deduplicated by ID and fall back to a content hash.
+    """
+    with_id = SimpleNamespace(page_content="Paris", metadata={"chunk_id": "abc-0"})
+    without_id = SimpleNamespace(page_content="Paris", metadata={})
+
+    assert chunk_key(with_id) == "abc-0"
+    assert chunk_key(without_id) == chunk_key(SimpleNamespace(page_content="Paris", metadata={}))
+
+
+def test_mmr_skips_near_duplicates():
+    """
+    Tests that MMR prefers a diverse chunk over a near-duplicate of one already selected.
+    """
+    candidates = [("a", 1.0), ("a-copy", 0.9), ("b", 0.8)]
+    embeddings = {"a": [1.0, 0.0], "a-copy": [0.99, 0.01], "b": [0.0, 1.0]}
+
+    selected = maximal_marginal_relevance(candidates, embeddings, top_n=2, lambda_mult=0.5)
+
+    assert [key for key, _ in selected] == ["a", "b"]
+
+
+def test_distances_convert_to_cosine_similarity():
+    """
+    Tests that squared L2 distances between unit vectors map to their cosine similarity,
+    and that cosine/IP distances map to one minus the distance.
+    """
+    assert distance_to_similarity(0.0) == 1.0
+    assert distance_to_similarity(2.0) == 0.0       # Orthogonal unit vectors: |a - b|^2 = 2.
+    assert distance_to_similarity(4.0) == -1.0      # Opposite unit vectors.
+    assert distance_to_similarity(0.25, "cosine") == 0.75
+    with pytest.raises(ValueError):
+        distance_to_similarity(0.5, "manhattan")
@@ -1,22 +1,25 @@
-import pytest
 from src.agents.generator import Generator
 
-# A fixture to initialize the generator with a mock model can be added here later.
+
+class ExtractiveLLMClient:
+    """A deterministic stand-in for Ollama that answers with the first context line."""
+    def generate(self, model, prompt, **options):
+        context = prompt.split("---CONTEXT---\n", 1)[1].split("\n---END CONTEXT---", 1)[0]
+        return context.splitlines()[0]
+
 
 def test_generator_initialization():
     """
     Tests that the Generator agent can be initialized.
     """
-    mock_model = None
-    generator = Generator(model=mock_model)
+    generator = Generator(llm_client=ExtractiveLLMClient())
     assert generator is not None
 
 def test_generate_with_dummy_data():
     """
     Tests the generate method with a simple query and context.
     """
-    mock_model = None
-    generator = Generator(model=mock_model)
+    generator = Generator(llm_client=ExtractiveLLMClient())
     query = "What is the capital of France?"
     documents = ["Paris is the capital of France.", "The Eiffel Tower is in Paris."]
     answer = generator.generate(query, documents)
@@ -0,0 +1,98 @@
+import os
+from types import SimpleNamespace
+
+from src.tools.ingestion import sync_documents
+
+
+class FakeVectorStore:
+    """An in-memory stand-in exposing the add/delete/get surface used by ingestion."""
+    def __init__(self):
+        self.rows = {}
+        self.embedded = 0
+
+    def add_documents(self, documents, ids):
+        self.embedded += len(documents)
+        self.rows.update(zip(ids, documents))
+
+    def delete(self, ids):
+        for chunk_id in ids:
+            self.rows.pop(chunk_id, None)
+
+    def get(self, include=None):
+        return {"ids": list(self.rows)}
+
+
+def split_lines(file_path):
+    with open(file_path, encoding="utf-8") as f:
+        return [SimpleNamespace(page_content=line, metadata={"source": file_path}) for line in f.read().splitlines()]
+
+
+def test_warm_start_does_no_embedding_work(tmp_path):
+    """
+    Tests that re-syncing an unchanged corpus embeds nothing and does not grow the store.
+    """
+    data_dir, db_dir = tmp_path / "data", tmp_path / "db"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("one\ntwo\n")
+    (data_dir / "b.txt").write_text("three\n")
+    store = FakeVectorStore()
+
+    first = sync_documents(store, str(data_dir), str(db_dir), load_file=split_lines)
+    second = sync_documents(store, str(data_dir), str(db_dir), load_file=split_lines)
+
+    assert first["added"] == 2 and store.embedded == 3
+    assert second["unchanged"] == 2 and second["chunks_added"] == 0
+    assert len(store.rows) == 3
+    assert first["corpus_version"] == second["corpus_version"]
+
+
+def test_changed_and_deleted_files_are_resynced(tmp_path):
+    """
+    Tests that a changed file replaces its chunks and a deleted file's chunks are removed.
+    """
+    data_dir, db_dir = tmp_path / "data", tmp_path / "db"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("one\ntwo\n")
+    (data_dir / "b.txt").write_text("three\n")
+    store = FakeVectorStore()
+    first = sync_documents(store, str(data_dir), str(db_dir), load_file=split_lines)
+
+    (data_dir / "a.txt").write_text("one\ntwo\nfour\n")
+    os.remove(data_dir / "b.txt")
+    stats = sync_documents(store, str(data_dir), str(db_dir), load_file=split_lines)
+
+    assert stats["updated"] == 1 and stats["removed"] == 1
+    assert sorted(doc.page_content for doc in store.rows.values()) == ["four", "one", "two"]
+    assert all(doc.metadata["chunk_id"] == chunk_id for chunk_id, doc in store.rows.items())
+    assert stats["corpus_version"] != first["corpus_version"]
+
+
+def test_interrupted_sync_resumes_without_re_embedding(tmp_path):
+    """
+    Tests that a sync interrupted mid-file resumes after the last upserted batch and
+    records every chunk of the file in the manifest.
+    """
+    data_dir, db_dir = tmp_path / "data", tmp_path / "db"
+    data_dir.mkdir()
+    (data_dir / "a.txt").write_text("\n".join(f"line {i}" for i in range(10)))
+
+    class FailingVectorStore(FakeVectorStore):
+        def add_documents(self, documents, ids):
+            if self.embedded >= 4:
+                raise RuntimeError("disk full")
+            super().add_documents(documents, ids)
+
+    store = FailingVectorStore()
+    try:
+        sync_documents(store, str(data_dir), str(db_dir), load_file=split_lines, batch_size=2)
+    except RuntimeError:
+        pass
+    assert store.embedded == 4
+
+    resumed_store = FakeVectorStore()
+    resumed_store.rows = dict(store.rows)
+    stats = sync_documents(resumed_store, str(data_dir), str(db_dir), load_file=split_lines, batch_size=2)
+
+    assert resumed_store.embedded == 6 and stats["chunks_resumed"] == 4
+    assert stats["chunks_added"] == 10 and len(resumed_store.rows) == 10
+    assert not os.path.exists(db_dir / "ingest_checkpoint.json")
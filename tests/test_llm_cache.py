@@ -0,0 +1,62 @@
+import time
+
+from src.tools.llm_cache import CachedLLMClient, LLMResponseCache
+
+
+class CountingClient:
+    def __init__(self, digest="sha256:aaa"):
+        self.calls = 0
+        self.digest = digest
+
+    def generate(self, model, prompt, **options):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+    def model_digest(self, model):
+        return self.digest
+
+
+def test_repeated_prompt_is_served_from_cache(tmp_path):
+    """
+    Tests that an identical (model, prompt) pair only reaches the LLM once.
+    """
+    client = CountingClient()
+    cached = CachedLLMClient(client, LLMResponseCache(str(tmp_path / "llm.sqlite3")))
+
+    first = cached.generate("openchat:latest", "Rephrase: capital of France")
+    second = cached.generate("openchat:latest", "Rephrase: capital of France")
+
+    assert first == second == "answer 1"
+    assert client.calls == 1
+    assert cached.stats()["hits"] == 1
+
+
+def test_model_digest_change_and_ttl_bypass_entries(tmp_path):
+    """
+    Tests that a re-pulled model tag and expired entries both miss the cache.
+    """
+    client = CountingClient()
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"), ttl_seconds=0.05)
+    cached = CachedLLMClient(client, cache)
+    cached.generate("openchat:latest", "prompt")
+
+    client.digest = "sha256:bbb"
+    cached.refresh_model_versions()
+    cached.generate("openchat:latest", "prompt")
+    time.sleep(0.1)
+    cached.generate("openchat:latest", "prompt")
+
+    assert client.calls == 3
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    """
+    Tests that the cache never holds more than max_entries responses.
+    """
+    cache = LLMResponseCache(str(tmp_path / "llm.sqlite3"), max_entries=2)
+    for i in range(4):
+        cache.put("openchat:latest", f"prompt {i}", f"answer {i}")
+
+    assert cache.stats()["entries"] == 2
+    assert cache.get("openchat:latest", "prompt 3") == "answer 3"
+    assert cache.invalidate("openchat:latest") == 2
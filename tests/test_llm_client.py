@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+
+import pytest
+from src.tools.llm_client import LLMError, OllamaHTTPClient, OllamaSubprocessClient
+from tests.ollama_stub import StubOllamaServer
+
+
+def test_generate_returns_completion_and_sends_keep_alive():
+    """
+    Tests that the HTTP client posts to /api/generate with the per-model keep_alive.
+    """
+    with StubOllamaServer() as server:
+        client = OllamaHTTPClient(base_url=server.url, model_keep_alive={"openchat:latest": "30m"})
+        answer = client.generate("openchat:latest", "What is the capital of France?")
+        client.close()
+
+    assert answer == "echo: What is the capital of France?"
+    assert server.requests[0]["stream"] is False
+    assert server.requests[0]["keep_alive"] == "30m"
+
+
+def test_connections_are_reused():
+    """
+    Tests that consecutive calls go over a single pooled keep-alive connection.
+    """
+    with StubOllamaServer() as server:
+        client = OllamaHTTPClient(base_url=server.url)
+        for i in range(5):
+            client.generate("openchat:latest", f"prompt {i}")
+        client.close()
+
+    assert len(server.requests) == 5
+    assert len(set(server.client_ports)) == 1
+
+
+def test_retries_on_server_error():
+    """
+    Tests that 5xx responses are retried and that exhausting the retries raises LLMError.
+    """
+    with StubOllamaServer(fail_first=2) as server:
+        client = OllamaHTTPClient(base_url=server.url, max_retries=2, backoff=0)
+        assert client.generate("openchat:latest", "hello") == "echo: hello"
+
+    with StubOllamaServer(fail_first=5) as server:
+        client = OllamaHTTPClient(base_url=server.url, max_retries=1, backoff=0)
+        with pytest.raises(LLMError):
+            client.generate("openchat:latest", "hello")
+
+
+def test_stream_generate_yields_pieces_and_reuses_connection():
+    """
+    Tests that streamed pieces reassemble the completion and the connection goes back to the pool.
+    """
+    with StubOllamaServer() as server:
+        client = OllamaHTTPClient(base_url=server.url)
+        pieces = list(client.stream_generate("openchat:latest", "the capital is Paris"))
+        client.generate("openchat:latest", "again")
+        client.close()
+
+    assert len(pieces) > 1
+    assert "".join(pieces) == "echo: the capital is Paris"
+    assert len(set(server.client_ports)) == 1
+
+
+FAKE_OLLAMA = """#!{python}
+import sys, time
+sys.stdin.read()
+sys.stderr.write("progress " * 100000)
+sys.stderr.flush()
+sys.stdout.write("Paris")
+sys.stdout.flush()
+time.sleep(30)
+"""
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs an executable script on PATH")
+def test_subprocess_stream_survives_chatty_stderr_and_times_out(tmp_path, monkeypatch):
+    """
+    Tests that a model writing lots of stderr still streams its output, and that a
+    model that stops producing output is killed once the timeout has passed.
+    """
+    script = tmp_path / "ollama"
+    script.write_text(FAKE_OLLAMA.format(python=sys.executable))
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    client = OllamaSubprocessClient(timeout=2.0)
+
+    pieces = []
+    start = time.monotonic()
+    with pytest.raises(LLMError, match="timed out"):
+        for piece in client.stream_generate("openchat:latest", "What is the capital of France?"):
+            pieces.append(piece)
+
+    assert "".join(pieces) == "Paris"
+    assert time.monotonic() - start < 10
@@ -0,0 +1,83 @@
+import threading
+import time
+
+from src.tools.llm_scheduler import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, LLMOverloadedError, LLMScheduler, llm_deadline
+
+
+class GatedLLMClient:
+    """Blocks every call until released, recording the order prompts start in."""
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def generate(self, model, prompt, **options):
+        with self._lock:
+            self.started.append(prompt)
+        self.release.wait(5)
+        return f"answer to {prompt}"
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_identical_calls_share_one_completion():
+    """
+    Tests that identical concurrent calls reach the model once and all get its answer.
+    """
+    client = GatedLLMClient()
+    scheduler = LLMScheduler(client, max_concurrency=4)
+    generator = scheduler.client_for("generator", PRIORITY_INTERACTIVE)
+    answers = []
+    threads = [threading.Thread(target=lambda: answers.append(generator.generate("m", "trending question"))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    wait_for(lambda: scheduler.stats()["agents"]["generator"]["coalesced"] == 4)
+    client.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert client.started == ["trending question"]
+    assert answers == ["answer to trending question"] * 5
+
+
+def test_generator_calls_jump_the_queue_and_late_calls_are_shed():
+    """
+    Tests that with the single slot busy, a queued Generator call starts before earlier
+    queued background calls, and that a call whose deadline passes while queued is shed.
+    """
+    client = GatedLLMClient()
+    scheduler = LLMScheduler(client, max_concurrency=1)
+    rephraser = scheduler.client_for("rephraser", PRIORITY_BACKGROUND)
+    generator = scheduler.client_for("generator", PRIORITY_INTERACTIVE)
+    errors = []
+
+    def call(view, prompt, deadline=None):
+        try:
+            if deadline is None:
+                view.generate("m", prompt)
+            else:
+                with llm_deadline(deadline):
+                    view.generate("m", prompt)
+        except LLMOverloadedError as e:
+            errors.append((prompt, e))
+
+    threads = [threading.Thread(target=call, args=(rephraser, "running"))]
+    threads[0].start()
+    wait_for(lambda: client.started == ["running"])
+    for view, prompt, deadline, depth in ((rephraser, "background", None, 1), (generator, "interactive", None, 2), (rephraser, "impatient", 0.05, 3)):
+        threads.append(threading.Thread(target=call, args=(view, prompt, deadline)))
+        threads[-1].start()
+        wait_for(lambda: scheduler.stats()["queue_depth"] == depth or errors)
+    wait_for(lambda: errors)
+    client.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert client.started == ["running", "interactive", "background"]
+    assert [prompt for prompt, _ in errors] == ["impatient"]
+    assert scheduler.stats()["agents"]["rephraser"]["shed"] == 1
@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+from langchain_core.documents import Document
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.agents.evaluator import Evaluator
+from src.agents.generator import Generator
+from src.agents.orchestrator import Orchestrator
+from src.agents.rephraser import Rephraser
+from src.agents.retriever import Retriever
+from src.tools.answer_cache import SemanticAnswerCache
+from src.tools.fusion import distance_to_similarity
+from src.tools.llm_client import LLMError
+from tests.doubles import CountingVectorStore, LetterEmbeddings, ScriptedLLMClient, make_orchestrator
+
+
+def test_rejected_answer_is_regenerated_without_retrieving_again():
+    """
+    Tests that an unfaithful answer goes back to the Generator with the rejected answer,
+    reusing the retrieved documents, and that the second answer is final.
+    """
+    client = ScriptedLLMClient(answers=["Lyon.", "Paris."], verdicts=["no", "yes"])
+    store = CountingVectorStore()
+    orchestrator = make_orchestrator(client, store)
+
+    events = list(orchestrator.stream_answer("What is the capital of France?"))
+
+    final = events[-1]
+    assert final["final_answer"] == "Paris." and final["is_answer_faithful"] is True
+    assert final["generation_attempts"] == 2
+    assert {"type": "retry", "attempt": 2} in events
+    assert store.searches == 2  # The first-pass and the rephrased search, once each.
+    assert sum("Original Query:" in prompt for prompt in client.prompts) == 1
+    assert "---REJECTED ANSWER---\nLyon.\n" in client.prompts[-2]
+
+
+def test_failed_run_resumes_from_the_last_completed_node():
+    """
+    Tests that after a failure in the Generator, resuming the run's thread re-runs only
+    the Generator and Evaluator, and that completed runs leave no checkpoints behind.
+    """
+    client = ScriptedLLMClient(answers=[RuntimeError("model crashed"), "Paris."], verdicts=["yes"])
+    store = CountingVectorStore()
+    checkpointer = MemorySaver()
+    orchestrator = make_orchestrator(client, store, checkpointer)
+
+    with pytest.raises(RuntimeError):
+        orchestrator.run("What is the capital of France?", thread_id="run-1")
+    result = orchestrator.resume("run-1")
+
+    assert result["evaluator"]["final_answer"] == "Paris."
+    assert store.searches == 2
+    assert sum("Original Query:" in prompt for prompt in client.prompts) == 1
+    assert list(checkpointer.list({"configurable": {"thread_id": "run-1"}})) == []
+    with pytest.raises(ValueError):
+        orchestrator.resume("run-1")
+
+
+def test_only_faithful_answers_are_cached(tmp_path):
+    """
+    Tests that refusals and LLM error text are not stored in the answer cache, so a
+    transient outage is not replayed to later near-duplicate queries.
+    """
+    cache = SemanticAnswerCache(LetterEmbeddings(), str(tmp_path / "answers.sqlite3"), corpus_version="v1")
+    query = "What is the capital of France?"
+
+    refused = make_orchestrator(ScriptedLLMClient(answers=["Lyon."], verdicts=["no"]), CountingVectorStore(), answer_cache=cache, max_generation_attempts=1)
+    assert refused.run(query)["evaluator"]["is_answer_faithful"] is False
+    outage = make_orchestrator(ScriptedLLMClient(answers=[LLMError("connection refused")], verdicts=["yes"]), CountingVectorStore(), answer_cache=cache)
+    assert outage.run(query)["evaluator"]["final_answer"].startswith("Error calling Ollama:")
+    assert cache.stats()["entries"] == 0
+
+    answered = make_orchestrator(ScriptedLLMClient(answers=["Paris."], verdicts=["yes"]), CountingVectorStore(), answer_cache=cache)
+    answered.run(query)
+    assert cache.lookup(query)["final_answer"] == "Paris."
+
+
+class DistanceVectorStore:
+    """Returns two chunks at fixed distances for every query."""
+    def __init__(self, distances):
+        self.distances = distances
+        self.searches = 0
+
+    def similarity_search_batch(self, queries, k=4):
+        self.searches += 1
+        return [[(Document(page_content=f"Chunk {i}.", metadata={"chunk_id": f"chunk-{i}"}), distance) for i, distance in enumerate(self.distances)] for _ in queries]
+
+
+def make_adaptive_orchestrator(distances, rephrase_threshold, rephrase_margin=0.0):
+    client = ScriptedLLMClient(answers=["Chunk 0."], verdicts=["yes"])
+    store = DistanceVectorStore(distances)
+    orchestrator = Orchestrator(
+        rephraser=Rephraser(llm_client=client),
+        retriever=Retriever(vector_store=store),
+        generator=Generator(llm_client=client),
+        evaluator=Evaluator(llm_client=client),
+        rephrase_threshold=rephrase_threshold,
+        rephrase_margin=rephrase_margin,
+    )
+    return orchestrator, client, store
+
+
+def test_adaptive_routing_skips_or_runs_the_rephraser():
+    """
+    Tests that a confident first pass answers directly without the Rephraser or a second
+    search, that a weak one takes the rephrased route, and that both are counted.
+    """
+    confident, client, store = make_adaptive_orchestrator([0.2, 0.8], rephrase_threshold=0.8, rephrase_margin=0.1)
+    assert confident.run("Which chunk?")["evaluator"]["final_answer"] == "Chunk 0."
+    assert not any("Original Query:" in prompt for prompt in client.prompts)
+    assert store.searches == 1
+    assert confident.route_counts == {"direct": 1}
+
+    weak, client, store = make_adaptive_orchestrator([1.0, 1.1], rephrase_threshold=0.8)
+    weak.run("Which chunk?")
+    assert sum("Original Query:" in prompt for prompt in client.prompts) == 1
+    assert store.searches == 2
+    assert weak.route_counts == {"rephrased": 1}
+
+
+@pytest.mark.parametrize("threshold, margin, route", [
+    (distance_to_similarity(0.2), 0.0, "retriever"),                   # Top similarity exactly at the threshold.
+    (distance_to_similarity(0.2) + 1e-9, 0.0, "rephraser"),
+    (0.5, distance_to_similarity(0.2) - distance_to_similarity(0.8), "retriever"),  # Margin exactly at the minimum.
+    (0.5, distance_to_similarity(0.2) - distance_to_similarity(0.8) + 1e-9, "rephraser"),
+])
+def test_adaptive_routing_threshold_and_margin_edges(threshold, margin, route):
+    """
+    Tests that the threshold and the margin are both inclusive lower bounds.
+    """
+    orchestrator, _, _ = make_adaptive_orchestrator([0.2, 0.8], rephrase_threshold=threshold, rephrase_margin=margin)
+    state = orchestrator.first_pass_retriever_node({"original_query": "Which chunk?"})
+
+    assert orchestrator.route_after_first_pass(state) == route
+
+
+def test_async_run_merges_the_parallel_branches():
+    """
+    Tests the async graph end to end: the first-pass search and the Rephraser run as
+    parallel branches, and the retriever fuses both while searching only the new variant.
+    """
+    client = ScriptedLLMClient(answers=["Paris.", "Paris."], verdicts=["yes", "yes"])
+    store = CountingVectorStore()
+    orchestrator = make_orchestrator(client, store)
+
+    final = asyncio.run(orchestrator.arun("What is the capital of France?"))
+    state = asyncio.run(orchestrator.workflow.ainvoke({"original_query": "What is the capital of France?"}))
+
+    assert final["evaluator"]["final_answer"] == "Paris."
+    assert "capital city of France" in state["rephrased_queries"]
+    assert state["first_pass_results"][0][0]["chunk_id"] == "france-0"
+    assert [ref["chunk_id"] for ref in state["retrieved_documents"]] == ["france-0"]
+    # The second search covers only the variant; the original was searched by the first pass.
+    assert store.queries[-1] == ["capital city of France"]
+    assert store.queries[-2] == ["What is the capital of France?"]
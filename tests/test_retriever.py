@@ -1,27 +1,35 @@
-import pytest
+from langchain_core.documents import Document
+
 from src.agents.retriever import Retriever
 
-# A fixture to initialize the retriever can be added here later.
-# For now, we'll just have a placeholder test.
+
+class FixedVectorStore:
+    """Returns the same two chunks, nearest first, for every query."""
+    def __init__(self):
+        self.documents = [
+            Document(page_content="Paris is the capital of France.", metadata={"chunk_id": "france-0"}),
+            Document(page_content="The Eiffel Tower is in Paris.", metadata={"chunk_id": "france-1"}),
+        ]
+
+    def similarity_search_batch(self, queries, k=4):
+        return [[(doc, 0.1 * (rank + 1)) for rank, doc in enumerate(self.documents[:k])] for _ in queries]
+
 
 def test_retriever_initialization():
     """
     Tests that the Retriever agent can be initialized.
     """
-    # This test will need to be updated once we have a mock vector store.
-    mock_vector_store = None
-    retriever = Retriever(vector_store=mock_vector_store)
+    retriever = Retriever(vector_store=FixedVectorStore())
     assert retriever is not None
 
 def test_retrieve_with_dummy_data():
     """
     Tests the retrieve method with a simple list of queries.
     """
-    mock_vector_store = None
-    retriever = Retriever(vector_store=mock_vector_store)
-    queries = ["what is the capital of France?"]
+    retriever = Retriever(vector_store=FixedVectorStore())
+    queries = ["what is the capital of France?", "capital city of France"]
     documents = retriever.retrieve(queries)
 
-    # The placeholder implementation returns 2 dummy docs
+    # Both variants return the same 2 chunks, which are deduplicated by chunk ID
     assert len(documents) == 2
     assert "Paris is the capital of France." in documents
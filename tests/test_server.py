@@ -0,0 +1,76 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+from langgraph.checkpoint.memory import MemorySaver
+
+import server
+from tests.doubles import CountingVectorStore, ScriptedLLMClient, make_orchestrator
+
+
+@pytest.fixture
+def serve():
+    """Serves the app over a given orchestrator, without loading the real pipeline."""
+    executor = ThreadPoolExecutor(max_workers=2)
+
+    def start(orchestrator):
+        server.app.state.pipeline = SimpleNamespace(orchestrator=orchestrator)
+        server.app.state.executor = executor
+        return TestClient(server.app, raise_server_exceptions=False)
+
+    yield start
+    executor.shutdown(wait=True)
+
+
+def test_query_returns_the_final_answer_and_drops_failed_runs(serve):
+    """
+    Tests that /query answers with the final event, and that a failed run leaves no
+    checkpoint behind, since its thread ID is never given to the caller.
+    """
+    client = ScriptedLLMClient(answers=["Paris.", RuntimeError("model crashed")], verdicts=["yes"])
+    checkpointer = MemorySaver()
+    http = serve(make_orchestrator(client, CountingVectorStore(), checkpointer))
+
+    response = http.post("/query", json={"query": "What is the capital of France?"})
+    assert response.status_code == 200
+    assert response.json()["final_answer"] == "Paris."
+    assert response.json()["is_answer_faithful"] is True
+
+    response = http.post("/query", json={"query": "What is the capital of France?"})
+    assert response.status_code == 500
+    assert list(checkpointer.list(None)) == []
+
+
+def test_stream_yields_tokens_then_the_final_event(serve):
+    """Tests that /query/stream sends NDJSON token events followed by one final event."""
+    client = ScriptedLLMClient(answers=["Paris."], verdicts=["yes"])
+    http = serve(make_orchestrator(client, CountingVectorStore(), MemorySaver()))
+
+    response = http.post("/query/stream", json={"query": "What is the capital of France?"})
+    events = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == 200
+    assert "".join(event["text"] for event in events if event["type"] == "token") == "Paris."
+    assert events[-1]["type"] == "final" and events[-1]["final_answer"] == "Paris."
+
+
+def test_failed_stream_resumes_through_its_thread_id(serve):
+    """
+    Tests that a streamed run that fails reports its thread ID, that /query/resume
+    finishes it, and that unknown threads are answered with a 404.
+    """
+    client = ScriptedLLMClient(answers=[RuntimeError("model crashed"), "Paris."], verdicts=["yes"])
+    http = serve(make_orchestrator(client, CountingVectorStore(), MemorySaver()))
+
+    response = http.post("/query/stream", json={"query": "What is the capital of France?"})
+    error = json.loads(response.text.splitlines()[-1])
+    assert error["type"] == "error"
+
+    response = http.post("/query/resume", json={"thread_id": error["thread_id"]})
+    assert response.status_code == 200
+    assert response.json() == {"final_answer": "Paris.", "is_answer_faithful": True}
+    assert http.post("/query/resume", json={"thread_id": error["thread_id"]}).status_code == 404
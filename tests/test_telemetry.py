@@ -0,0 +1,46 @@
+import pytest
+
+from src.tools.telemetry import Telemetry, percentile
+
+
+def test_spans_feed_stage_latencies_and_count_errors():
+    """
+    Tests that spans are summarised per stage and that a failing span is counted as an
+    error without swallowing the exception.
+    """
+    telemetry = Telemetry()
+    for _ in range(3):
+        with telemetry.span("node", node="generator") as attributes:
+            attributes["prompt_chars"] = 120
+    with pytest.raises(ValueError):
+        with telemetry.span("node", node="evaluator"):
+            raise ValueError("boom")
+
+    stages = telemetry.stage_latencies()
+
+    assert stages["node[node=generator]"]["count"] == 3
+    assert stages["node[node=evaluator]"]["count"] == 1
+    assert stages["node[node=generator]"]["p95_ms"] >= stages["node[node=generator]"]["p50_ms"]
+    errors = [c for c in telemetry.snapshot()["counters"] if c["name"] == "span_errors_total"]
+    assert errors == [{"name": "span_errors_total", "labels": {"node": "evaluator", "span": "node"}, "value": 1.0}]
+    assert percentile([1, 2, 3, 4, 5, 6, 7, 8, 9, 10], 0.95) == 10
+    assert percentile([1, 2, 3, 4], 0.5) == 2
+
+
+def test_prometheus_output_has_counters_and_summaries():
+    """
+    Tests the Prometheus text rendering of a counter and a histogram.
+    """
+    telemetry = Telemetry()
+    telemetry.increment("llm_cache_lookups_total", model="llama3", hit=True)
+    telemetry.observe("llm_prompt_chars", 100, model="llama3")
+    telemetry.observe("llm_prompt_chars", 300, model="llama3")
+
+    text = telemetry.to_prometheus()
+
+    assert "# TYPE rag_llm_cache_lookups_total counter" in text
+    assert 'rag_llm_cache_lookups_total{hit="True",model="llama3"} 1' in text
+    assert "# TYPE rag_llm_prompt_chars summary" in text
+    assert 'rag_llm_prompt_chars{model="llama3",quantile="0.5"} 100' in text
+    assert 'rag_llm_prompt_chars_sum{model="llama3"} 400' in text
+    assert 'rag_llm_prompt_chars_count{model="llama3"} 2' in text
@@ -0,0 +1,33 @@
+import pytest
+from langchain_core.documents import Document
+
+from src.tools.vector_store import similarity_search_batch
+from tests.doubles import TEXTS, HashingEmbeddings
+
+
+def test_chroma_batch_search_matches_single_queries(tmp_path):
+    """
+    Tests that the multi-vector Chroma query returns, for every query, the same chunks
+    in the same order and with the same distances as one `similarity_search` per query.
+    """
+    chromadb = pytest.importorskip("chromadb")
+    Chroma = pytest.importorskip("langchain_community.vectorstores").Chroma
+
+    store = Chroma(
+        collection_name="batch",
+        embedding_function=HashingEmbeddings(),
+        client=chromadb.PersistentClient(path=str(tmp_path)),
+        persist_directory=str(tmp_path),
+    )
+    store.add_documents([Document(page_content=text, metadata={"source": f"{i}.txt"}) for i, text in enumerate(TEXTS)], ids=[f"c{i}" for i in range(len(TEXTS))])
+    queries = ["red fruit", "blue water", "forest", "fast red cars"]
+
+    batched = similarity_search_batch(store, queries, k=3)
+
+    assert len(batched) == len(queries)
+    for query, hits in zip(queries, batched):
+        single = store.similarity_search_with_score(query, k=3)
+        assert [doc.page_content for doc, _ in hits] == [doc.page_content for doc, _ in single]
+        assert [doc.page_content for doc in store.similarity_search(query, k=3)] == [doc.page_content for doc, _ in hits]
+        assert [distance for _, distance in hits] == pytest.approx([distance for _, distance in single])
+        assert all(doc.metadata["chunk_id"].startswith("c") for doc, _ in hits)